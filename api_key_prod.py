@@ -57,18 +57,40 @@ ENV_KEYS = {
     "SERPAI_API": "SERPAI_API",
 }
 
-# ---- LOAD + EXPORT ----
+# ---- LOAD + EXPORT (LAZY) ----
+# Secrets are resolved on demand, so an app only pays for (and only fails
+# on) the keys it actually uses.
 _loaded = {}
 
-for env_name, source_key in ENV_KEYS.items():
-    value = require_env(source_key)
-    os.environ[env_name] = value
-    _loaded[env_name] = value
+
+def load_keys(*env_names: str) -> dict:
+    """
+    Resolve and export the given ENV_KEYS entries (all of them if none
+    are named). Raises on any missing secret.
+    """
+    for env_name in env_names or ENV_KEYS:
+        if env_name not in _loaded:
+            value = require_env(ENV_KEYS[env_name])
+            os.environ[env_name] = value
+            _loaded[env_name] = value
+    return {k: _loaded[k] for k in env_names or ENV_KEYS}
+
+
+def load_optional(*env_names: str) -> list[str]:
+    """
+    Like load_keys, but skips missing secrets. Returns the names exported.
+    """
+    found = []
+    for env_name in env_names:
+        if env_name in _loaded or _get_secret(ENV_KEYS[env_name]):
+            load_keys(env_name)
+            found.append(env_name)
+    return found
 
 
 # ---- OPTIONAL: SAFE DEBUG (NO LEAKS) ----
 if __name__ == "__main__":
-    for k in _loaded:
+    for k in load_keys():
         print(f"{k}: loaded")
 
 
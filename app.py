@@ -4,12 +4,13 @@
 # 3. refine: Start with an initial summary and iteratively refine it using additional documents.
 
 import api_keys
+import html_extract
 
 import validators,streamlit as st
 from langchain.prompts import PromptTemplate
 from langchain_groq import ChatGroq
 from langchain.chains.summarize import load_summarize_chain
-from langchain_community.document_loaders import YoutubeLoader,UnstructuredURLLoader
+from langchain_community.document_loaders import YoutubeLoader
 
 ## sstreamlit APP
 st.set_page_config(page_title="LangChain: Summarize Text From YT or Website", page_icon="🦜")
@@ -37,10 +38,11 @@ if st.button("Summarize the Content from YT or Website"):
                 ## loading the website or yt video data
                 if "youtube.com" in generic_url:
                     loader=YoutubeLoader.from_youtube_url(generic_url,add_video_info=True)
+                    docs=loader.load()
                 else:
-                    loader=UnstructuredURLLoader(urls=[generic_url],ssl_verify=False,
+                    ## fast article extraction, Unstructured only as fallback
+                    docs=html_extract.load_url(generic_url,verify=False,
                                                 headers={"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 13_5_1) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/116.0.0.0 Safari/537.36"})
-                docs=loader.load()
 
                 ## Chain For Summarization
                 chain=load_summarize_chain(llm,chain_type="stuff",prompt=prompt)
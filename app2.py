@@ -2,27 +2,23 @@
 # LangChain: Summarize URL (YT + Web)
 # ================================
 
-import re
+import csv
+import io
 import os
-import json
-import tempfile
-import subprocess
-import requests
+import time
+_start = time.perf_counter()
 
+import startup
 import api_key_prod
+import metrics
+import rate_limiter
+import summary_cache
 import validators
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-from langchain_core.prompts import PromptTemplate
-from langchain_core.documents import Document
-from langchain.chains.summarize import load_summarize_chain
-from langchain_groq import ChatGroq
-
-from langchain_community.document_loaders import (
-    UnstructuredURLLoader,
-    PyPDFLoader,
-    UnstructuredFileLoader,
-)
+startup.mark("imports", _start)
+metrics.serve()  # /metrics exporter, only if METRICS_PORT is set
 
 # ---------------- STREAMLIT UI ----------------
 st.set_page_config(
@@ -33,227 +29,416 @@ st.set_page_config(
 st.title("🦜 LangChain: Summarize Text From YT or Website")
 st.subheader("Summarize URL")
 
-generic_url = st.text_input("URL", label_visibility="collapsed")
+MAX_URLS = int(os.getenv("MAX_URLS", "20"))
 
-# ---------------- LLM ----------------
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",
-    streaming=False,
-    temperature=0.2,
-)
 
-# ---------------- PROMPT ----------------
-prompt_template = """
-Provide a concise summary of the following content in under 300 words.
-
-Content:
-{text}
-"""
-
-prompt = PromptTemplate(
-    template=prompt_template,
-    input_variables=["text"],
+def start_prefetch():
+    """
+    on_change of the URL input: starts loading the content before the
+    button is clicked (and cancels this session's stale one).
+    """
+    import prefetch
+
+    ctx = get_script_run_ctx()
+    prefetch.get_prefetcher().prefetch(
+        ctx.session_id if ctx else None,
+        st.session_state.get("url", ""),
+        st.session_state.get("mode", "auto"),
+    )
+
+
+def prefetch_status(item):
+    if item.status == "ready":
+        st.caption(f"Content loaded · ~{item.tokens:,} tokens ({item.duration_s:.1f}s)")
+    elif item.status == "failed":
+        st.caption(f"Could not load this URL yet: {item.error}")
+    elif not item.finished:
+        st.caption("Loading content in the background...")
+
+
+@st.fragment(run_every=1.0)
+def follow_prefetch(session):
+    """Polls an unfinished prefetch without rerunning the whole page."""
+    import prefetch
+
+    item = prefetch.get_prefetcher().get(session)
+    if item is not None:
+        prefetch_status(item)
+
+
+def show_prefetch(url: str):
+    """State of this session's prefetch of `url`, if any."""
+    import prefetch
+
+    ctx = get_script_run_ctx()
+    session = ctx.session_id if ctx else None
+    item = prefetch.get_prefetcher().get(session)
+    if item is None or item.url != url.strip():
+        return
+    if item.finished:
+        prefetch_status(item)
+    else:
+        follow_prefetch(session)
+
+
+# The widgets below need the pipeline (LangChain and the loaders, most of
+# the cold start); it is imported once the page header has been sent.
+import pipeline
+import prefetch
+
+several = st.toggle("Summarize several URLs")
+if several:
+    url_list = st.text_area(
+        "URLs, one per line",
+        placeholder="https://www.youtube.com/watch?v=...\nhttps://example.com/article",
+    )
+    url_file = st.file_uploader("...or upload a .txt / .csv list", type=["txt", "csv"])
+    combine = st.checkbox("Also write one combined summary", value=True)
+else:
+    generic_url = st.text_input(
+        "URL", label_visibility="collapsed", key="url",
+        on_change=start_prefetch if prefetch.ENABLED else None,
+    )
+mode = st.radio(
+    "Summarization mode",
+    options=list(pipeline.MODES),
+    format_func=pipeline.MODES.get,
+    horizontal=True,
+    key="mode",
 )
+if prefetch.ENABLED and not several:
+    show_prefetch(generic_url)
+
+# ---------------- CACHE ----------------
+cache = summary_cache.get_cache()
+
+with st.sidebar:
+    bypass_cache = st.checkbox(
+        "Bypass summary cache",
+        value=summary_cache.BYPASS,
+    )
+    stream_output = st.checkbox("Stream summary as it is generated", value=True)
+    show_timings = st.checkbox("Show timing breakdown")
+    import dedup_index
+    import document_cache
+    import http_client
+    import llm_backends
+    import resource_governor
+
+    with st.expander("Cache stats"):
+        st.json({
+            "summaries": cache.stats(),
+            "documents": document_cache.get_cache().stats(),
+            "near_duplicates": dedup_index.get_index().stats(),
+            "http": http_client.get_client().stats(),
+            "prefetch": prefetch.get_prefetcher().stats(),
+        })
+    with st.expander("Resources"):
+        st.json(resource_governor.get_governor().stats())
+    with st.expander("LLM queue"):
+        st.json(rate_limiter.get_scheduler().stats())
+    if llm_backends.FALLBACKS:
+        with st.expander("LLM backends"):
+            st.json(llm_backends.stats())
+    with st.expander("Stage timings"):
+        st.json(metrics.get_registry().summary())
 
-# ---------------- YOUTUBE TRANSCRIPT (CLOUD SAFE) ----------------
-def load_youtube_transcript(url: str):
+# ---------------- LLM ----------------
+def make_llm():
     """
-    Works locally and on Streamlit Cloud.
-    Uses youtube_transcript_api first, falls back to yt-dlp if blocked.
+    Built by the job workers on the first summary they need, with only
+    the secrets this app needs.
     """
+    api_key_prod.load_keys("GROQ_API_KEY")
+    if not api_key_prod.load_optional("LANGCHAIN_API_KEY"):
+        os.environ["LANGCHAIN_TRACING_V2"] = "0"
+    return pipeline.build_llm()
 
-    match = re.search(r"(?:v=|youtu\.be/)([^&?/]+)", url)
-    if not match:
-        raise ValueError("Invalid YouTube URL")
-
-    video_id = match.group(1)
-
-    # ----- Method 1: youtube_transcript_api (local IPs) -----
-    try:
-        from youtube_transcript_api import YouTubeTranscriptApi
-
-        transcript_data = YouTubeTranscriptApi().list(video_id)
-
-        try:
-            transcript = transcript_data.find_manually_created_transcript(["en"])
-        except:
-            transcript = transcript_data.find_generated_transcript(["en"])
-
-        transcript = transcript.fetch()
-        text = " ".join(chunk.text for chunk in transcript)
-
-        if text.strip():
-            return [Document(page_content=text)]
-
-    except Exception:
-        pass  # Cloud IP blocked → fallback
-
-    # ----- Method 2: yt-dlp fallback (cloud safe) -----
-    with tempfile.TemporaryDirectory() as tmpdir:
-        output_template = os.path.join(tmpdir, "%(id)s.%(ext)s")
-
-        cmd = [
-            "yt-dlp",
-            "--skip-download",
-            "--write-subs",
-            "--write-auto-subs",
-            "--sub-langs", "en",
-            "--sub-format", "json3",
-            "--no-check-certificate",
-            "--no-warnings",
-            "-o", output_template,
-            url,
-        ]
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-
-        if result.returncode != 0:
-            raise RuntimeError(
-                "yt-dlp failed to fetch subtitles.\n"
-                f"STDOUT:\n{result.stdout}\n\nSTDERR:\n{result.stderr}"
-            )
-
-        files = os.listdir(tmpdir)
-        sub_files = [f for f in files if f.endswith(".json3")]
-
-        if not sub_files:
-            raise RuntimeError("No subtitles available for this video.")
-
-        sub_path = os.path.join(tmpdir, sub_files[0])
-
-        with open(sub_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        events = data.get("events", [])
-        text = " ".join(
-            seg["utf8"]
-            for event in events
-            for seg in event.get("segs", [])
-        )
-
-        if not text.strip():
-            raise RuntimeError("Transcript is empty.")
-
-        return [Document(page_content=text)]
-
-# ---------------- GOOGLE DOCS / DRIVE ----------------
-def load_google_drive_file(url: str):
-    session = requests.Session()
-
-    # Google Docs
-    if "docs.google.com/document" in url:
-        file_id = re.search(r"/d/([^/]+)", url)
-        if not file_id:
-            raise ValueError("Invalid Google Docs URL")
 
-        file_id = file_id.group(1)
-        export_url = f"https://docs.google.com/document/d/{file_id}/export?format=txt"
-
-        resp = session.get(export_url, timeout=15)
-
-        if resp.status_code != 200 or "DOCTYPE html" in resp.text:
-            raise PermissionError(
-                "Cannot access Google Doc. Share as: Anyone with link → Viewer."
+# ---------------- JOBS ----------------
+@st.cache_resource(show_spinner=False)
+def get_jobs():
+    """
+    Store + worker pool shared by every session. With JOB_WORKERS=0 this
+    process only submits; `python job_service.py` runs the workers.
+    """
+    import job_service
+
+    service = job_service.get_service(make_llm)
+    if job_service.API_PORT:
+        job_service.serve(service)
+    return service
+
+
+STAGES = {
+    "queued": "Waiting for a worker...",
+    "starting": "Starting...",
+    "load": "Loading content...",
+    "summarize": "Summarizing...",
+}
+
+
+def timing_panel(trace: dict):
+    """Debug view of where the request spent its time."""
+    with st.expander(f"Timing breakdown · {trace['duration_s']:.2f}s", expanded=True):
+        plan = trace.get("plan")
+        if plan:
+            st.caption(
+                f"Plan: {plan['strategy']} ({plan['reason']}) · "
+                f"{plan['calls']} LLM call(s), ~{plan['predicted_input_tokens'] + plan['predicted_output_tokens']:,} "
+                f"tokens predicted for {plan['input_tokens']:,} input tokens"
             )
+        st.json(trace["spans"], expanded=2)
+        st.caption(f"Trace {trace['trace_id']}")
 
-        text = resp.text.strip()
-        if not text:
-            raise ValueError("Google Doc is empty.")
-
-        return [Document(page_content=text)]
-
-    # Google Drive files
-    if "drive.google.com/file" in url:
-        file_id = re.search(r"/d/([^/]+)", url)
-        if not file_id:
-            raise ValueError("Invalid Google Drive file URL")
 
-        file_id = file_id.group(1)
-        download_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+def render_job(job: dict, slot):
+    """
+    Current state of one job into `slot` (an st.empty), replacing
+    whatever it showed before.
+    """
+    import job_service
+    import loaders
+
+    with slot.container():
+        if job["status"] not in job_service.FINISHED:
+            shared = f" · shared by {job['watchers']} requests" if job["watchers"] > 1 else ""
+            st.info(STAGES.get(job["stage"], job["stage"]) + shared)
+            if job.get("progress") is not None:
+                st.progress(min(1.0, job["progress"]),
+                            text=f"{job['progress']:.0%} of the document summarized")
+            if stream_output and job["partial"]:
+                st.success(job["partial"] + " ▌")
+            return
+
+        if job["status"] == "done":
+            if job["cache_hit"]:
+                st.caption("Served from summary cache.")
+            elif job["first_token_s"] is not None:
+                st.caption(
+                    f"First token after {job['first_token_s']:.2f}s · "
+                    f"total {(job['load_s'] or 0) + (job['summarize_s'] or 0):.2f}s"
+                )
+            st.success(job["summary"])
 
-        resp = session.get(download_url, timeout=20)
+        elif job["status"] == "cancelled":
+            st.info("Summary cancelled.")
 
-        if resp.status_code != 200:
-            raise PermissionError("Cannot access Google Drive file.")
+        elif job["error_type"] == loaders.EmptyContentError.__name__:
+            st.error(job["error"])
 
-        content_type = resp.headers.get("Content-Type", "").lower()
+        elif job["error_type"] == rate_limiter.QueueTimeout.__name__:
+            st.warning(job["error"])
 
-        suffix = ".pdf" if "application/pdf" in content_type else ".docx"
+        else:
+            st.error(f"{job['error_type']}: {job['error']}")
+            with st.expander("Details"):
+                st.code(job["traceback"] or "")
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as f:
-            f.write(resp.content)
-            temp_path = f.name
+        if show_timings and job["trace"]:
+            timing_panel(job["trace"])
 
-        try:
-            if suffix == ".pdf":
-                loader = PyPDFLoader(temp_path)
-            else:
-                loader = UnstructuredFileLoader(temp_path)
 
-            docs = loader.load()
+def show_job(jobs, job_id: str):
+    """
+    Follows a job until it finishes. The job id lives in the URL, so a
+    browser refresh re-attaches here instead of starting over.
+    """
+    import job_service
 
-            if not docs or not docs[0].page_content.strip():
-                raise ValueError("File contains no readable text.")
+    job = jobs.store.get(job_id)
+    if job is None:
+        st.warning("That summary job no longer exists.")
+        del st.query_params["job"]
+        return
 
-            return docs
+    st.caption(job["url"])
+    if job["status"] not in job_service.FINISHED:
+        if st.button("Cancel"):
+            jobs.cancel(job_id)
+            del st.query_params["job"]
+            st.rerun()
+    slot = st.empty()
 
-        finally:
-            os.unlink(temp_path)
+    while job["status"] not in job_service.FINISHED:
+        render_job(job, slot)
+        job = jobs.store.wait(job_id, job["version"], timeout=1.0)
 
-    raise ValueError("Unsupported Google Drive URL")
+    render_job(job, slot)
 
-# ---------------- BUTTON ----------------
-if st.button("Summarize the Content from YT or Website"):
 
-    if not validators.url(generic_url):
-        st.error("Please enter a valid URL")
-        st.stop()
+def parse_urls(text: str) -> list[str]:
+    """
+    URLs from a pasted list or an uploaded .txt / .csv: one per line (or
+    per CSV cell), blank lines and `#` comments skipped, duplicates
+    dropped in order.
+    """
+    urls = []
+    for row in csv.reader(io.StringIO(text)):
+        for cell in row:
+            cell = cell.strip()
+            if cell.startswith("#"):
+                break
+            if cell and cell not in urls:
+                urls.append(cell)
+    return urls
+
+
+def show_jobs(jobs, job_ids: list[str], combine: bool):
+    """
+    Follows several jobs at once, each in its own box. Every summary is
+    shown as soon as its job finishes; the workers run them concurrently,
+    so the whole batch takes about as long as its slowest URL.
+    """
+    import job_service
+
+    items = jobs.store.get_many(job_ids)
+    if not items:
+        st.warning("Those summary jobs no longer exist.")
+        del st.query_params["jobs"]
+        return
+
+    if any(job["status"] not in job_service.FINISHED for job in items):
+        if st.button("Cancel all"):
+            for job in items:
+                jobs.cancel(job["id"])
+            del st.query_params["jobs"]
+            st.rerun()
+    progress = st.progress(0.0)
+
+    slots = {}
+    for number, job in enumerate(items, 1):
+        with st.container(border=True):
+            st.markdown(f"**{number}.** {job['url']}")
+            slots[job["id"]] = st.empty()
+
+    versions = {job["id"]: -1 for job in items}
+    while True:
+        for job in items:
+            if job["version"] != versions[job["id"]]:
+                render_job(job, slots[job["id"]])
+                versions[job["id"]] = job["version"]
+
+        finished = sum(job["status"] in job_service.FINISHED for job in items)
+        progress.progress(finished / len(items), text=f"{finished} / {len(items)} finished")
+        if finished == len(items):
+            break
+        items = jobs.store.wait_any(versions, timeout=1.0)
+
+    progress.empty()
+    if combine:
+        combined_summary(jobs, items)
+
+
+def combined_summary(jobs, items: list[dict]):
+    """One summary across every URL that was summarized successfully."""
+    done = [job for job in items if job["status"] == "done"]
+    if len(done) < 2:
+        return
+
+    st.subheader("Combined summary")
+    urls = [job["url"] for job in done]
+    summaries = [job["summary"] for job in done]
+    key = pipeline.combined_key(urls, summaries)
+    ctx = get_script_run_ctx()
 
     try:
-        with st.spinner("Loading content..."):
-
-            # -------- LOAD CONTENT --------
-            if "youtube.com" in generic_url or "youtu.be" in generic_url:
-                docs = load_youtube_transcript(generic_url)
-
-            elif "docs.google.com/document" in generic_url or "drive.google.com/file" in generic_url:
-                docs = load_google_drive_file(generic_url)
-
-            elif generic_url.lower().endswith(".pdf"):
-                loader = PyPDFLoader(generic_url)
-                docs = loader.load()
-
-            else:
-                loader = UnstructuredURLLoader(
-                    urls=[generic_url],
-                    ssl_verify=False,
-                    headers={
-                        "User-Agent": (
-                            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                            "AppleWebKit/537.36 (KHTML, like Gecko) "
-                            "Chrome/120.0.0.0 Safari/537.36"
-                        )
-                    },
+        with metrics.trace("combine", urls=len(urls)):
+            summary = None if bypass_cache else pipeline.lookup(cache, key)
+            if summary is not None:
+                st.caption("Served from summary cache.")
+                st.success(summary)
+                return
+
+            output = st.empty()
+
+            def write(tokens):
+                text = ""
+                for token in tokens:
+                    text += token
+                    if stream_output:
+                        output.success(text + " ▌")
+                return text
+
+            with st.spinner("Combining summaries..."):
+                summary = rate_limiter.run_in_session(
+                    ctx.session_id if ctx else None,
+                    write, pipeline.stream_combined(jobs.llm(), summaries),
                 )
-                docs = loader.load()
+            output.success(summary)
+            cache.put(key, summary)
 
-            if not docs or not docs[0].page_content.strip():
-                st.error("No readable text found at this URL.")
-                st.stop()
+    except rate_limiter.QueueTimeout as e:
+        st.warning(str(e))
+    except Exception as e:
+        st.exception(e)
 
-            # -------- SUMMARIZE --------
-            chain = load_summarize_chain(
-                llm=llm,
-                chain_type="stuff",
-                prompt=prompt,
-            )
 
-            result = chain.invoke(
-                {"input_documents": docs},
-                return_only_outputs=True,
-            )
+# ---------------- BUTTON ----------------
+jobs = get_jobs()
 
-            st.success(result["output_text"])
+if st.button("Summarize the Content from YT or Website"):
 
-    except Exception as e:
-        st.exception(e)
\ No newline at end of file
+    # Fair share of the Groq rate limit per browser session.
+    ctx = get_script_run_ctx()
+    session = ctx.session_id if ctx else None
+
+    if several:
+        text = url_list
+        if url_file is not None:
+            text += "\n" + url_file.getvalue().decode("utf-8", errors="replace")
+
+        with metrics.span("validate_url") as span:
+            urls = parse_urls(text)
+            invalid = [url for url in urls if not validators.url(url)]
+            span.set(urls=len(urls), invalid=len(invalid))
+
+        for url in invalid:
+            st.error(f"Not a valid URL: {url}")
+        urls = [url for url in urls if url not in invalid]
+        if not urls:
+            st.error("Please enter at least one valid URL")
+            st.stop()
+        if len(urls) > MAX_URLS:
+            st.warning(f"Only the first {MAX_URLS} URLs are summarized.")
+            urls = urls[:MAX_URLS]
+
+        submitted = [
+            jobs.submit(url, mode=mode, bypass=bypass_cache, session=session)
+            for url in urls
+        ]
+        st.query_params.clear()
+        st.query_params["jobs"] = ",".join(job["id"] for job in submitted)
+        if combine:
+            st.query_params["combine"] = "1"
+
+    else:
+        with metrics.span("validate_url") as span:
+            valid = validators.url(generic_url)
+            span.set_text(generic_url)
+
+        if not valid:
+            st.error("Please enter a valid URL")
+            st.stop()
+
+        # Identical in-flight requests from other sessions are joined.
+        job = jobs.submit(generic_url, mode=mode, bypass=bypass_cache, session=session)
+        st.query_params.clear()
+        st.query_params["job"] = job["id"]
+
+if "jobs" in st.query_params:
+    show_jobs(
+        jobs,
+        st.query_params["jobs"].split(","),
+        combine=st.query_params.get("combine") == "1",
+    )
+elif "job" in st.query_params:
+    show_job(jobs, st.query_params["job"])
+
+startup.mark("first_render", _start)
+
+with st.sidebar:
+    with st.expander("Jobs"):
+        st.json(jobs.store.counts())
+    with st.expander("Startup"):
+        st.json(startup.report())
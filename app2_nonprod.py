@@ -32,6 +32,11 @@ st.subheader("Summarize URL")
 generic_url = st.text_input("URL", label_visibility="collapsed")
 
 # ---------------- LLM ----------------
+# Secrets are loaded on demand (api_key_prod no longer exports on import).
+api_key_prod.load_keys("GROQ_API_KEY")
+if not api_key_prod.load_optional("LANGCHAIN_API_KEY"):
+    os.environ["LANGCHAIN_TRACING_V2"] = "0"
+
 llm = ChatGroq(
     model="llama-3.1-8b-instant",
     streaming=False,   # 🔑 REQUIRED
@@ -0,0 +1,214 @@
+# ================================
+# Batch summarizer: URLs in → JSONL out
+# ================================
+#
+# Usage:
+#   python batch_summarize.py urls.txt -o summaries.jsonl
+#   cat urls.txt | python batch_summarize.py - -o summaries.jsonl --resume
+#
+# Results are appended as each item finishes (completion order, not input
+# order). Every line is either {"status": "ok", ...} or
+# {"status": "error", "stage": "load" | "summarize", ...}.
+
+import os
+import sys
+import json
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+
+import loaders
+import metrics
+import pipeline
+import summary_cache
+
+
+# ---------------- INPUT / CHECKPOINT ----------------
+def read_urls(path: str):
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for line in stream:
+            url = line.strip()
+            if url and not url.startswith("#"):
+                yield url
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def completed_urls(output_path: str, retry_errors: bool) -> set[str]:
+    """
+    The output file doubles as the checkpoint: every URL already written
+    (successfully, or at all unless `retry_errors`) is skipped on resume.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from a crash
+            if record.get("status") == "ok" or not retry_errors:
+                done.add(record["url"])
+
+    return done
+
+
+def ends_torn(output_path: str) -> bool:
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return False
+    with open(output_path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def error_record(url: str, stage: str, exc: Exception) -> dict:
+    return {
+        "url": url,
+        "status": "error",
+        "stage": stage,
+        "error_type": type(exc).__name__,
+        "error": str(exc),
+        "traceback": traceback.format_exc(limit=5),
+    }
+
+
+# ---------------- RUNNER ----------------
+class BatchRunner:
+    """
+    Two-stage pipeline: loads run on an I/O pool, summaries on a separately
+    capped LLM pool. `max_in_flight` bounds how many loaded documents can
+    wait in memory for an LLM slot.
+    """
+
+    def __init__(self, llm, load_workers: int = 16, llm_workers: int = 4,
+                 max_in_flight: int | None = None, cache=None,
+                 mode: str = "auto"):
+        self.llm = llm
+        self.cache = cache
+        self.mode = mode
+        self.load_pool = ThreadPoolExecutor(load_workers, thread_name_prefix="load")
+        self.llm_pool = ThreadPoolExecutor(llm_workers, thread_name_prefix="llm")
+        self.slots = threading.BoundedSemaphore(
+            max_in_flight or load_workers + 2 * llm_workers
+        )
+        self.results = Queue()
+
+    def _load(self, url: str):
+        try:
+            docs = pipeline.load(url, mode=self.mode)
+        except Exception as e:
+            self._finish(error_record(url, "load", e))
+            return
+        self.llm_pool.submit(self._summarize, url, docs)
+
+    def _summarize(self, url: str, docs):
+        try:
+            with metrics.trace(url, source_type=loaders.source_type(url)) as trace:
+                summary, cache_hit = pipeline.summarize_cached(
+                    self.llm, url, docs, self.cache, mode=self.mode
+                )
+            record = {
+                "url": url,
+                "status": "ok",
+                "summary": summary,
+                "cache_hit": cache_hit,
+                "mode": self.mode,
+                "chars": sum(len(doc.page_content) for doc in docs),
+                "tokens_saved": pipeline.tokens_saved(docs),
+                "plan": trace.attrs.get("plan"),
+            }
+        except Exception as e:
+            record = error_record(url, "summarize", e)
+        self._finish(record)
+
+    def _finish(self, record: dict):
+        self.slots.release()
+        self.results.put(record)
+
+    def run(self, urls, out, skip: set[str] = frozenset()) -> dict:
+        counts = {"ok": 0, "error": 0, "skipped": 0}
+        submitted = 0
+
+        def feed():
+            nonlocal submitted
+            for url in urls:
+                if url in skip:
+                    counts["skipped"] += 1
+                    continue
+                self.slots.acquire()
+                submitted += 1
+                self.load_pool.submit(self._load, url)
+            self.results.put(None)  # end-of-input marker
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        written, feeding = 0, True
+        while feeding or written < submitted:
+            record = self.results.get()
+            if record is None:
+                feeding = False
+                continue
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record["status"]] += 1
+            written += 1
+
+        self.load_pool.shutdown()
+        self.llm_pool.shutdown()
+        return counts
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Summarize many URLs concurrently into a JSONL file."
+    )
+    parser.add_argument("input", help="file with one URL per line, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL output path")
+    parser.add_argument("--load-workers", type=int, default=16)
+    parser.add_argument("--llm-workers", type=int, default=4)
+    parser.add_argument("--resume", action="store_true",
+                        help="skip URLs already present in the output file")
+    parser.add_argument("--retry-errors", action="store_true",
+                        help="with --resume, retry URLs that previously failed")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="do not read or write the summary cache")
+    parser.add_argument("--mode", choices=list(pipeline.MODES), default="auto",
+                        help="extractive: compress long inputs to one LLM call")
+    args = parser.parse_args(argv)
+
+    # Same secret name the Streamlit app maps into GROQ_API_KEY.
+    if not os.getenv("GROQ_API_KEY") and os.getenv("GROQ_API"):
+        os.environ["GROQ_API_KEY"] = os.environ["GROQ_API"]
+
+    skip = completed_urls(args.output, args.retry_errors) if args.resume else set()
+
+    runner = BatchRunner(
+        pipeline.build_llm(),
+        load_workers=args.load_workers,
+        llm_workers=args.llm_workers,
+        cache=None if args.no_cache else summary_cache.get_cache(),
+        mode=args.mode,
+    )
+
+    if args.resume and ends_torn(args.output):
+        with open(args.output, "a", encoding="utf-8") as out:
+            out.write("\n")  # never glue a record onto a torn last line
+
+    mode = "a" if args.resume else "w"
+    with open(args.output, mode, encoding="utf-8") as out:
+        counts = runner.run(read_urls(args.input), out, skip)
+
+    print(json.dumps(counts), file=sys.stderr)
+    return 0 if counts["error"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
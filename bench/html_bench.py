@@ -0,0 +1,184 @@
+# ================================
+# Web extraction benchmark: fast path (html_extract) vs Unstructured
+# ================================
+#
+#   python bench/html_bench.py                         # synthetic pages
+#   python bench/html_bench.py --corpus saved_pages/   # your saved *.html
+#
+# Each extractor runs over the whole corpus in a fresh interpreter, so
+# import time and peak RSS are its own. Reported per page: median time,
+# extracted characters and how much of Unstructured's vocabulary the fast
+# path kept (agreement). Results are written as JSON to bench/results/.
+
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+import resource
+import statistics
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, HERE]
+
+EXTRACTORS = ["fast", "unstructured"]
+
+
+# ---------------- CORPUS ----------------
+def corpus(directory: str | None, sizes: list[int]) -> list[str]:
+    """Paths of the pages to extract (synthetic ones are written to bench/corpus/)."""
+    if directory:
+        return sorted(glob.glob(os.path.join(directory, "*.htm*")))
+
+    import standins
+
+    out = os.path.join(HERE, "corpus")
+    os.makedirs(out, exist_ok=True)
+    paths = []
+    for paragraphs in sizes:
+        path = os.path.join(out, f"synthetic-{paragraphs}.html")
+        with open(path, "wb") as f:
+            f.write(standins.make_html(paragraphs, seed=paragraphs))
+        paths.append(path)
+    return paths
+
+
+# ---------------- CELL (subprocess) ----------------
+def run_cell(extractor: str, paths: list[str], repeat: int) -> dict:
+    started = time.perf_counter()
+    if extractor == "fast":
+        import html_extract
+
+        def extract(data):
+            return html_extract.extract_html(data)[0]
+    else:
+        import io
+        import importlib
+        import html_extract
+
+        # Loaded here so its import cost lands in import_s, not page 1.
+        importlib.import_module("unstructured.partition.auto")
+
+        def extract(data):
+            return html_extract.partition(io.BytesIO(data), "text/html")[0]
+    import_s = time.perf_counter() - started
+
+    pages = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        timings, text, error = [], "", None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                text = extract(data)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                break
+            timings.append(time.perf_counter() - start)
+        pages.append({
+            "page": os.path.basename(path),
+            "bytes": len(data),
+            "ms": round(statistics.median(timings) * 1000, 2) if timings else None,
+            "chars": len(text),
+            "text": text,
+            "error": error,
+        })
+
+    return {
+        "extractor": extractor,
+        "import_s": round(import_s, 3),
+        # ru_maxrss is KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "pages": pages,
+    }
+
+
+# ---------------- ORCHESTRATOR ----------------
+def run(args) -> dict:
+    import extractive
+
+    paths = corpus(args.corpus, args.sizes)
+    if not paths:
+        sys.exit(f"No .html files in {args.corpus}")
+
+    cells = {}
+    for extractor in args.extractors:
+        config = {"extractor": extractor, "paths": paths, "repeat": args.repeat}
+        proc = subprocess.run(
+            [sys.executable, __file__, "--cell", json.dumps(config)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            cells[extractor] = {"extractor": extractor, "crashed": proc.stderr[-2000:]}
+            print(f"{extractor:<13} CRASHED {proc.stderr.strip().splitlines()[-1]}",
+                  file=sys.stderr)
+            continue
+        cells[extractor] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # Agreement: share of Unstructured's distinct words the fast path kept.
+    fast, full = cells.get("fast", {}), cells.get("unstructured", {})
+    if "pages" in fast and "pages" in full:
+        for ours, theirs in zip(fast["pages"], full["pages"]):
+            if not ours["error"] and not theirs["error"] and theirs["text"]:
+                ours["agreement"] = extractive.coverage(theirs["text"], ours["text"])
+
+    for cell in cells.values():
+        for page in cell.get("pages", []):
+            page.pop("text")
+        print_cell(cell)
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("cell", "output")},
+        "cells": list(cells.values()),
+    }
+
+
+def print_cell(cell: dict):
+    if "crashed" in cell:
+        return
+    print(f"{cell['extractor']}: import {cell['import_s']:.2f}s · "
+          f"peak RSS {cell['peak_rss_mb']} MB")
+    for page in cell["pages"]:
+        if page["error"]:
+            print(f"  {page['page']:<28} ERROR {' '.join(page['error'].split())[:100]}")
+            continue
+        agreement = page.get("agreement")
+        print(f"  {page['page']:<28} {page['bytes']:>9,} B  {page['ms']:>8.2f} ms  "
+              f"{page['chars']:>8,} chars"
+              + (f"  agreement={agreement:.2%}" if agreement is not None else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="directory of saved .html pages")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200, 1000],
+                        help="paragraph counts of the synthetic pages")
+    parser.add_argument("--extractors", nargs="+", default=EXTRACTORS, choices=EXTRACTORS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="JSON path (default bench/results/html-<time>.json)")
+    parser.add_argument("--cell", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cell:
+        config = json.loads(args.cell)
+        print(json.dumps(run_cell(config["extractor"], config["paths"], config["repeat"])))
+        return
+
+    report = run(args)
+    output = args.output or os.path.join(
+        HERE, "results", f"html-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+# ================================
+# Offline end-to-end benchmark: load → summarize against local stand-ins
+# ================================
+#
+#   python bench/run_bench.py                          # full matrix
+#   python bench/run_bench.py --sources pdf youtube --strategies stuff map_reduce
+#   python bench/run_bench.py --compare bench/results/<older>.json
+#
+# Each (source, strategy) cell runs in a fresh interpreter so peak RSS and
+# warm caches do not leak between cells. Results are written as JSON to
+# bench/results/.
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, HERE]
+
+import standins  # noqa: E402
+
+
+# ---------------- STATS ----------------
+def percentile(values: list[float], pct: float) -> float | None:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return round(ordered[int(rank) - 1], 4)
+
+
+def summarize_latencies(values: list[float]) -> dict:
+    return {
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "mean": round(sum(values) / len(values), 4) if values else None,
+    }
+
+
+# ---------------- STRATEGIES ----------------
+def _strategies():
+    """
+    Each strategy returns (summary, ttft_s, docs actually sent to the LLM).
+    """
+    import pipeline
+    import summarize_engine
+
+    def stuff(llm, docs):
+        result = pipeline.stuff_chain(llm).invoke(
+            {"input_documents": docs}, return_only_outputs=True
+        )
+        return result["output_text"], None, docs
+
+    def map_reduce(llm, docs):
+        summarizer = summarize_engine.MapReduceSummarizer(
+            llm=llm, map_prompt=pipeline.prompt
+        )
+        return summarizer.summarize(docs), None, docs
+
+    def auto(llm, docs):
+        return pipeline.summarize(llm, docs), None, docs
+
+    def stream(llm, docs):
+        timed = summarize_engine.TimedStream(pipeline.stream(llm, docs))
+        for _ in timed:
+            pass
+        return timed.text, timed.first_token_s, docs
+
+    def extractive(llm, docs):
+        compressed = pipeline.apply_mode(docs, "extractive")
+        return pipeline.summarize(llm, compressed), None, compressed
+
+    return {"stuff": stuff, "map_reduce": map_reduce, "auto": auto,
+            "stream": stream, "extractive": extractive}
+
+
+STRATEGY_NAMES = ["stuff", "map_reduce", "auto", "stream", "extractive"]
+
+
+# ---------------- CELL (runs in a subprocess) ----------------
+def run_cell(config: dict) -> dict:
+    import extractive
+    import http_client
+    import pipeline
+    import summarize_engine
+    import subtitles
+    import youtube_transcripts
+
+    content_base = config["content_base"]
+
+    # yt-dlp stand-in: canned json3 subtitles from the content server.
+    def local_json3(video_id, url, cancelled):
+        with http_client.get_client().get(f"{content_base}/json3/{video_id}.json3",
+                                          stream=True) as resp:
+            resp.raise_for_status()
+            return subtitles.parse_json3(resp.iter_content(1 << 16))
+
+    youtube_transcripts.STRATEGIES.clear()
+    youtube_transcripts.STRATEGIES["local_json3"] = local_json3
+
+    llm = pipeline.build_llm(base_url=config["llm_base"], api_key="bench",
+                             max_retries=0)
+    summarize = _strategies()[config["strategy"]]
+
+    def one(n: int) -> dict:
+        url = standins.source_url(content_base, config["source"], n)
+        start = time.perf_counter()
+        try:
+            docs = pipeline.load(url)
+            loaded = time.perf_counter()
+            summary, ttft, sent = summarize(llm, docs)
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"[:300]}
+        done = time.perf_counter()
+        text = summarize_engine.docs_text(docs)
+        sent_text = text if sent is docs else summarize_engine.docs_text(sent)
+        return {
+            "ok": True,
+            "load_s": loaded - start,
+            "summarize_s": done - loaded,
+            "total_s": done - start,
+            "ttft_s": None if ttft is None else loaded - start + ttft,
+            "input_chars": len(text),
+            "input_tokens": summarize_engine.estimate_tokens(text),
+            "llm_input_tokens": summarize_engine.estimate_tokens(sent_text),
+            # Quality proxy: content words of the input the LLM still sees.
+            "coverage": 1.0 if sent is docs else extractive.coverage(text, sent_text),
+            "summary_chars": len(summary),
+        }
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(config["concurrency"]) as pool:
+        results = list(pool.map(one, range(config["requests"])))
+    wall = time.perf_counter() - start
+
+    ok = [r for r in results if r["ok"]]
+    errors = [r["error"] for r in results if not r["ok"]]
+
+    def column(name):
+        return [r[name] for r in ok if r.get(name) is not None]
+
+    return {
+        "source": config["source"],
+        "strategy": config["strategy"],
+        "requests": config["requests"],
+        "concurrency": config["concurrency"],
+        "ok": len(ok),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_s": round(wall, 4),
+        "throughput_rps": round(len(ok) / wall, 4) if wall else None,
+        "latency_s": summarize_latencies(column("total_s")),
+        "load_s": summarize_latencies(column("load_s")),
+        "summarize_s": summarize_latencies(column("summarize_s")),
+        "ttft_s": summarize_latencies(column("ttft_s")),
+        "input_tokens_mean": (
+            round(sum(column("input_tokens")) / len(ok)) if ok else None
+        ),
+        "llm_input_tokens_mean": (
+            round(sum(column("llm_input_tokens")) / len(ok)) if ok else None
+        ),
+        "coverage_mean": (
+            round(sum(column("coverage")) / len(ok), 4) if ok else None
+        ),
+        # ru_maxrss is KiB on Linux.
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+# ---------------- ORCHESTRATOR ----------------
+def cell_env(content_base: str, cache_dir: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SUMMARY_CACHE_DIR": cache_dir,
+        "DOC_CACHE_BYPASS": "1",
+        "SUMMARY_CACHE_BYPASS": "1",
+        "GOOGLE_DOCS_BASE": f"{content_base}/docs.google.com",
+        "GOOGLE_DRIVE_BASE": f"{content_base}/drive.google.com",
+        "GROQ_RPM": "1000000",
+        "GROQ_TPM": "1000000000",
+        "HTTP_RETRIES": "0",
+        "LANGCHAIN_TRACING_V2": "0",
+    })
+    return env
+
+
+def run_matrix(args) -> dict:
+    content = standins.ContentServer(
+        pdf_pages=args.pdf_pages,
+        html_paragraphs=args.html_paragraphs,
+        doc_paragraphs=args.doc_paragraphs,
+        video_minutes=args.video_minutes,
+        latency_ms=args.origin_latency_ms,
+    ).start()
+    llm = standins.LLMServer(
+        ttft_ms=args.ttft_ms,
+        tokens_per_s=args.tokens_per_s,
+        output_tokens=args.output_tokens,
+    ).start()
+
+    cells = []
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            env = cell_env(content.base_url, cache_dir)
+            for source in args.sources:
+                for strategy in args.strategies:
+                    config = {
+                        "source": source,
+                        "strategy": strategy,
+                        "requests": args.requests,
+                        "concurrency": args.concurrency,
+                        "content_base": content.base_url,
+                        "llm_base": llm.base_url,
+                    }
+                    calls_before = llm.requests
+                    proc = subprocess.run(
+                        [sys.executable, __file__, "--cell", json.dumps(config)],
+                        env=env, capture_output=True, text=True,
+                    )
+                    if proc.returncode != 0:
+                        cell = {"source": source, "strategy": strategy,
+                                "crashed": proc.stderr[-2000:]}
+                    else:
+                        cell = json.loads(proc.stdout.strip().splitlines()[-1])
+                        cell["llm_calls_per_request"] = round(
+                            (llm.requests - calls_before) / max(1, args.requests), 2
+                        )
+                    cells.append(cell)
+                    print_cell(cell)
+    finally:
+        content.stop()
+        llm.stop()
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "llm_requests": llm.requests,
+        "cells": cells,
+    }
+
+
+def print_cell(cell: dict):
+    if "crashed" in cell:
+        print(f"{cell['source']:<13} {cell['strategy']:<11} CRASHED "
+              f"{cell['crashed'].strip().splitlines()[-1]}", file=sys.stderr)
+        return
+    lat = cell["latency_s"]
+    print(
+        f"{cell['source']:<13} {cell['strategy']:<11} "
+        f"ok={cell['ok']:<3} err={cell['errors']:<3} "
+        f"rps={cell['throughput_rps'] or 0:>7.2f} "
+        f"p50={lat['p50'] or 0:>7.3f} p95={lat['p95'] or 0:>7.3f} "
+        f"p99={lat['p99'] or 0:>7.3f} rss={cell['peak_rss_mb']:>7.1f}MB "
+        f"calls={cell.get('llm_calls_per_request', 0):>5} "
+        f"cov={cell['coverage_mean'] or 0:.2f}"
+        + (f"  first error: {cell['first_error']}" if cell["first_error"] else ""),
+        file=sys.stderr,
+    )
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(c["source"], c["strategy"]): c for c in baseline["cells"] if "latency_s" in c}
+    print("\ncell                       p50 Δ%     p95 Δ%     rps Δ%", file=sys.stderr)
+    for cell in current["cells"]:
+        prev = old.get((cell.get("source"), cell.get("strategy")))
+        if not prev or "latency_s" not in cell:
+            continue
+
+        def delta(new, was):
+            return f"{(new - was) / was * 100:+8.1f}" if new and was else "       -"
+
+        print(
+            f"{cell['source'] + '/' + cell['strategy']:<25} "
+            f"{delta(cell['latency_s']['p50'], prev['latency_s']['p50'])}  "
+            f"{delta(cell['latency_s']['p95'], prev['latency_s']['p95'])}  "
+            f"{delta(cell['throughput_rps'], prev['throughput_rps'])}",
+            file=sys.stderr,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load→summarize benchmark.")
+    parser.add_argument("--sources", nargs="+", default=standins.SOURCES,
+                        choices=standins.SOURCES)
+    parser.add_argument("--strategies", nargs="+", default=STRATEGY_NAMES,
+                        choices=STRATEGY_NAMES)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--html-paragraphs", type=int, default=40)
+    parser.add_argument("--doc-paragraphs", type=int, default=60)
+    parser.add_argument("--video-minutes", type=int, default=30)
+    parser.add_argument("--origin-latency-ms", type=float, default=20.0)
+    parser.add_argument("--ttft-ms", type=float, default=150.0)
+    parser.add_argument("--tokens-per-s", type=float, default=800.0)
+    parser.add_argument("--output-tokens", type=int, default=120)
+    parser.add_argument("--output", help="result JSON path (default: bench/results/)")
+    parser.add_argument("--compare", help="earlier result JSON to diff against")
+    parser.add_argument("--cell", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.cell:
+        print(json.dumps(run_cell(json.loads(args.cell))))
+        return 0
+
+    result = run_matrix(args)
+
+    output = args.output or os.path.join(
+        HERE, "results", f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nwrote {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(result, args.compare)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,346 @@
+# ================================
+# Local stand-ins for Groq, Google Docs/Drive, PDF/HTML sites and YouTube
+# ================================
+#
+# Everything runs on 127.0.0.1 with no API keys:
+#   LLMServer      OpenAI/Groq-compatible /chat/completions (JSON + SSE)
+#   ContentServer  HTML pages, PDFs, Google-Docs style export?format=txt,
+#                  and yt-dlp style json3 subtitle files
+
+import json
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+# ---------------- FIXTURES ----------------
+WORDS = (
+    "model data system latency request summary document transcript network "
+    "cache token stream server client result process memory queue value "
+    "team product market research policy energy health science history"
+).split()
+
+
+def sentences(count: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+        for _ in range(count)
+    ]
+
+
+def make_html(paragraphs: int, seed: int = 0) -> bytes:
+    body = "".join(
+        f"<p>{' '.join(sentences(5, seed * 1000 + i))}</p>" for i in range(paragraphs)
+    )
+    return (
+        "<!DOCTYPE html><html><head><title>Bench article</title></head><body>"
+        "<nav><a href='/'>Home</a> <a href='/about'>About</a></nav>"
+        "<div class='cookie-banner'>We use cookies. Accept all cookies.</div>"
+        f"<article><h1>Bench article {seed}</h1>{body}</article>"
+        "<footer>© Bench Corp. All rights reserved.</footer>"
+        "</body></html>"
+    ).encode("utf-8")
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    """
+    Minimal valid PDF with real text objects (Helvetica, one line per Tj).
+    """
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>"]
+    kids = " ".join(f"{3 + 2 * i} 0 R" for i in range(pages))
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {pages} >>")
+    font_ref = 3 + 2 * pages
+
+    for page in range(pages):
+        lines = sentences(lines_per_page, seed * 100000 + page)
+        ops = ["BT /F1 9 Tf 11 TL 40 760 Td"]
+        ops += [f"({_pdf_escape(line[:110])}) Tj T*" for line in lines]
+        ops.append("ET")
+        stream = "\n".join(ops)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Contents {4 + 2 * page} 0 R "
+            f"/Resources << /Font << /F1 {font_ref} 0 R >> >> >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return bytes(out)
+
+
+def make_json3(minutes: int, seed: int = 0) -> bytes:
+    """
+    Auto-caption style json3: one event every ~3 s, rolling fragments,
+    occasional [Music] tags.
+    """
+    rng = random.Random(seed)
+    events = []
+    for i in range(minutes * 20):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(4, 9))]
+        segs = [{"utf8": w if j == 0 else f" {w}"} for j, w in enumerate(words)]
+        if i % 37 == 0:
+            segs = [{"utf8": "[Music]"}]
+        events.append({"tStartMs": i * 3000, "dDurationMs": 3000, "segs": segs})
+        events.append({"tStartMs": i * 3000 + 2900, "segs": [{"utf8": "\n"}]})
+    return json.dumps({"wireMagic": "pb3", "events": events}).encode("utf-8")
+
+
+def make_doc_text(paragraphs: int, seed: int = 0) -> bytes:
+    return "\n\n".join(
+        " ".join(sentences(6, seed * 1000 + i)) for i in range(paragraphs)
+    ).encode("utf-8")
+
+
+# ---------------- URLS ----------------
+SOURCES = ["web", "pdf", "google_doc", "google_drive", "youtube"]
+
+
+def source_url(base: str, source: str, n: int) -> str:
+    """
+    URLs that the app's dispatcher routes to each loader, served locally.
+    (Google loaders must be pointed at GOOGLE_DOCS_BASE/GOOGLE_DRIVE_BASE;
+    YouTube URLs are real ones whose transcripts the bench serves locally
+    by video id.)
+    """
+    return {
+        "web": f"{base}/site/{n}.html",
+        "pdf": f"{base}/files/{n}.pdf",
+        "google_doc": f"{base}/docs.google.com/document/d/doc{n}/edit",
+        "google_drive": f"{base}/drive.google.com/file/d/file{n}/view",
+        "youtube": f"https://www.youtube.com/watch?v=vid{n}",
+    }[source]
+
+
+# ---------------- SERVERS ----------------
+class _Server:
+    def __init__(self, handler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Quiet(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ContentServer(_Server):
+    """
+    Routes:
+      /site/<n>.html                         article page
+      /files/<n>.pdf                         PDF
+      /docs.google.com/document/d/<id>/export?format=txt
+      /drive.google.com/uc?...&id=<id>       PDF download
+      /json3/<id>.json3                      subtitles
+    Content is generated on first request and kept in memory.
+    """
+
+    def __init__(self, pdf_pages: int = 20, html_paragraphs: int = 40,
+                 doc_paragraphs: int = 60, video_minutes: int = 30,
+                 latency_ms: float = 0.0):
+        self.pdf_pages = pdf_pages
+        self.html_paragraphs = html_paragraphs
+        self.doc_paragraphs = doc_paragraphs
+        self.video_minutes = video_minutes
+        self.latency_ms = latency_ms
+        self._bodies = {}
+        self._lock = threading.Lock()
+        super().__init__(_ContentHandler)
+
+    def body(self, kind: str, key: str):
+        with self._lock:
+            cache_key = (kind, key)
+            if cache_key not in self._bodies:
+                seed = abs(hash(key)) % 10000
+                self._bodies[cache_key] = {
+                    "html": lambda: (make_html(self.html_paragraphs, seed), "text/html; charset=utf-8"),
+                    "pdf": lambda: (make_pdf(self.pdf_pages, seed=seed), "application/pdf"),
+                    "doc": lambda: (make_doc_text(self.doc_paragraphs, seed), "text/plain; charset=utf-8"),
+                    "json3": lambda: (make_json3(self.video_minutes, seed), "application/json"),
+                }[kind]()
+            return self._bodies[cache_key]
+
+    def url(self, source: str, n: int) -> str:
+        return source_url(self.base_url, source, n)
+
+
+class _ContentHandler(_Quiet):
+    def do_GET(self):
+        server = self.server.owner
+        if server.latency_ms:
+            time.sleep(server.latency_ms / 1000)
+
+        parts = urlsplit(self.path)
+        path, query = parts.path, parts.query
+
+        if path.startswith("/site/"):
+            kind, key = "html", path
+        elif path.startswith("/files/"):
+            kind, key = "pdf", path
+        elif path.startswith("/docs.google.com/document/d/") and path.endswith("/export"):
+            kind, key = "doc", path
+        elif path.startswith("/drive.google.com/uc"):
+            kind, key = "pdf", query
+        elif path.startswith("/json3/"):
+            kind, key = "json3", path
+        else:
+            self._send(404, b"not found", "text/plain")
+            return
+
+        body, content_type = server.body(kind, key)
+        self._send(200, body, content_type, {"ETag": f'"{abs(hash(key))}"'})
+
+
+class LLMServer(_Server):
+    """
+    OpenAI-compatible chat completions on both /openai/v1/chat/completions
+    (what the Groq SDK calls) and /v1/chat/completions.
+
+    Latency model: `ttft_ms` before the first token (plus `prefill_tps`
+    prompt tokens per second), then `output_tokens` at `tokens_per_s`.
+    Faults: `stall_rate` of requests wait an extra `stall_ms` before the
+    first token, `error_rate` of them answer 500.
+    """
+
+    def __init__(self, ttft_ms: float = 150.0, tokens_per_s: float = 800.0,
+                 output_tokens: int = 120, prefill_tps: float = 20000.0,
+                 model: str = "stand-in", stall_rate: float = 0.0,
+                 stall_ms: float = 30000.0, error_rate: float = 0.0):
+        self.ttft_ms = ttft_ms
+        self.tokens_per_s = tokens_per_s
+        self.output_tokens = output_tokens
+        self.prefill_tps = prefill_tps
+        self.model = model
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.error_rate = error_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(_LLMHandler)
+
+    def delay_first(self, prompt_tokens: int) -> float:
+        stall = self.stall_ms if random.random() < self.stall_rate else 0.0
+        return (self.ttft_ms + stall) / 1000 + prompt_tokens / self.prefill_tps
+
+
+class _LLMHandler(_Quiet):
+    def do_POST(self):
+        server = self.server.owner
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, b"{}", "application/json")
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        prompt = " ".join(str(m.get("content", "")) for m in payload.get("messages", []))
+        prompt_tokens = len(prompt) // 4 + 1
+
+        with server._lock:
+            server.requests += 1
+
+        if random.random() < server.error_rate:
+            self._send(500, b'{"error": {"message": "stand-in failure"}}', "application/json")
+            return
+
+        words = [random.choice(WORDS) for _ in range(server.output_tokens)]
+        headers = {
+            "x-ratelimit-limit-tokens": "10000000",
+            "x-ratelimit-remaining-tokens": "10000000",
+        }
+        time.sleep(server.delay_first(prompt_tokens))
+        per_token = 1.0 / server.tokens_per_s
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+
+        if not payload.get("stream"):
+            time.sleep(per_token * len(words))
+            body = json.dumps({
+                "id": "chatcmpl-bench", "object": "chat.completion",
+                "created": created, "model": server.model,
+                "choices": [{
+                    "index": 0, "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": " ".join(words)},
+                }],
+                "usage": usage,
+            }).encode()
+            self._send(200, body, "application/json", headers)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish=None, extra=None):
+            chunk = {
+                "id": "chatcmpl-bench", "object": "chat.completion.chunk",
+                "created": created, "model": server.model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            chunk.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        try:
+            event({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                event({"content": word if i == 0 else f" {word}"})
+                time.sleep(per_token)
+            event({}, "stop", {"x_groq": {"usage": usage}, "usage": usage})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled (e.g. a hedged request that lost)
@@ -0,0 +1,186 @@
+# ================================
+# Content-defined chunks with memoized chunk summaries
+# ================================
+#
+# Chunk boundaries come from a rolling hash over the words themselves, not
+# from fixed offsets, so an edit only changes the chunks it touches: text
+# before it chunks identically, and the boundaries after it fall back
+# into step within a few words. Each chunk's summary is cached under the
+# hash of its text, so re-summarizing an edited document sends only the
+# changed chunks to the LLM and reruns the reduce step.
+
+import os
+import re
+import json
+import zlib
+import hashlib
+import itertools
+
+import metrics
+import summary_cache
+from summarize_engine import (
+    CHUNK_TOKENS, CHARS_PER_TOKEN, MapReduceSummarizer, estimate_tokens,
+)
+
+# ---------------- CONFIG ----------------
+ENABLED = os.getenv("CHUNK_MEMO", "1") != "0"
+# Source types whose documents get memoized chunking (living documents
+# that are re-summarized after small edits).
+SOURCES = [s.strip() for s in os.getenv("CHUNK_MEMO_SOURCES", "google_drive").split(",") if s.strip()]
+# Chunk sizes, in tokens. Boundaries fall between MIN and MAX, on average
+# around TARGET.
+MIN_TOKENS = int(os.getenv("CHUNK_MEMO_MIN_TOKENS", str(CHUNK_TOKENS // 4)))
+TARGET_TOKENS = int(os.getenv("CHUNK_MEMO_TARGET_TOKENS", str(CHUNK_TOKENS // 2)))
+MAX_TOKENS = int(os.getenv("CHUNK_MEMO_MAX_TOKENS", str(CHUNK_TOKENS)))
+
+_WORD = re.compile(r"\S+\s*")
+_HASH_MASK = (1 << 64) - 1
+
+
+# ---------------- CHUNKING ----------------
+def _boundary_mask(min_tokens: int, target_tokens: int) -> int:
+    """
+    Low-bit mask that matches about once per (target - min) tokens' worth
+    of words (~1.3 tokens per word).
+    """
+    words = max(1, int((target_tokens - min_tokens) / 1.3))
+    return (1 << max(1, words.bit_length() - 1)) - 1
+
+
+def split(text: str, min_tokens: int = MIN_TOKENS, target_tokens: int = TARGET_TOKENS,
+          max_tokens: int = MAX_TOKENS) -> list[str]:
+    """
+    Content-defined chunks of `text` (whitespace preserved; joining them
+    gives back `text`). A boundary follows any word where the rolling
+    hash of the preceding words has its low bits zero, once the chunk has
+    `min_tokens`; `max_tokens` forces one.
+    """
+    return list(iter_split([text], min_tokens, target_tokens, max_tokens))
+
+
+def iter_split(texts, min_tokens: int = MIN_TOKENS, target_tokens: int = TARGET_TOKENS,
+               max_tokens: int = MAX_TOKENS):
+    """
+    `split` of the texts joined by blank lines (docs_text), taking one
+    text at a time: only the chunk in progress and the current text are
+    held.
+    """
+    mask = _boundary_mask(min_tokens, target_tokens)
+    min_chars = min_tokens * CHARS_PER_TOKEN
+    max_chars = max_tokens * CHARS_PER_TOKEN
+
+    buffer, start, position, rolling = "", 0, 0, 0
+    for index, text in enumerate(itertools.chain(texts, [None])):
+        final = text is None
+        if not final:
+            buffer = f"{buffer}\n\n{text}" if index else text
+        for match in _WORD.finditer(buffer, position):
+            end = match.end()
+            if end == len(buffer) and not final:
+                break  # the next text may add to this word's trailing whitespace
+            # Shift-and-add: a word's influence on the low bits is gone after
+            # a few dozen words, which keeps boundaries local to the content.
+            rolling = ((rolling << 1) + zlib.crc32(match.group().rstrip().encode("utf-8"))) & _HASH_MASK
+            position = end
+            size = end - start
+            if size >= max_chars or (size >= min_chars and not rolling & mask):
+                yield buffer[start:end]
+                start, rolling = end, 0
+        buffer, position, start = buffer[start:], position - start, 0
+
+    if buffer.strip():
+        yield buffer
+
+
+def applies_to(source_type: str, bypass: bool = False) -> bool:
+    """
+    Whether documents of `source_type` get memoized chunking. `bypass` is
+    the request's own cache bypass (UI checkbox, job flag); a bypassed
+    request neither reuses chunk summaries nor comes from them.
+    """
+    return ENABLED and not (bypass or summary_cache.BYPASS) and source_type in SOURCES
+
+
+# ---------------- MEMO ----------------
+def chunk_key(text: str, prompt_template: str, model: str, temperature: float) -> str:
+    """Position- and URL-independent: the same chunk anywhere reuses its summary."""
+    payload = json.dumps(
+        ["chunk", prompt_template, model, float(temperature),
+         summary_cache.text_hash(text.strip())],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def docs_digest(docs) -> str:
+    """Identifies the documents' text without joining it."""
+    digest = hashlib.blake2b(digest_size=16)
+    for doc in docs:
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class MemoizedSummarizer(MapReduceSummarizer):
+    """
+    Map-reduce over content-defined chunks; chunk summaries found in
+    `cache` are reused and only the others go to the LLM.
+    """
+
+    def __init__(self, llm, map_prompt, model: str, temperature: float,
+                 cache=None, **kwargs):
+        super().__init__(llm=llm, map_prompt=map_prompt, **kwargs)
+        self.model = model
+        self.temperature = temperature
+        self.cache = cache if cache is not None else summary_cache.get_cache()
+        self.last_stats = {}
+        self._prepared = None
+
+    def key(self, chunk: str) -> str:
+        return chunk_key(chunk, self.map_prompt.template, self.model, self.temperature)
+
+    def lookup(self, chunks: list[str]) -> list[str | None]:
+        return [self.cache.get(self.key(chunk)) for chunk in chunks]
+
+    def prepare(self, docs) -> tuple[list[str], list[str | None]]:
+        """
+        (chunks, cached summary or None per chunk); kept for the next
+        `map` of the same text, so planning and running look up once.
+        """
+        digest = docs_digest(docs)
+        if self._prepared is None or self._prepared[0] != digest:
+            chunks = list(iter_split(doc.page_content for doc in docs))
+            self._prepared = (digest, chunks, self.lookup(chunks))
+        return self._prepared[1], list(self._prepared[2])
+
+    def map(self, docs) -> list[str]:
+        with metrics.span("chunk_memo") as span:
+            chunks, summaries = self.prepare(docs)
+            self._prepared = None
+            missing = [i for i, summary in enumerate(summaries) if summary is None]
+
+            self.last_stats = {
+                "chunks": len(chunks),
+                "reused": len(chunks) - len(missing),
+                "tokens_sent": sum(estimate_tokens(chunks[i]) for i in missing),
+                "tokens_reused": sum(
+                    estimate_tokens(chunk) for chunk, summary in zip(chunks, summaries)
+                    if summary is not None
+                ),
+            }
+            span.set(**self.last_stats)
+
+        if missing:
+            fresh = self._parallel(self.map_prompt, [chunks[i] for i in missing])
+            for i, summary in zip(missing, fresh):
+                summaries[i] = summary
+                self.cache.put(self.key(chunks[i]), summary)
+        return summaries
+
+    def stream(self, docs):
+        summaries = self.map(docs)
+        if len(summaries) == 1:
+            yield summaries[0]
+            return
+        yield from self._stream_call(self.reduce_prompt, self.collapse(summaries))
+
@@ -0,0 +1,307 @@
+# ================================
+# Near-duplicate document index (64-bit SimHash, persisted with NumPy)
+# ================================
+#
+#   index = dedup_index.get_index()
+#   index.add(fingerprint_docs(docs), summary_key, tag, source_id(url))
+#   index.lookup(fingerprint(other_text), tag, exclude=source_id(other_url))
+#   # -> (summary_key, distance) | None
+#
+# The same article reaches us through mirrors, syndication and URL forms
+# that canonicalization cannot fold together. Documents whose SimHash
+# fingerprints differ in at most MAX_DISTANCE of 64 bits are treated as
+# the same content and share one summary, but only across sources: a
+# near-duplicate of the same URL is an edited version of it (one new
+# sentence in a long document moves a bit or two), whose summary must
+# not be reused.
+#
+# Lookups use the pigeonhole trick: the fingerprint is cut into
+# MAX_DISTANCE + 1 bands, so a match must agree exactly on at least one
+# band. Each band has a sorted array, so a lookup is a few binary searches
+# plus popcounts over a handful of candidates, even with millions of
+# entries (49 bytes per entry in memory and on disk).
+
+import os
+import re
+import time
+import atexit
+import hashlib
+import threading
+
+import numpy as np
+
+import metrics
+from summary_cache import CACHE_DIR, fetch_key
+
+# ---------------- CONFIG ----------------
+ENABLED = os.getenv("DEDUP_INDEX", "1") != "0"
+PATH = os.getenv("DEDUP_INDEX_PATH", os.path.join(CACHE_DIR, "dedup_index.npz"))
+# Differing bits (of 64) still counted as the same document.
+MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "3"))
+# Shorter documents are not indexed: too few shingles for a stable hash.
+MIN_WORDS = int(os.getenv("DEDUP_MIN_WORDS", "150"))
+SHINGLE_WORDS = 3
+SHINGLE_BATCH = 65536
+# New entries are searched linearly until this many, then merged into
+# the sorted bands.
+MERGE_EVERY = int(os.getenv("DEDUP_MERGE_EVERY", "4096"))
+SAVE_INTERVAL = float(os.getenv("DEDUP_SAVE_INTERVAL", "30"))
+
+# `source` is source_id() of the fetch URL; 0 = unknown (older index files).
+ENTRY = np.dtype([("fingerprint", "<u8"), ("key", "S32"), ("tag", "u1"), ("source", "<u8")])
+
+_WORD = re.compile(r"\w+")
+
+
+# ---------------- FINGERPRINTS ----------------
+def source_id(url: str) -> int:
+    """Non-zero 64-bit id of the exact fetch URL (summary_cache.fetch_key)."""
+    digest = hashlib.blake2b(fetch_key(url).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+def fingerprint(text: str) -> int | None:
+    """
+    64-bit SimHash over word 3-shingles, weighted by shingle count.
+    None for texts shorter than MIN_WORDS.
+    """
+    return fingerprint_texts([text])
+
+
+def fingerprint_docs(docs) -> int | None:
+    """`fingerprint` of the documents' joined text, one document at a time."""
+    return fingerprint_texts(doc.page_content for doc in docs)
+
+
+def fingerprint_texts(texts) -> int | None:
+    """
+    `fingerprint` of texts read in sequence, as if joined by blank lines.
+    Each shingle occurrence votes once (the same as weighting distinct
+    shingles by their count), in batches of SHINGLE_BATCH, so memory
+    does not grow with the input.
+    """
+    votes = np.zeros(64, dtype=np.int64)
+    occurrences = words_seen = 0
+    tail = []  # last SHINGLE_WORDS - 1 words, for shingles across texts
+    batch = []
+
+    def flush():
+        nonlocal occurrences
+        hashes = np.fromiter(
+            (hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest() for s in batch),
+            dtype="S8", count=len(batch),
+        )
+        bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+        votes[:] += bits.sum(axis=0, dtype=np.int64)
+        occurrences += len(batch)
+        batch.clear()
+
+    for text in texts:
+        words = tail + _WORD.findall(text.lower())
+        words_seen += len(words) - len(tail)
+        for i in range(len(words) - SHINGLE_WORDS + 1):
+            batch.append(" ".join(words[i:i + SHINGLE_WORDS]))
+            if len(batch) >= SHINGLE_BATCH:
+                flush()
+        tail = words[-(SHINGLE_WORDS - 1):] if len(words) >= SHINGLE_WORDS - 1 else words
+
+    if words_seen < MIN_WORDS:
+        return None
+    if batch:
+        flush()
+    packed = np.packbits(votes * 2 > occurrences, bitorder="little")
+    return int.from_bytes(packed.tobytes(), "little")
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+# ---------------- INDEX ----------------
+class DedupIndex:
+    """
+    Fingerprint → summary-key index. Entries live in one structured NumPy
+    array; per band, a sorted copy of the band values and the matching
+    row order answer "who agrees on this band" by binary search.
+    """
+
+    def __init__(self, path: str | None = PATH, max_distance: int = MAX_DISTANCE):
+        self.path = path
+        self.bands = max_distance + 1
+        self.band_bits = 64 // self.bands
+        self.max_distance = max_distance
+
+        self._lock = threading.Lock()
+        self._entries = np.empty(0, dtype=ENTRY)
+        self._sorted = []  # per band: (sorted band values, row order)
+        # Entries not merged into the bands yet (searched linearly).
+        self._pending = np.empty(MERGE_EVERY, dtype=ENTRY)
+        self._pending_count = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._disk_mtime = None
+        self._stats = {"lookups": 0, "matches": 0, "adds": 0}
+
+        if path and os.path.exists(path):
+            self._entries = self._read(path)
+            self._disk_mtime = os.path.getmtime(path)
+        self._rebuild()
+
+    # ---- bands ----
+    def _band(self, fingerprints, band: int):
+        mask = np.uint64((1 << self.band_bits) - 1)
+        shift = np.uint64(band * self.band_bits)
+        return (np.asarray(fingerprints, dtype=np.uint64) >> shift) & mask
+
+    def _rebuild(self):
+        fingerprints = self._entries["fingerprint"]
+        self._sorted = []
+        for band in range(self.bands):
+            values = self._band(fingerprints, band)
+            order = np.argsort(values, kind="stable").astype(np.uint32)
+            self._sorted.append((values[order], order))
+
+    def _merge(self):
+        """Appends pending entries, inserting them into each sorted band."""
+        pending = self._pending[:self._pending_count]
+        rows = np.arange(len(self._entries), len(self._entries) + len(pending),
+                         dtype=np.uint32)
+        self._entries = np.concatenate([self._entries, pending])
+        for band, (values, order) in enumerate(self._sorted):
+            new = self._band(pending["fingerprint"], band)
+            by_value = np.argsort(new, kind="stable")
+            at = np.searchsorted(values, new[by_value], side="right")
+            self._sorted[band] = (np.insert(values, at, new[by_value]),
+                                  np.insert(order, at, rows[by_value]))
+        self._pending_count = 0
+
+    # ---- queries ----
+    def _candidates(self, fp: int, tag: int) -> np.ndarray:
+        rows = []
+        for band, (values, order) in enumerate(self._sorted):
+            value = self._band(fp, band)
+            lo = np.searchsorted(values, value, side="left")
+            hi = np.searchsorted(values, value, side="right")
+            rows.append(order[lo:hi])
+        found = self._entries[np.unique(np.concatenate(rows))] if rows else self._entries[:0]
+        if self._pending_count:
+            found = np.concatenate([found, self._pending[:self._pending_count]])
+        return found[found["tag"] == tag]
+
+    def lookup(self, fp: int | None, tag: int = 0,
+               exclude: int | None = None) -> tuple[str, int] | None:
+        """
+        (summary key, Hamming distance) of the closest entry, or None.
+        With `exclude` (a source_id), entries of that source, and entries
+        whose source is unknown, are not matches.
+        """
+        if fp is None:
+            return None
+        with self._lock:
+            self._stats["lookups"] += 1
+            candidates = self._candidates(fp, tag)
+            if exclude is not None:
+                source = candidates["source"]
+                candidates = candidates[(source != np.uint64(exclude)) & (source != 0)]
+            if not len(candidates):
+                return None
+            distances = _popcount(candidates["fingerprint"] ^ np.uint64(fp))
+            best = int(np.argmin(distances))
+            if distances[best] > self.max_distance:
+                return None
+            self._stats["matches"] += 1
+            return candidates["key"][best].hex(), int(distances[best])
+
+    def add(self, fp: int | None, key: str, tag: int = 0, source: int = 0):
+        if fp is None:
+            return
+        raw = bytes.fromhex(key)
+        with self._lock:
+            known = self._candidates(fp, tag)
+            if np.any((known["fingerprint"] == np.uint64(fp)) & (known["key"] == raw)
+                      & (known["source"] == np.uint64(source))):
+                return
+            self._pending[self._pending_count] = (fp, raw, tag, source)
+            self._pending_count += 1
+            self._stats["adds"] += 1
+            self._dirty = True
+            if self._pending_count == len(self._pending):
+                self._merge()
+            due = time.monotonic() - self._saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    # ---- persistence ----
+    @staticmethod
+    def _read(path: str) -> np.ndarray:
+        with np.load(path, allow_pickle=False) as data:
+            stored = data["entries"]
+        entries = np.zeros(len(stored), dtype=ENTRY)  # older files lack "source"
+        for name in stored.dtype.names:
+            entries[name] = stored[name]
+        return entries
+
+    def save(self):
+        """
+        Writes the index atomically. Entries another process saved since
+        our last read are merged in first.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            if self._pending_count:
+                self._merge()
+            if os.path.exists(self.path) and os.path.getmtime(self.path) != self._disk_mtime:
+                self._entries = np.unique(np.concatenate([self._entries, self._read(self.path)]))
+                self._rebuild()
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp, entries=self._entries)
+            os.replace(tmp, self.path)
+            self._disk_mtime = os.path.getmtime(self.path)
+            self._dirty = False
+            self._saved_at = time.monotonic()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries) + self._pending_count
+            stats["bytes"] = stats["entries"] * ENTRY.itemsize
+        return stats
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> DedupIndex:
+    """
+    One index per process, saved periodically and at exit.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DedupIndex()
+            atexit.register(_index.save)
+        return _index
+
+
+def lookup_text(text: str, tag: int = 0, url: str | None = None) -> tuple[str, int] | None:
+    return _lookup(fingerprint(text), tag, url)
+
+
+def lookup_docs(docs, tag: int = 0, url: str | None = None) -> tuple[str, int] | None:
+    """Near-duplicate of `docs` from a source other than `url`."""
+    return _lookup(fingerprint_docs(docs), tag, url)
+
+
+def _lookup(fp: int | None, tag: int, url: str | None) -> tuple[str, int] | None:
+    with metrics.span("dedup_index.lookup") as span:
+        match = get_index().lookup(fp, tag, None if url is None else source_id(url))
+        span.set(near_duplicate=match is not None,
+                 distance=match[1] if match else None)
+    return match
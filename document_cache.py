@@ -0,0 +1,353 @@
+# ================================
+# Fetched-document cache (below the summary cache)
+# ================================
+
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+import contextvars
+from dataclasses import dataclass
+from functools import cached_property
+
+from langchain_core.documents import Document
+
+import metrics
+import resource_governor
+from summary_cache import CACHE_DIR, fetch_key
+
+# ---------------- CONFIG ----------------
+MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Within this window an entry is served without contacting the origin.
+FRESH_SECONDS = int(os.getenv("DOC_CACHE_FRESH_SECONDS", "300"))
+# Entries without ETag/Last-Modified cannot be revalidated; refetch after this.
+TTL_SECONDS = int(os.getenv("DOC_CACHE_TTL", str(24 * 3600)))
+BYPASS = os.getenv("DOC_CACHE_BYPASS", "0") == "1"
+
+
+@dataclass
+class CachedDocuments:
+    body: bytes  # encoded; decoded on first use of `docs`
+    etag: str | None
+    last_modified: str | None
+    fetched_at: float
+    validated_at: float
+
+    @cached_property
+    def docs(self):
+        # A stale entry answered 200 is never decoded.
+        return _decode(self.body)
+
+    @property
+    def revalidatable(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+    def is_fresh(self, now: float | None = None) -> bool:
+        now = now or time.time()
+        if now - self.validated_at <= FRESH_SECONDS:
+            return True
+        # Nothing to revalidate with: fall back to a plain TTL.
+        return not self.revalidatable and now - self.fetched_at <= TTL_SECONDS
+
+    def conditional_headers(self) -> dict:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class _Encoder:
+    """
+    Compressed JSON lines, one document per line, added as documents
+    arrive; only the compressed bytes are held.
+    """
+
+    def __init__(self):
+        self._zlib = zlib.compressobj()
+        self._parts = []
+
+    def add(self, doc):
+        line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata},
+                          ensure_ascii=False) + "\n"
+        self._parts.append(self._zlib.compress(line.encode("utf-8")))
+
+    def finish(self) -> bytes:
+        self._parts.append(self._zlib.flush())
+        return b"".join(self._parts)
+
+
+def _encode(docs) -> bytes:
+    encoder = _Encoder()
+    for doc in docs:
+        encoder.add(doc)
+    return encoder.finish()
+
+
+def _iter_decode(blob: bytes, read_size: int = 1 << 16):
+    """Documents of an encoded body, decompressed a piece at a time."""
+    decompressor = zlib.decompressobj()
+    pending = b""
+    for offset in range(0, len(blob), read_size):
+        pending += decompressor.decompress(blob[offset:offset + read_size])
+        if offset == 0 and pending.startswith(b"["):
+            # Entry written before bodies were JSON lines: one JSON array.
+            pending += decompressor.decompress(blob[read_size:]) + decompressor.flush()
+            yield from (Document(**item) for item in json.loads(pending.decode("utf-8")))
+            return
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield Document(**json.loads(line))
+    pending += decompressor.flush()
+    if pending.strip():
+        yield Document(**json.loads(pending))
+
+
+def _decode(blob: bytes):
+    """Large bodies come back spilled (see resource_governor.spill)."""
+    return resource_governor.spill(_iter_decode(blob))
+
+
+# ---------------- CACHE ----------------
+class DocumentCache:
+    """
+    Extracted documents per source, stored compressed in SQLite together
+    with the validators (ETag / Last-Modified) the origin returned.
+    Total stored size is capped at `max_bytes` with LRU eviction.
+    """
+
+    def __init__(self, path: str | None = None, max_bytes: int = MAX_BYTES):
+        self.path = path or os.path.join(CACHE_DIR, "documents.sqlite3")
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "revalidated": 0, "misses": 0,
+                       "writes": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " source TEXT PRIMARY KEY,"
+            " body BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " fetched_at REAL NOT NULL,"
+            " validated_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_accessed"
+            " ON documents(accessed_at)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def key(source: str) -> str:
+        # Non-URL keys (e.g. "youtube:<id>") are used as-is. URLs are kept
+        # exact: two URLs that merely look alike may serve different bodies.
+        return fetch_key(source) if "://" in source else source
+
+    def get(self, source: str) -> CachedDocuments | None:
+        key = self.key(source)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, etag, last_modified, fetched_at, validated_at"
+                " FROM documents WHERE source = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE documents SET accessed_at = ? WHERE source = ?",
+                (time.time(), key),
+            )
+            self._db.commit()
+
+        body, etag, last_modified, fetched_at, validated_at = row
+        return CachedDocuments(body, etag, last_modified,
+                               fetched_at, validated_at)
+
+    def hit(self):
+        with self._lock:
+            self._stats["hits"] += 1
+
+    def mark_revalidated(self, source: str):
+        """
+        Origin answered 304 Not Modified: the stored copy is current again.
+        """
+        with self._lock:
+            self._db.execute(
+                "UPDATE documents SET validated_at = ? WHERE source = ?",
+                (time.time(), self.key(source)),
+            )
+            self._db.commit()
+            self._stats["revalidated"] += 1
+
+    def put(self, source: str, docs, etag: str | None = None,
+            last_modified: str | None = None):
+        self.put_encoded(source, _encode(docs), etag, last_modified)
+
+    def put_encoded(self, source: str, body: bytes, etag: str | None = None,
+                    last_modified: str | None = None):
+        if len(body) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO documents"
+                " (source, body, size, etag, last_modified,"
+                "  fetched_at, validated_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(source), body, len(body), etag, last_modified,
+                 now, now, now),
+            )
+            self._stats["writes"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        (total,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM documents"
+        ).fetchone()
+
+        if total <= self.max_bytes:
+            return
+
+        rows = self._db.execute(
+            "SELECT source, size FROM documents ORDER BY accessed_at"
+        )
+        victims = []
+        for source, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((source,))
+            total -= size
+
+        self._db.executemany("DELETE FROM documents WHERE source = ?", victims)
+        self._stats["evictions"] += len(victims)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM documents")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents"
+            ).fetchone()
+            stats = dict(self._stats)
+        stats["entries"] = entries
+        stats["bytes"] = total
+        return stats
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DocumentCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DocumentCache()
+        return _cache
+
+
+# ---------------- LOADER HELPERS ----------------
+# A threading.Event set by callers (pipeline.load) that need to know
+# whether the documents are likely new content: `cached_http_iter` sets
+# it before parsing a 200 response for a URL it had no entry for, or
+# whose stored validators no longer match.
+parsing = contextvars.ContextVar("doc_cache_parsing", default=None)
+
+
+def cached_load(source: str, load):
+    """
+    For sources without HTTP validators (e.g. YouTube transcripts):
+    serve from cache within TTL, otherwise call `load()` and store.
+    """
+    cache = get_cache()
+    entry = None if BYPASS else cache.get(source)
+
+    if entry is not None and entry.is_fresh():
+        cache.hit()
+        metrics.annotate(cache_hit=True, doc_cache="fresh")
+        return entry.docs
+
+    metrics.annotate(cache_hit=False, doc_cache="miss")
+    docs = load()
+    cache.put(source, docs)
+    return docs
+
+
+def cached_http_iter(source: str, session, fetch_url: str, parse,
+                     **request_kwargs):
+    """
+    Conditional GET against `fetch_url`, yielding documents.
+
+    * fresh entry → no request at all
+    * 304        → stored docs, no download, no parse
+    * 200        → documents from `parse(response)` (which may be a
+                   generator) are yielded as they are produced and stored
+                   with the new validators once parsing completes
+    """
+    cache = get_cache()
+    entry = None if BYPASS else cache.get(source)
+
+    if entry is not None and entry.is_fresh():
+        cache.hit()
+        metrics.annotate(cache_hit=True, doc_cache="fresh")
+        yield from entry.docs
+        return
+
+    headers = dict(request_kwargs.pop("headers", None) or {})
+    if entry is not None:
+        headers.update(entry.conditional_headers())
+
+    resp = session.get(fetch_url, headers=headers, **request_kwargs)
+
+    if resp.status_code == 304 and entry is not None:
+        resp.close()
+        cache.mark_revalidated(source)
+        metrics.annotate(cache_hit=True, doc_cache="revalidated")
+        yield from entry.docs
+        return
+
+    metrics.annotate(cache_hit=False, doc_cache="miss")
+    event = parsing.get()
+    if event is not None and (entry is None or entry.revalidatable):
+        event.set()
+    entry = None  # stale: its body is not needed while the new one parses
+    encoder = _Encoder()  # documents are compressed as they pass, not kept
+    try:
+        for doc in parse(resp):
+            encoder.add(doc)
+            yield doc
+    finally:
+        resp.close()  # streamed bodies hold a pooled connection until closed
+
+    cache.put_encoded(
+        source,
+        encoder.finish(),
+        etag=resp.headers.get("ETag"),
+        last_modified=resp.headers.get("Last-Modified"),
+    )
+
+
+def cached_http_load(source: str, session, fetch_url: str, parse,
+                     **request_kwargs):
+    return list(
+        cached_http_iter(source, session, fetch_url, parse, **request_kwargs)
+    )
@@ -0,0 +1,189 @@
+# ================================
+# Bounded-memory streamed downloads + page-by-page PDF extraction
+# ================================
+
+import io
+import os
+import mmap
+import tempfile
+import contextvars
+
+from langchain_core.documents import Document
+
+# ---------------- CONFIG ----------------
+MAX_DOWNLOAD_BYTES = int(os.getenv("MAX_DOWNLOAD_BYTES", str(50 * 1024 * 1024)))
+# Bodies up to this size stay in memory; larger ones go to an anonymous
+# (already unlinked) temp file that is memory-mapped for parsing.
+SPOOL_BYTES = int(os.getenv("DOWNLOAD_SPOOL_BYTES", str(8 * 1024 * 1024)))
+CHUNK_BYTES = 64 * 1024
+
+
+class PayloadTooLarge(ValueError):
+    pass
+
+
+class LoadCancelled(BaseException):
+    """
+    The load was abandoned (e.g. a stale prefetch). Not an Exception, so
+    single-flight followers take the load over instead of sharing it.
+    """
+
+
+# ---------------- CANCELLATION ----------------
+# The threading.Event of the load running in this context (set by
+# loaders.load_documents). Streamed reads check it between chunks, so
+# single-document sources (web pages, files) stop mid-download too.
+cancel_event = contextvars.ContextVar("cancel_event", default=None)
+
+
+def check_cancelled():
+    event = cancel_event.get()
+    if event is not None and event.is_set():
+        raise LoadCancelled()
+
+
+# ---------------- SNIFFING ----------------
+def sniff_kind(head: bytes) -> str:
+    """
+    Classifies a body from its first bytes: "pdf", "zip" (docx/xlsx/pptx),
+    "html" or "unknown".
+    """
+    stripped = head.lstrip()[:512].lower()
+    if head.startswith(b"%PDF-"):
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if stripped.startswith((b"<!doctype html", b"<html")) or b"<head" in stripped:
+        return "html"
+    return "unknown"
+
+
+# ---------------- STREAMED DOWNLOAD ----------------
+class Download:
+    """
+    A finished download exposed as a read-only, seekable binary stream:
+    BytesIO for small bodies, an mmap over an anonymous temp file for large.
+    """
+
+    def __init__(self, kind: str, size: int, buffer: io.BytesIO | None = None,
+                 spill=None):
+        self.kind = kind
+        self.size = size
+        self._buffer = buffer
+        self._spill = spill
+        self._map = None
+
+    def stream(self):
+        if self._buffer is not None:
+            self._buffer.seek(0)
+            return self._buffer
+        if self._map is None:
+            self._map = mmap.mmap(self._spill.fileno(), 0, access=mmap.ACCESS_READ)
+        self._map.seek(0)
+        return self._map
+
+    def fileobj(self):
+        """
+        The underlying file object, for parsers that do not accept mmap.
+        """
+        if self._buffer is not None:
+            self._buffer.seek(0)
+            return self._buffer
+        self._spill.seek(0)
+        return self._spill
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.stream().read().decode(encoding, errors="replace")
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        if self._spill is not None:
+            self._spill.close()
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capped(resp, max_bytes: int = MAX_DOWNLOAD_BYTES, reject=()) -> Download:
+    """
+    Reads a `stream=True` response in chunks.
+
+    * Content-Length above `max_bytes` is rejected before reading the body.
+    * The first chunk is sniffed; kinds listed in `reject` (e.g. "html" for
+      a login page instead of a file) abort right away with PermissionError.
+    * Bodies that grow past `max_bytes` are cut off with PayloadTooLarge.
+    """
+    declared = resp.headers.get("Content-Length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        resp.close()
+        raise PayloadTooLarge(
+            f"Remote file is {int(declared):,} bytes; limit is {max_bytes:,}."
+        )
+
+    buffer, spill, size, kind = io.BytesIO(), None, 0, None
+
+    try:
+        for chunk in resp.iter_content(CHUNK_BYTES):
+            check_cancelled()
+            if not chunk:
+                continue
+
+            if kind is None:
+                kind = sniff_kind(chunk)
+                if kind in reject:
+                    raise PermissionError(
+                        f"Expected a file but the server returned {kind}."
+                    )
+
+            size += len(chunk)
+            if size > max_bytes:
+                raise PayloadTooLarge(f"Download exceeded {max_bytes:,} bytes.")
+
+            if spill is None and size > SPOOL_BYTES:
+                spill = tempfile.TemporaryFile()
+                spill.write(buffer.getbuffer())
+                buffer = None
+            (spill or buffer).write(chunk)
+
+    except BaseException:
+        if spill is not None:
+            spill.close()
+        raise
+
+    finally:
+        resp.close()
+
+    if spill is not None:
+        spill.flush()
+        return Download(kind or "unknown", size, spill=spill)
+
+    return Download(kind or "unknown", size, buffer=buffer)
+
+
+# ---------------- PDF PAGES ----------------
+def iter_pdf_pages(stream, source: str):
+    """
+    Yields one Document per page as it is extracted, so downstream work
+    can start before the last page is parsed. Metadata matches
+    PyPDFLoader's page mode.
+    """
+    import pypdf
+
+    reader = pypdf.PdfReader(stream)
+    total_pages = len(reader.pages)
+
+    for page_number, page in enumerate(reader.pages):
+        yield Document(
+            page_content=(page.extract_text() or "").strip(),
+            metadata={
+                "source": source,
+                "page": page_number,
+                "page_label": reader.page_labels[page_number],
+                "total_pages": total_pages,
+            },
+        )
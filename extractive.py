@@ -0,0 +1,263 @@
+# ================================
+# Extractive pre-compression (vectorized TF-IDF + TextRank)
+# ================================
+#
+# Cuts a long document down to its most informative sentences, within a
+# token budget, so it can be summarized in one "stuff" call instead of a
+# multi-call map-reduce. Runs locally in milliseconds.
+
+import os
+import re
+import time
+from typing import NamedTuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+import metrics
+from summarize_engine import STUFF_TOKENS, docs_text, docs_tokens, estimate_tokens
+
+# ---------------- CONFIG ----------------
+# Compressed text budget; leaves room for the prompt inside STUFF_TOKENS.
+TOKEN_BUDGET = int(os.getenv("EXTRACTIVE_TOKENS", str(int(STUFF_TOKENS * 0.8))))
+# Above this many sentences, neighbours are merged so the similarity
+# matrix stays small (n² floats).
+MAX_SENTENCES = int(os.getenv("EXTRACTIVE_MAX_SENTENCES", "2000"))
+# Candidates more similar than this to an already picked sentence are skipped.
+REDUNDANCY = float(os.getenv("EXTRACTIVE_REDUNDANCY", "0.7"))
+# Vocabulary columns made dense at a time when computing similarities
+# (units × COLUMN_BLOCK floats), whatever the vocabulary size.
+COLUMN_BLOCK = int(os.getenv("EXTRACTIVE_COLUMN_BLOCK", "2048"))
+DAMPING = 0.85
+ITERATIONS = 50
+# Unpunctuated text (auto-captions) is cut into windows of this many words.
+WINDOW_WORDS = 30
+MAX_SENTENCE_CHARS = 400
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been
+before being below between both but by can could did do does doing down during
+each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just like me more most my myself
+no nor not now of off on once only or other our ours ourselves out over own
+really right same she should so some such than that the their theirs them
+themselves then there these they this those through to too um uh under until
+up very was we were what when where which while who whom why will with would
+yeah you your yours yourself yourselves okay oh gonna going get got know
+""".split())
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])|\n+")
+_WORD = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+# ---------------- SENTENCES ----------------
+def _windows(text: str, size: int = WINDOW_WORDS) -> list[str]:
+    words = text.split()
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+def split_sentences(text: str) -> list[str]:
+    """
+    Sentence-ish units. Pieces without punctuation (auto-captions) are
+    cut into fixed word windows instead.
+    """
+    units = []
+    for piece in _SENTENCE_END.split(text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if len(piece) > MAX_SENTENCE_CHARS:
+            units.extend(_windows(piece))
+        else:
+            units.append(piece)
+    return units
+
+
+def merge_neighbours(units: list[str], max_units: int = MAX_SENTENCES) -> list[str]:
+    if len(units) <= max_units:
+        return units
+    group = -(-len(units) // max_units)
+    return [" ".join(units[i:i + group]) for i in range(0, len(units), group)]
+
+
+# ---------------- SCORING ----------------
+class SparseRows(NamedTuple):
+    """CSR rows: row i's terms are indices[indptr[i]:indptr[i + 1]]."""
+    indptr: np.ndarray
+    indices: np.ndarray
+    data: np.ndarray
+    shape: tuple[int, int]
+
+    def row_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+
+def tfidf_matrix(units: list[str]) -> SparseRows:
+    """
+    L2-normalized TF-IDF rows (float32), one per unit, kept sparse: only
+    the terms a unit contains are stored, not units × vocabulary.
+    """
+    vocab = {}
+    indptr, cols, tfs = [0], [], []
+    for unit in units:
+        counts = {}
+        for word in _WORD.findall(unit.lower()):
+            if word not in STOPWORDS and len(word) > 1:
+                col = vocab.setdefault(word, len(vocab))
+                counts[col] = counts.get(col, 0) + 1
+        cols.extend(counts)
+        tfs.extend(counts.values())
+        indptr.append(len(cols))
+
+    n = len(units)
+    indices = np.asarray(cols, dtype=np.intp)
+    data = np.log1p(np.asarray(tfs, dtype=np.float32))
+    df = np.bincount(indices, minlength=len(vocab))
+    idf = np.log((1.0 + n) / (1.0 + df)) + 1.0
+    data *= idf.astype(np.float32)[indices]
+
+    matrix = SparseRows(np.asarray(indptr, dtype=np.intp), indices, data,
+                        (n, max(1, len(vocab))))
+    rows = matrix.row_ids()
+    norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=n)).astype(np.float32)
+    norms[norms == 0] = 1.0
+    data /= norms[rows]
+    return matrix
+
+
+def similarity_matrix(matrix: SparseRows, block: int = COLUMN_BLOCK) -> np.ndarray:
+    """
+    Cosine similarities (rows · rowsᵀ) as a dense units × units array,
+    summed over blocks of `block` vocabulary columns made dense in turn.
+    """
+    n, width = matrix.shape
+    block = max(1, min(block, width))
+    rows = matrix.row_ids()
+    order = np.argsort(matrix.indices, kind="stable")
+    bounds = np.searchsorted(matrix.indices[order],
+                             np.append(np.arange(0, width, block), width))
+
+    similarity = np.zeros((n, n), dtype=np.float32)
+    dense = np.empty((n, block), dtype=np.float32)
+    for first, start, end in zip(range(0, width, block), bounds[:-1], bounds[1:]):
+        picked = order[start:end]
+        dense.fill(0.0)
+        dense[rows[picked], matrix.indices[picked] - first] = matrix.data[picked]
+        similarity += dense @ dense.T
+    return similarity
+
+
+def textrank(similarity: np.ndarray, damping: float = DAMPING,
+             iterations: int = ITERATIONS) -> np.ndarray:
+    """PageRank over the sentence-similarity graph (power iteration)."""
+    n = similarity.shape[0]
+    weights = similarity.copy()
+    np.fill_diagonal(weights, 0.0)
+
+    out_degree = weights.sum(axis=1, keepdims=True)
+    out_degree[out_degree == 0] = 1.0
+    transition = (weights / out_degree).T
+
+    scores = np.full(n, 1.0 / n, dtype=np.float32)
+    teleport = (1.0 - damping) / n
+    for _ in range(iterations):
+        updated = teleport + damping * (transition @ scores)
+        if np.abs(updated - scores).sum() < 1e-6:
+            return updated
+        scores = updated
+    return scores
+
+
+# ---------------- COMPRESSION ----------------
+def compress(text: str, token_budget: int = TOKEN_BUDGET) -> tuple[str, dict]:
+    """
+    Returns (compressed_text, report). Text already within budget is
+    returned unchanged.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= token_budget:
+        return text, _unchanged(tokens, token_budget)
+    return compress_sentences(split_sentences(text), tokens, token_budget)
+
+
+def _unchanged(tokens: int, token_budget: int) -> dict:
+    return {"tokens_before": tokens, "token_budget": token_budget,
+            "tokens_after": tokens, "compressed": False}
+
+
+def compress_sentences(sentences, tokens_before: int,
+                       token_budget: int = TOKEN_BUDGET) -> tuple[str, dict]:
+    """
+    `compress` over sentences already split (an iterable, consumed once)
+    from a text of `tokens_before` tokens.
+    """
+    start = time.perf_counter()
+    report = {"tokens_before": tokens_before, "token_budget": token_budget}
+
+    units = merge_neighbours(list(sentences))
+    similarity = similarity_matrix(tfidf_matrix(units))
+    scores = textrank(similarity)
+
+    picked, used = [], 0
+    for index in np.argsort(-scores):
+        cost = estimate_tokens(units[index]) + 1
+        if used + cost > token_budget:
+            continue
+        if picked and similarity[index, picked].max() > REDUNDANCY:
+            continue  # says the same thing as a sentence we already have
+        picked.append(int(index))
+        used += cost
+        if token_budget - used < 8:
+            break
+
+    picked.sort()  # original order reads better and keeps chronology
+    compressed = " ".join(units[i] for i in picked)
+
+    report.update(
+        tokens_after=estimate_tokens(compressed),
+        compressed=True,
+        units=len(units),
+        units_kept=len(picked),
+        elapsed_ms=round((time.perf_counter() - start) * 1000, 2),
+    )
+    return compressed, report
+
+
+def compress_documents(docs, token_budget: int = TOKEN_BUDGET):
+    """
+    One compressed Document from all of `docs` (sources merged), plus the
+    compression report. Documents are split into sentences one at a
+    time, so a spilled input is never joined into one string.
+    """
+    with metrics.span("extractive") as span:
+        span.set_docs(docs)
+        tokens = docs_tokens(docs)
+        if tokens <= token_budget:
+            # Fits the budget, so joining it is cheap.
+            compressed, report = docs_text(docs), _unchanged(tokens, token_budget)
+        else:
+            # Documents are joined by blank lines, where sentences end anyway.
+            compressed, report = compress_sentences(
+                (sentence for doc in docs for sentence in split_sentences(doc.page_content)),
+                tokens, token_budget,
+            )
+        span.set(tokens_saved=report["tokens_before"] - report["tokens_after"],
+                 **{k: v for k, v in report.items() if k in ("units", "units_kept")})
+
+    metadata = dict(docs[0].metadata) if docs else {}
+    metadata["extractive"] = report
+    return [Document(page_content=compressed, metadata=metadata)], report
+
+
+def coverage(original: str, compressed: str) -> float:
+    """
+    Share of the original's distinct content words that survive
+    compression (unigram recall); a cheap, LLM-free quality proxy.
+    """
+    def terms(text):
+        return {w for w in _WORD.findall(text.lower()) if w not in STOPWORDS}
+
+    reference = terms(original)
+    if not reference:
+        return 1.0
+    return round(len(reference & terms(compressed)) / len(reference), 4)
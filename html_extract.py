@@ -0,0 +1,341 @@
+# ================================
+# Fast main-content extraction for web pages (Unstructured as fallback)
+# ================================
+#
+# Readability-style scoring on an lxml tree: paragraphs vote for their
+# parent (and half for their grandparent) by length and comma count, the
+# best-scoring container wins, and its similar siblings are pulled in.
+# Nav, footers, cookie banners and comment threads never score.
+#
+# The body is parsed incrementally while it downloads, so reading stops
+# at HTML_MAX_BYTES or once enough paragraph text has been collected.
+# Pages where the fast path finds too little text go to Unstructured.
+
+import io
+import os
+import re
+
+from langchain_core.documents import Document
+from lxml import etree, html as lxml_html
+
+import downloads
+import metrics
+
+# ---------------- CONFIG ----------------
+# Reading stops here; the page is parsed from what arrived so far.
+MAX_BYTES = int(os.getenv("HTML_MAX_BYTES", str(5 * 1024 * 1024)))
+# ...or once closed paragraphs hold this much text (0 = read it all).
+ENOUGH_CHARS = int(os.getenv("HTML_ENOUGH_CHARS", "400000"))
+# Less extracted text than this escalates to Unstructured.
+MIN_CHARS = int(os.getenv("HTML_MIN_CHARS", "500"))
+# "0" always uses Unstructured (the previous behaviour).
+FAST_PATH = os.getenv("HTML_FAST_PATH", "1") != "0"
+
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+MIN_PARAGRAPH_CHARS = 25
+
+DROP_TAGS = (
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas",
+    "object", "embed", "form", "button", "select", "input", "textarea",
+    "nav", "footer", "aside", "header", "menu", "dialog",
+)
+BLOCK_TAGS = frozenset((
+    "p", "div", "section", "article", "main", "pre", "blockquote", "ul", "ol",
+    "li", "dl", "dt", "dd", "table", "tr", "td", "th", "figure", "figcaption",
+    "h1", "h2", "h3", "h4", "h5", "h6", "br", "hr",
+))
+PARAGRAPH_TAGS = ("p", "pre", "td", "blockquote")
+# A div / section with none of these inside is scored as a paragraph.
+_CONTAINER_TAGS = ("p", "div", "section", "article", "table", "ul", "ol",
+                   "pre", "blockquote")
+
+TAG_SCORES = {
+    "article": 10, "main": 10, "div": 5, "section": 3, "pre": 3, "td": 3,
+    "blockquote": 3, "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3,
+    "dt": -3, "li": -3, "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5,
+    "h6": -5, "th": -5,
+}
+
+_UNLIKELY = re.compile(
+    r"banner|breadcrumb|combx|comment|community|cookie|consent|disqus|extra"
+    r"|foot|header|legends|menu|modal|related|remark|replies|rss|share"
+    r"|shoutbox|sidebar|skyscraper|social|sponsor|ad-break|agegate|pagination"
+    r"|pager|popup|subscribe|newsletter|promo|navbar|gdpr",
+    re.IGNORECASE,
+)
+_MAYBE = re.compile(r"and|article|body|column|content|main|shadow", re.IGNORECASE)
+_POSITIVE = re.compile(
+    r"article|body|content|entry|hentry|h-entry|main|page|post|text|blog|story",
+    re.IGNORECASE,
+)
+_NEGATIVE = re.compile(
+    r"-ad-|hidden|banner|combx|comment|com-|contact|foot|footnote|gdpr"
+    r"|masthead|media|meta|outbrain|promo|related|scroll|share|shoutbox"
+    r"|sidebar|skyscraper|sponsor|shopping|tags|tool|widget|cookie|subscribe",
+    re.IGNORECASE,
+)
+_CHARSET = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+
+# ---------------- READING ----------------
+def read_html(resp, max_bytes: int = MAX_BYTES, enough_chars: int = ENOUGH_CHARS):
+    """
+    Feeds a `stream=True` response into an incremental lxml parser.
+    Returns (root, body_bytes, stopped): `stopped` is None when the whole
+    body was read, else "max_bytes" or "enough_text". `root` is None if
+    nothing parseable arrived.
+    """
+    match = _CHARSET.search(resp.headers.get("Content-Type", ""))
+    parser = etree.HTMLPullParser(
+        events=("end",), tag=("p", "pre"),
+        encoding=match.group(1) if match else None,
+        remove_comments=True, remove_pis=True, no_network=True,
+    )
+    parser.set_element_class_lookup(lxml_html.HtmlElementClassLookup())
+    data, chars, stopped = bytearray(), 0, None
+
+    try:
+        for chunk in resp.iter_content(downloads.CHUNK_BYTES):
+            downloads.check_cancelled()
+            if not chunk:
+                continue
+            chunk = chunk[:max_bytes - len(data)]
+            data += chunk
+            parser.feed(chunk)
+            for _, element in parser.read_events():
+                chars += len(element.text_content())
+
+            if len(data) >= max_bytes:
+                stopped = "max_bytes"
+                break
+            if enough_chars and chars >= enough_chars:
+                stopped = "enough_text"
+                break
+    finally:
+        resp.close()
+
+    try:
+        root = parser.close() if data else None
+    except etree.LxmlError:
+        root = None
+    return root, bytes(data), stopped
+
+
+# ---------------- SCORING ----------------
+def _text(element) -> str:
+    return " ".join(element.text_content().split())
+
+
+def _class_weight(element) -> int:
+    weight = 0
+    for attr in (element.get("class"), element.get("id")):
+        if attr:
+            if _NEGATIVE.search(attr):
+                weight -= 25
+            if _POSITIVE.search(attr):
+                weight += 25
+    return weight
+
+
+def _link_density(element, text_length: int) -> float:
+    links = sum(len(_text(a)) for a in element.iter("a"))
+    return links / max(1, text_length)
+
+
+def _strip_unlikely(root):
+    etree.strip_elements(root, *DROP_TAGS, with_tail=False)
+    for element in list(root.iter()):
+        if element.tag in ("html", "body", "article", "main"):
+            continue
+        attrs = f"{element.get('class', '')} {element.get('id', '')}"
+        if (_UNLIKELY.search(attrs) and not _MAYBE.search(attrs)
+                and element.getparent() is not None):
+            element.drop_tree()
+
+
+def _paragraphs(root):
+    for element in root.iter(*PARAGRAPH_TAGS, "div", "section"):
+        if element.tag in ("div", "section") and next(
+            element.iterdescendants(*_CONTAINER_TAGS), None
+        ) is not None:
+            continue
+        yield element
+
+
+def score_candidates(root) -> dict:
+    """
+    {element: score} for every container some paragraph voted for,
+    already scaled down by link density.
+    """
+    scores = {}
+    for paragraph in _paragraphs(root):
+        text = _text(paragraph)
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+        points = 1 + text.count(",") + min(len(text) // 100, 3)
+
+        parent = paragraph.getparent()
+        grandparent = parent.getparent() if parent is not None else None
+        for node, share in ((parent, 1.0), (grandparent, 0.5)):
+            if node is None:
+                continue
+            if node not in scores:
+                scores[node] = TAG_SCORES.get(node.tag, 0) + _class_weight(node)
+            scores[node] += points * share
+
+    for node in scores:
+        scores[node] *= 1 - _link_density(node, len(node.text_content()))
+    return scores
+
+
+def _with_siblings(best, scores: dict) -> list:
+    """The winner plus siblings that look like part of the same content."""
+    parent = best.getparent()
+    if parent is None:
+        return [best]
+
+    threshold = max(10.0, scores[best] * 0.2)
+    picked = []
+    for sibling in parent:
+        if not isinstance(sibling.tag, str):
+            continue
+        if sibling is best or scores.get(sibling, 0) >= threshold:
+            picked.append(sibling)
+        elif sibling.tag == "p":
+            text = _text(sibling)
+            density = _link_density(sibling, len(text))
+            if (len(text) > 80 and density < 0.25) or (
+                density == 0 and re.search(r"\.( |$)", text)
+            ):
+                picked.append(sibling)
+    return picked
+
+
+# ---------------- TEXT ----------------
+def _render(nodes) -> str:
+    """Block elements become paragraphs; inline markup is flattened."""
+    for node in nodes:
+        for element in node.iter():
+            if element.tag in BLOCK_TAGS:
+                element.text = "\n" + (element.text or "")
+                element.tail = "\n" + (element.tail or "")
+
+    lines = (
+        " ".join(line.split())
+        for node in nodes
+        for line in node.text_content().split("\n")
+    )
+    return "\n\n".join(line for line in lines if line)
+
+
+def extract(root) -> tuple[str, dict]:
+    """
+    Main text of a parsed page, plus a report (title, candidates, score).
+    Modifies the tree.
+    """
+    title = " ".join((root.findtext(".//title") or "").split())
+    _strip_unlikely(root)
+
+    scores = score_candidates(root)
+    report = {"title": title, "candidates": len(scores)}
+
+    if scores:
+        best = max(scores, key=scores.get)
+        report["score"] = round(scores[best], 2)
+        text = _render(_with_siblings(best, scores))
+    else:
+        body = root.find(".//body")
+        text = _render([body if body is not None else root])
+
+    # Titles are often "<headline> | <site>"; keep the headline only once.
+    first_line = text.split("\n", 1)[0]
+    if title and first_line not in title and title not in first_line:
+        text = f"{title}\n\n{text}"
+    return text, report
+
+
+def extract_html(html: bytes | str) -> tuple[str, dict]:
+    """`extract` for a whole page already in memory (bench, tests)."""
+    if isinstance(html, str):
+        html = html.encode("utf-8")
+    return extract(etree.fromstring(html, lxml_html.HTMLParser(remove_comments=True)))
+
+
+# ---------------- LOADING ----------------
+def partition(fileobj, content_type: str) -> tuple[str, int]:
+    """Unstructured's partitioner; returns (text, element count)."""
+    from unstructured.partition.auto import partition as unstructured_partition
+
+    elements = unstructured_partition(file=fileobj, content_type=content_type)
+    return "\n\n".join(str(el) for el in elements), len(elements)
+
+
+def _unstructured_documents(fileobj, content_type: str, size: int, url: str,
+                            reason: str):
+    with metrics.span("unstructured.partition", bytes=size, reason=reason) as span:
+        text, elements = partition(fileobj, content_type)
+        span.set(elements=elements)
+    return [Document(page_content=text,
+                     metadata={"source": url, "extractor": "unstructured"})]
+
+
+def load_response(resp, url: str, max_bytes: int = MAX_BYTES):
+    """
+    Documents for a web response: the fast extractor for HTML, falling
+    back to Unstructured for other content types or when the fast path
+    yields less than MIN_CHARS. HTML is read up to `max_bytes`; other
+    bodies over it are rejected.
+    """
+    content_type = resp.headers.get("Content-Type", "text/html").split(";")[0].strip().lower()
+
+    if not FAST_PATH or content_type not in HTML_TYPES:
+        with metrics.span("download") as span:
+            download = downloads.read_capped(resp, max_bytes)
+            span.set(bytes=download.size)
+        with download:
+            return _unstructured_documents(
+                download.fileobj(), content_type, download.size, url,
+                reason="disabled" if FAST_PATH else "content_type",
+            )
+
+    with metrics.span("html.read") as span:
+        root, data, stopped = read_html(resp, max_bytes)
+        span.set(bytes=len(data), stopped=stopped)
+
+    text, report = "", {}
+    if root is not None:
+        with metrics.span("html.extract") as span:
+            text, report = extract(root)
+            span.set_text(text)
+            span.set(candidates=report["candidates"])
+
+    if len(text) >= MIN_CHARS:
+        return [Document(page_content=text, metadata={
+            "source": url, "title": report["title"], "extractor": "fast",
+        })]
+
+    try:
+        docs = _unstructured_documents(
+            io.BytesIO(data), "text/html", len(data), url, reason="too_little_text",
+        )
+    except Exception:
+        if not text:
+            raise
+        docs = []  # keep what the fast path found
+
+    if not docs or len(docs[0].page_content) < len(text):
+        return [Document(page_content=text, metadata={
+            "source": url, "title": report.get("title", ""), "extractor": "fast",
+        })]
+    return docs
+
+
+def load_url(url: str, headers: dict | None = None, verify: bool = True,
+             timeout: float = 30.0):
+    """`load_response` for a plain GET, without the document cache."""
+    import requests
+
+    resp = requests.get(url, headers=headers, verify=verify, stream=True,
+                        timeout=timeout)
+    resp.raise_for_status()
+    return load_response(resp, url)
@@ -0,0 +1,159 @@
+# ================================
+# Shared HTTP client (pooling, keep-alive, retries, per-host limits)
+# ================================
+
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# ---------------- CONFIG ----------------
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "16"))
+PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "8"))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+BACKOFF_JITTER = float(os.getenv("HTTP_BACKOFF_JITTER", "0.5"))
+# Longest a request waits for one of its host's PER_HOST_LIMIT slots.
+SLOT_TIMEOUT = float(os.getenv("HTTP_SLOT_TIMEOUT", "60"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HostBusy(requests.exceptions.ConnectionError):
+    """Every connection slot for the host stayed taken for SLOT_TIMEOUT."""
+
+
+def build_adapter() -> HTTPAdapter:
+    retry = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF,
+        backoff_jitter=BACKOFF_JITTER,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        # Hand the last response back instead of raising, so loaders keep
+        # their own status handling (permission errors etc.).
+        raise_on_status=False,
+    )
+    return HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=POOL_PER_HOST,
+        max_retries=retry,
+    )
+
+
+# ---------------- CLIENT ----------------
+class HttpClient:
+    """
+    One pooled session per process. Connections are kept alive across
+    Streamlit reruns and sessions; concurrent requests to the same host
+    are capped at `per_host_limit` (streamed responses hold their slot
+    until closed). A request that cannot get a slot within `slot_timeout`
+    raises HostBusy.
+    """
+
+    def __init__(self, per_host_limit: int = PER_HOST_LIMIT,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                 slot_timeout: float = SLOT_TIMEOUT):
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self.slot_timeout = slot_timeout
+        self.adapter = build_adapter()
+        self.session = self.new_session()
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self._stats = {"requests": 0, "retries": 0, "errors": 0, "busy": 0}
+
+    def new_session(self) -> requests.Session:
+        """
+        A separate Session (own cookies/headers) that still shares this
+        client's connection pool. For libraries that mutate their session.
+        """
+        session = requests.Session()
+        session.mount("https://", self.adapter)
+        session.mount("http://", self.adapter)
+        return session
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_slots[host] = slot
+            return slot
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        slot = self._slot(url)
+        if not slot.acquire(timeout=self.slot_timeout):
+            with self._lock:
+                self._stats["busy"] += 1
+            raise HostBusy(
+                f"{urlsplit(url).netloc}: all {self.per_host_limit} connections "
+                f"stayed busy for {self.slot_timeout:.0f}s",
+                request=requests.Request(method, url),
+            )
+
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except Exception:
+            slot.release()
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+
+        retries = getattr(getattr(resp.raw, "retries", None), "history", ())
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["retries"] += len(retries)
+
+        if not kwargs.get("stream"):
+            slot.release()
+            return resp
+
+        # Streamed: the connection is busy until the body is closed.
+        once = threading.Lock()
+        close = resp.close
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if once.acquire(blocking=False):
+                    slot.release()
+
+        resp.close = close_and_release
+        return resp
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["hosts"] = len(self._host_slots)
+        return stats
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
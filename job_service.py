@@ -0,0 +1,760 @@
+# ================================
+# Background summarization jobs (SQLite store, worker pool, HTTP/JSON API)
+# ================================
+#
+# Submitting returns a job id at once; workers run load → summarize and
+# write progress (stage, streamed partial summary) back to the store, where
+# the UI and the HTTP API poll or subscribe to it. Jobs live in SQLite, so
+# they survive restarts, and any number of processes can share one store:
+#
+#   python job_service.py --workers 8 --port 8502    # workers + API only
+#
+#   POST /jobs                 {"url": ..., "mode": "auto", "bypass": false}
+#   GET  /jobs/<id>            current state
+#   GET  /jobs/<id>?version=N&wait=30   long poll: returns once version > N
+#   GET  /jobs/<id>/events     server-sent events until the job finishes
+#   GET  /jobs                 most recent jobs
+#   DELETE /jobs/<id>          give up on a job (stops once every submitter has)
+#
+# Identical requests (same URL, mode and cache bypass) submitted
+# while a job is queued or running join that job instead of starting another.
+
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import loaders
+import long_summarize
+import metrics
+import pipeline
+import rate_limiter
+import summarize_engine
+import summary_cache
+from summary_cache import CACHE_DIR
+
+# ---------------- CONFIG ----------------
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(CACHE_DIR, "jobs.sqlite3"))
+WORKERS = int(os.getenv("JOB_WORKERS", "4"))  # 0 = submit only (external workers)
+API_PORT = int(os.getenv("JOB_API_PORT", "0"))  # 0 = no HTTP API in this process
+# The API has no authentication: it listens on loopback unless
+# JOB_API_PUBLIC=1 explicitly allows another address (e.g. 0.0.0.0 behind
+# an authenticating proxy).
+API_HOST = os.getenv("JOB_API_HOST", "127.0.0.1")
+API_PUBLIC = os.getenv("JOB_API_PUBLIC", "0") == "1"
+# A running job whose worker has not checked in for this long is requeued.
+STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", "60"))
+MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+RETENTION_SECONDS = int(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+# Streamed partial summaries are written at most this often.
+PARTIAL_INTERVAL = 0.25
+POLL_INTERVAL = 0.5
+HEARTBEAT_INTERVAL = 10.0
+
+FINISHED = ("done", "error", "cancelled")
+IN_FLIGHT = ("queued", "running")
+
+COLUMNS = [
+    "id", "url", "mode", "bypass", "session", "status", "stage", "summary",
+    "partial", "error", "error_type", "traceback", "cache_hit",
+    "first_token_s", "load_s", "summarize_s", "trace", "attempts", "worker",
+    "created_at", "started_at", "updated_at", "finished_at", "heartbeat_at",
+    "version", "flight_key", "watchers", "cancel_requested", "progress",
+]
+
+# Added after the first release; created on open for older stores.
+MIGRATIONS = {
+    "flight_key": "TEXT",
+    "watchers": "INTEGER NOT NULL DEFAULT 1",
+    "cancel_requested": "INTEGER NOT NULL DEFAULT 0",
+    "progress": "REAL",  # 0..1, long-document mode only
+}
+
+
+def flight_key(url: str, mode: str, bypass: bool) -> str:
+    """
+    Requests with the same key share one job while it is in flight. The
+    URL is the exact fetch URL: a joined job only loads the leader's.
+    """
+    return json.dumps([summary_cache.fetch_key(url), mode, bool(bypass),
+                       pipeline.MODEL_NAME, pipeline.prompt_template])
+
+
+class JobCancelled(RuntimeError):
+    """Every submitter of a running job cancelled it."""
+
+
+# ---------------- STORE ----------------
+class JobStore:
+    """
+    Jobs table in SQLite (WAL). Every write bumps `version`, which is what
+    pollers wait on; in-process waiters are woken directly, other processes
+    see the change on their next poll.
+    """
+
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._db = sqlite3.connect(path, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " mode TEXT NOT NULL DEFAULT 'auto',"
+            " bypass INTEGER NOT NULL DEFAULT 0,"
+            " session TEXT,"
+            " status TEXT NOT NULL,"
+            " stage TEXT NOT NULL,"
+            " summary TEXT, partial TEXT,"
+            " error TEXT, error_type TEXT, traceback TEXT,"
+            " cache_hit INTEGER,"
+            " first_token_s REAL, load_s REAL, summarize_s REAL,"
+            " trace TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " worker TEXT,"
+            " created_at REAL NOT NULL, started_at REAL,"
+            " updated_at REAL NOT NULL, finished_at REAL, heartbeat_at REAL,"
+            " version INTEGER NOT NULL DEFAULT 0)"
+        )
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, definition in MIGRATIONS.items():
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(status, created_at)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_flight ON jobs(flight_key, status)"
+        )
+
+    @staticmethod
+    def _row(row) -> dict | None:
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS, row))
+        job["bypass"] = bool(job["bypass"])
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        if job["cache_hit"] is not None:
+            job["cache_hit"] = bool(job["cache_hit"])
+        if job["trace"]:
+            job["trace"] = json.loads(job["trace"])
+        return job
+
+    def _select(self, where: str, args=()) -> list[dict]:
+        rows = self._db.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM jobs {where}", args
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def create(self, url: str, mode: str = "auto", bypass: bool = False,
+               session: str | None = None, key: str | None = None) -> tuple[dict, bool]:
+        """
+        Returns (job, joined). With a `key`, an identical job that is still
+        queued or running is joined (one more watcher) instead of creating
+        a new one; the check and insert are one write transaction, so this
+        holds across processes too.
+        """
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        joined = False
+
+        with self._changed:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = None
+                if key is not None:
+                    row = self._db.execute(
+                        "SELECT id FROM jobs WHERE flight_key = ?"
+                        " AND status IN ('queued', 'running') AND cancel_requested = 0"
+                        " ORDER BY created_at LIMIT 1",
+                        (key,),
+                    ).fetchone()
+
+                if row is not None:
+                    job_id, joined = row[0], True
+                    self._db.execute(
+                        "UPDATE jobs SET watchers = watchers + 1,"
+                        " version = version + 1 WHERE id = ?",
+                        (job_id,),
+                    )
+                else:
+                    self._db.execute(
+                        "INSERT INTO jobs (id, url, mode, bypass, session, status,"
+                        " stage, created_at, updated_at, flight_key)"
+                        " VALUES (?, ?, ?, ?, ?, 'queued', 'queued', ?, ?, ?)",
+                        (job_id, url, mode, int(bypass), session, now, now, key),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._changed.notify_all()
+
+        return self.get(job_id), joined
+
+    def cancel(self, job_id: str) -> dict | None:
+        """
+        One watcher gives up on the job. The work only stops when the last
+        watcher leaves: a queued job is cancelled at once, a running one is
+        flagged and stopped by its worker at the next checkpoint.
+        """
+        now = time.time()
+        with self._changed:
+            self._db.execute(
+                "UPDATE jobs SET watchers = MAX(0, watchers - 1),"
+                " version = version + 1 WHERE id = ? AND status IN ('queued', 'running')",
+                (job_id,),
+            )
+            self._db.execute(
+                "UPDATE jobs SET status = 'cancelled', stage = 'done',"
+                " finished_at = ?, updated_at = ?"
+                " WHERE id = ? AND status = 'queued' AND watchers = 0",
+                (now, now, job_id),
+            )
+            self._db.execute(
+                "UPDATE jobs SET cancel_requested = 1"
+                " WHERE id = ? AND status = 'running' AND watchers = 0",
+                (job_id,),
+            )
+            self._changed.notify_all()
+        return self.get(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            jobs = self._select("WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def recent(self, limit: int = 50) -> list[dict]:
+        with self._lock:
+            return self._select("ORDER BY created_at DESC LIMIT ?", (limit,))
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = fields["heartbeat_at"] = time.time()
+        if isinstance(fields.get("trace"), (dict, list)):
+            fields["trace"] = json.dumps(fields["trace"], default=str)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._changed:
+            self._db.execute(
+                f"UPDATE jobs SET {assignments}, version = version + 1 WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+            self._changed.notify_all()
+
+    def claim(self, worker: str) -> dict | None:
+        """
+        Atomically moves the oldest queued job to running (any process):
+        select and update are one write transaction, like `create`.
+        """
+        now = time.time()
+        with self._changed:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued'"
+                    " ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE jobs SET status = 'running', stage = 'starting',"
+                        " worker = ?, attempts = attempts + 1, started_at = ?,"
+                        " updated_at = ?, heartbeat_at = ?, version = version + 1"
+                        " WHERE id = ?",
+                        (worker, now, now, now, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            if row is None:
+                return None
+            self._changed.notify_all()
+            jobs = self._select("WHERE id = ?", (row[0],))
+        return jobs[0] if jobs else None
+
+    def heartbeat(self, job_ids):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ?",
+                [(now, job_id) for job_id in job_ids],
+            )
+
+    def recover(self, stale_seconds: float = STALE_SECONDS,
+                max_attempts: int = MAX_ATTEMPTS) -> int:
+        """
+        Requeues running jobs whose worker stopped checking in (crash,
+        restart); jobs that already used `max_attempts` fail instead.
+        """
+        now = time.time()
+        cutoff = now - stale_seconds
+        with self._changed:
+            failed = self._db.execute(
+                "UPDATE jobs SET status = 'error', stage = 'done',"
+                " error = 'Worker died too many times while running this job.',"
+                " error_type = 'WorkerLost', finished_at = ?, updated_at = ?,"
+                " version = version + 1"
+                " WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (now, now, cutoff, max_attempts),
+            ).rowcount
+            requeued = self._db.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', partial = NULL,"
+                " updated_at = ?, version = version + 1"
+                " WHERE status = 'running' AND heartbeat_at < ?",
+                (now, cutoff),
+            ).rowcount
+            if failed or requeued:
+                self._changed.notify_all()
+        return requeued
+
+    def purge(self, retention: int = RETENTION_SECONDS):
+        with self._lock:
+            self._db.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))})"
+                " AND finished_at < ?",
+                (*FINISHED, time.time() - retention),
+            )
+
+    def wait(self, job_id: str, version: int = -1,
+             timeout: float = 30.0) -> dict | None:
+        """
+        Returns the job once its version is newer than `version` (or it
+        finished), or the current state after `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["version"] > version or job["status"] in FINISHED:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(POLL_INTERVAL, remaining))
+
+    def get_many(self, job_ids) -> list[dict]:
+        """Jobs in the order of `job_ids` (unknown ids are skipped)."""
+        job_ids = list(job_ids)
+        with self._lock:
+            jobs = self._select(
+                f"WHERE id IN ({', '.join('?' * len(job_ids))})", job_ids
+            )
+        by_id = {job["id"]: job for job in jobs}
+        return [by_id[job_id] for job_id in job_ids if job_id in by_id]
+
+    def wait_any(self, versions: dict, timeout: float = 30.0) -> list[dict]:
+        """
+        Like `wait` for several jobs ({job_id: last seen version}): returns
+        all of them as soon as any one has changed, or after `timeout`.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            jobs = self.get_many(versions)
+            if any(job["version"] > versions[job["id"]] for job in jobs) or all(
+                job["status"] in FINISHED for job in jobs
+            ):
+                return jobs
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return jobs
+            with self._changed:
+                self._changed.wait(min(POLL_INTERVAL, remaining))
+
+    def counts(self) -> dict:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return dict(rows)
+
+
+# ---------------- WORKERS ----------------
+class JobService:
+    """
+    Thread-based worker pool over a JobStore. Work is I/O bound (HTTP,
+    Groq), so threads share the process-wide HTTP pool, caches and rate
+    limiter; scale out by starting more processes on the same store.
+    """
+
+    def __init__(self, store: JobStore, llm_factory, workers: int = WORKERS,
+                 cache=None):
+        self.store = store
+        self.llm_factory = llm_factory
+        self.cache = cache
+        self.workers = workers
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._llm = None
+        self._llm_lock = threading.Lock()
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def llm(self):
+        with self._llm_lock:
+            if self._llm is None:
+                self._llm = self.llm_factory()
+            return self._llm
+
+    def start(self):
+        if self._threads:
+            return self
+        self.store.recover()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name=f"job-worker-{i}")
+            thread.start()
+            self._threads.append(thread)
+        if self.workers:
+            thread = threading.Thread(target=self._housekeeping, daemon=True,
+                                      name="job-heartbeat")
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def submit(self, url: str, mode: str = "auto", bypass: bool = False,
+               session: str | None = None) -> dict:
+        if mode not in pipeline.MODES:
+            raise ValueError(f"Unknown summarization mode: {mode}")
+        job, joined = self.store.create(
+            url, mode, bypass, session, key=flight_key(url, mode, bypass)
+        )
+        if not joined:
+            self._wake.set()
+        return job
+
+    def cancel(self, job_id: str) -> dict | None:
+        return self.store.cancel(job_id)
+
+    # ----- loop -----
+    def _work(self):
+        while not self._stop.is_set():
+            job = self.store.claim(self.name)
+            if job is None:
+                # Other processes may enqueue too: poll, but wake on local submits.
+                self._wake.wait(POLL_INTERVAL)
+                self._wake.clear()
+                continue
+
+            with self._running_lock:
+                self._running.add(job["id"])
+            try:
+                self._run(job)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job["id"])
+
+    def _housekeeping(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._running_lock:
+                running = list(self._running)
+            try:
+                if running:
+                    self.store.heartbeat(running)
+                self.store.recover()
+                self.store.purge()
+            except sqlite3.Error:
+                pass  # store busy; try again next tick
+
+    def _run(self, job: dict):
+        job_id = job["id"]
+        url = job["url"]
+
+        with metrics.trace(url, job_id=job_id,
+                           source_type=loaders.source_type(url)) as trace:
+            try:
+                result = rate_limiter.run_in_session(
+                    job["session"] or job_id, self._pipeline, job
+                )
+            except JobCancelled as e:
+                result = {"status": "cancelled", "error": str(e),
+                          "error_type": type(e).__name__}
+            except Exception as e:
+                result = {
+                    "status": "error",
+                    "error": str(e),
+                    "error_type": type(e).__name__,
+                    "traceback": traceback.format_exc(limit=8),
+                }
+
+        # Final state and trace in one write: pollers see both at once.
+        self.store.update(
+            job_id, stage="done", partial=None, finished_at=time.time(),
+            trace=trace.to_dict(), **result,
+        )
+
+    def _checkpoint(self, job_id: str):
+        if self.store.cancel_requested(job_id):
+            raise JobCancelled("Cancelled by every requester.")
+
+    def _pipeline(self, job: dict) -> dict:
+        early = None
+        if pipeline.maps_early(job["url"], job["mode"], job["bypass"]):
+            early = pipeline.early_map(self.llm(), job["url"], job["mode"], job["bypass"])
+        try:
+            return self._summarize(job, early)
+        finally:
+            if early is not None:
+                early.close()
+
+    def _summarize(self, job: dict, early=None) -> dict:
+        """
+        Load, summary-cache lookup, then the streamed summary; `early`
+        (pipeline.early_map) starts map calls while pages are extracted.
+        """
+        job_id = job["id"]
+        url, mode = job["url"], job["mode"]
+
+        self._checkpoint(job_id)
+        self.store.update(job_id, stage="load")
+        start = time.perf_counter()
+        docs = pipeline.load(url, mode=mode, early=early)
+        load_s = time.perf_counter() - start
+
+        key = pipeline.cache_key(url, docs, mode)
+        summary = None
+        if self.cache is not None and not job["bypass"]:
+            summary = pipeline.lookup_summary(self.cache, key, url, docs, mode)
+
+        if summary is not None:
+            return {"status": "done", "summary": summary, "cache_hit": True,
+                    "load_s": load_s, "summarize_s": 0.0}
+
+        self._checkpoint(job_id)
+        self.store.update(job_id, stage="summarize", load_s=load_s)
+
+        def progress(done: int, total: int, summary: str):
+            # Long-document mode: rolling summary so far as the partial.
+            self._checkpoint(job_id)
+            self.store.update(job_id, progress=done / total, partial=summary)
+
+        token = long_summarize.current_progress.set(progress)
+        try:
+            timed = summarize_engine.TimedStream(
+                pipeline.stream_shared(self.llm(), url, docs, mode, key,
+                                       bypass=job["bypass"], early=early)
+            )
+            last_write = 0.0
+            for _ in timed:
+                now = time.monotonic()
+                if now - last_write >= PARTIAL_INTERVAL:
+                    self._checkpoint(job_id)  # leaving the loop closes the shared stream
+                    self.store.update(job_id, partial=timed.text)
+                    last_write = now
+        finally:
+            long_summarize.current_progress.reset(token)
+
+        summary = timed.text
+        if self.cache is not None:
+            pipeline.store_summary(self.cache, key, url, docs, mode, summary)
+
+        return {"status": "done", "summary": summary, "cache_hit": False,
+                "load_s": load_s, "first_token_s": timed.first_token_s,
+                "summarize_s": timed.total_s}
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service(llm_factory=None, workers: int = WORKERS) -> JobService:
+    """
+    One store + worker pool per process. `llm_factory` is only called
+    when the first job needs a summary.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = JobService(
+                JobStore(), llm_factory or pipeline.build_llm, workers,
+                cache=summary_cache.get_cache(),
+            ).start()
+        return _service
+
+
+def public(job: dict | None) -> dict | None:
+    """API view of a job (no internal bookkeeping)."""
+    if job is None:
+        return None
+    hidden = ("traceback", "heartbeat_at", "worker", "session", "flight_key")
+    return {k: v for k, v in job.items() if k not in hidden}
+
+
+# ---------------- HTTP API ----------------
+class _JobHandler(BaseHTTPRequestHandler):
+    service = None  # set by serve()
+
+    def _json(self, status: int, body):
+        data = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if urlsplit(self.path).path.rstrip("/") != "/jobs":
+            return self._json(404, {"error": "not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            job = self.service.submit(
+                body["url"], body.get("mode", "auto"), bool(body.get("bypass")),
+            )
+        except (KeyError, ValueError) as e:
+            return self._json(400, {"error": str(e)})
+        self._json(202, public(job))
+
+    def do_DELETE(self):
+        path = urlsplit(self.path).path.strip("/").split("/")
+        if len(path) != 2 or path[0] != "jobs":
+            return self._json(404, {"error": "not found"})
+        job = self.service.cancel(path[1])
+        if job is None:
+            return self._json(404, {"error": "unknown job"})
+        self._json(200, public(job))
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = parts.path.strip("/").split("/")
+        query = parse_qs(parts.query)
+        store = self.service.store
+
+        if path == ["jobs"]:
+            return self._json(200, [public(job) for job in store.recent()])
+
+        if len(path) == 2 and path[0] == "jobs":
+            if "wait" in query:
+                try:
+                    version = int(query.get("version", ["-1"])[0])
+                    wait = float(query["wait"][0])
+                except ValueError:
+                    wait = None
+                if wait is None or not wait >= 0:  # also rejects NaN
+                    return self._json(400, {
+                        "error": "version must be an integer and wait a number of seconds"
+                    })
+                job = store.wait(path[1], version, min(60.0, wait))
+            else:
+                job = store.get(path[1])
+            if job is None:
+                return self._json(404, {"error": "unknown job"})
+            return self._json(200, public(job))
+
+        if len(path) == 3 and path[0] == "jobs" and path[2] == "events":
+            return self._events(path[1])
+
+        self._json(404, {"error": "not found"})
+
+    def _events(self, job_id: str):
+        store = self.service.store
+        job = store.get(job_id)
+        if job is None:
+            return self._json(404, {"error": "unknown job"})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        version = -1
+        try:
+            while job is not None:
+                if job["version"] > version:
+                    version = job["version"]
+                    self.wfile.write(
+                        f"data: {json.dumps(public(job), default=str)}\n\n".encode("utf-8")
+                    )
+                    self.wfile.flush()
+                if job["status"] in FINISHED:
+                    break
+                job = store.wait(job_id, version, timeout=15.0)
+                if job is not None and job["version"] == version:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(service: JobService, port: int = API_PORT, host: str = API_HOST,
+          public: bool = API_PUBLIC):
+    """
+    Starts the HTTP/JSON API on a daemon thread; returns the server.
+    Non-loopback hosts need `public` (JOB_API_PUBLIC=1).
+    """
+    metrics.require_loopback(host, public, "JOB_API_PUBLIC")
+    handler = type("JobHandler", (_JobHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True,
+                     name="job-api").start()
+    return server
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run summarization job workers and the jobs HTTP API."
+    )
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--port", type=int, default=API_PORT or 8502,
+                        help="HTTP API port (0 = workers only)")
+    parser.add_argument("--host", default=API_HOST,
+                        help="HTTP API address (loopback unless --public)")
+    parser.add_argument("--public", action="store_true", default=API_PUBLIC,
+                        help="allow a non-loopback --host (the API has no auth)")
+    args = parser.parse_args(argv)
+
+    # Same secret name the Streamlit app maps into GROQ_API_KEY.
+    if not os.getenv("GROQ_API_KEY") and os.getenv("GROQ_API"):
+        os.environ["GROQ_API_KEY"] = os.environ["GROQ_API"]
+
+    service = get_service(workers=args.workers)
+    metrics.serve()
+
+    if args.port:
+        server = serve(service, args.port, args.host, args.public)
+        print(f"jobs API on http://{args.host}:{server.server_address[1]}/jobs",
+              file=sys.stderr)
+    print(f"{args.workers} workers on {service.store.path}", file=sys.stderr)
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        service.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
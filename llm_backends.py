@@ -0,0 +1,465 @@
+# ================================
+# Hedged LLM backends with per-backend circuit breakers
+# ================================
+#
+#   LLM_FALLBACKS="llama-3.3-70b-versatile,llama3@http://localhost:8000/v1"
+#   llm = pipeline.build_llm()     # -> HedgedChatModel over Groq + fallbacks
+#
+# Every backend is an OpenAI-compatible /chat/completions endpoint (Groq
+# included). A request goes to the first backend whose breaker is closed;
+# if no token has arrived after that backend's usual time-to-first-token
+# (HEDGE_PERCENTILE of its recent calls), the same request is also sent to
+# the next one. The first backend to produce a token wins, the others are
+# cancelled. Errors before the first token fall through to the next
+# backend immediately.
+#
+# The caller's rate_limiter ticket pays for one request on the Groq
+# account. Any further attempt on that account (a "model" fallback) needs
+# its own ticket, taken only if the budget has room right now; otherwise
+# that backend is skipped. Fallbacks on other servers are not limited.
+#
+# A backend that keeps failing (errors, or losing a hedge after running
+# past its threshold) trips its breaker: for BREAKER_COOLDOWN_S requests
+# skip it, then one probe request decides whether it is closed again.
+
+import os
+import json
+import time
+import queue
+import threading
+import contextvars
+from collections import deque
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, convert_to_openai_messages
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+import metrics
+import rate_limiter
+
+# ---------------- CONFIG ----------------
+# Comma-separated "model" (same Groq account) or "model@base_url" (any
+# OpenAI-compatible server, base_url ending in /v1). Empty = no hedging.
+FALLBACKS = [s.strip() for s in os.getenv("LLM_FALLBACKS", "").split(",") if s.strip()]
+FALLBACK_API_KEY_ENV = os.getenv("LLM_FALLBACK_API_KEY_ENV", "LLM_FALLBACK_API_KEY")
+GROQ_BASE = os.getenv("GROQ_API_BASE", "https://api.groq.com")
+
+# Hedge once the primary is slower than this percentile of its recent
+# time-to-first-token, clamped to [MIN, MAX] seconds. Until MIN_SAMPLES
+# calls have been seen, DEFAULT seconds.
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_S = float(os.getenv("LLM_HEDGE_DEFAULT_S", "2.0"))
+HEDGE_MIN_S = float(os.getenv("LLM_HEDGE_MIN_S", "0.25"))
+HEDGE_MAX_S = float(os.getenv("LLM_HEDGE_MAX_S", "10"))
+TTFT_WINDOW = 200
+
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN_S = float(os.getenv("LLM_BREAKER_COOLDOWN_S", "30"))
+
+# Per-backend read timeout: a backend silent for this long has failed.
+READ_TIMEOUT_S = float(os.getenv("LLM_READ_TIMEOUT_S", "60"))
+
+
+class BackendError(RuntimeError):
+    """Non-2xx answer from a backend (status_code set, like the SDK errors)."""
+
+    def __init__(self, backend: str, status_code: int, body: str = ""):
+        super().__init__(f"{backend}: HTTP {status_code} {body[:200]}")
+        self.status_code = status_code
+
+
+class NoBackendAvailable(RuntimeError):
+    """Every backend's breaker is open."""
+
+
+# ---------------- CIRCUIT BREAKER ----------------
+class CircuitBreaker:
+    """
+    closed     requests pass; BREAKER_FAILURES failures in a row open it
+    open       requests skip the backend until the cooldown has passed
+    half_open  one probe request passes; its outcome closes or reopens it
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown_s: float = BREAKER_COOLDOWN_S):
+        self.failures = failures
+        self.cooldown_s = cooldown_s
+        self.state = "closed"
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown_s:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self._consecutive = 0
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self.state == "half_open" or self._consecutive >= self.failures:
+                if self.state != "open":
+                    self.opened += 1
+                self.state = "open"
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """A probe that ended without a verdict (cancelled) frees the slot."""
+        with self._lock:
+            self._probing = False
+
+
+# ---------------- BACKENDS ----------------
+class Backend:
+    """
+    One OpenAI-compatible chat completions endpoint and model, with its
+    breaker and recent time-to-first-token samples.
+    """
+
+    def __init__(self, name: str, base_url: str, model: str, api_key: str | None = None,
+                 event_hooks: dict | None = None, rate_limited: bool = False):
+        import httpx
+
+        self.name = name
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.model = model
+        self.api_key = api_key
+        # Requests draw on the Groq account paced by rate_limiter.
+        self.rate_limited = rate_limited
+        self.breaker = CircuitBreaker()
+        self.client = httpx.Client(
+            timeout=httpx.Timeout(READ_TIMEOUT_S, connect=10.0),
+            event_hooks=event_hooks or {},
+        )
+        self._lock = threading.Lock()
+        self._ttft = deque(maxlen=TTFT_WINDOW)
+        self._stats = {"requests": 0, "wins": 0, "errors": 0, "slow": 0, "cancelled": 0,
+                       "no_budget": 0}
+
+    def request(self, messages: list[dict], temperature: float):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return self.client.build_request("POST", self.url, headers=headers, json={
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "stream": True,
+        })
+
+    def hedge_after(self) -> float:
+        """Seconds without a first token before a hedge is sent."""
+        with self._lock:
+            samples = sorted(self._ttft)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_S
+        at = samples[min(len(samples) - 1, int(len(samples) * HEDGE_PERCENTILE / 100))]
+        return min(HEDGE_MAX_S, max(HEDGE_MIN_S, at))
+
+    def record(self, outcome: str, ttft_s: float | None = None):
+        with self._lock:
+            self._stats[outcome] += 1
+            if ttft_s is not None:
+                self._ttft.append(ttft_s)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            samples = sorted(self._ttft)
+        if samples:
+            stats["ttft_p50_s"] = round(samples[len(samples) // 2], 3)
+            stats["ttft_p95_s"] = round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3)
+        stats["hedge_after_s"] = round(self.hedge_after(), 3)
+        stats["model"] = self.model
+        stats["breaker"] = self.breaker.state
+        stats["breaker_opened"] = self.breaker.opened
+        return stats
+
+
+def _events(response):
+    """(content, usage) per SSE chunk of a streamed chat completion."""
+    for line in response.iter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        chunk = json.loads(data)
+        usage = chunk.get("usage") or (chunk.get("x_groq") or {}).get("usage")
+        choices = chunk.get("choices") or [{}]
+        yield (choices[0].get("delta") or {}).get("content") or "", usage
+
+
+class _Attempt:
+    """One request to one backend, run on its own thread."""
+
+    def __init__(self, backend: Backend, request, events: queue.Queue, ticket=None):
+        self.backend = backend
+        self.started = time.monotonic()
+        self.hedged = False  # a later backend was sent the same request
+        self.cancelled = False
+        self._request = request
+        self._events = events
+        self._response = None
+        self._lock = threading.Lock()
+        # In the caller's context, so the rate-limit header hook credits
+        # the caller's ticket (rate_limiter.current_ticket), or the
+        # attempt's own `ticket` if it has one.
+        context = contextvars.copy_context()
+        if ticket is not None:
+            context.run(rate_limiter.current_ticket.set, ticket)
+        threading.Thread(target=context.run, args=(self._run,),
+                         daemon=True, name=f"llm-{backend.name}").start()
+
+    def _run(self):
+        try:
+            response = self.backend.client.send(self._request, stream=True)
+            with self._lock:
+                self._response = response
+                if self.cancelled:
+                    response.close()
+                    return
+            try:
+                if response.status_code >= 400:
+                    response.read()
+                    raise BackendError(self.backend.name, response.status_code, response.text)
+                for content, usage in _events(response):
+                    if self.cancelled:
+                        return
+                    if content or usage:
+                        self._events.put((self, "token", (content, usage)))
+            finally:
+                response.close()
+            self._events.put((self, "done", None))
+        except Exception as e:
+            if not self.cancelled:
+                self._events.put((self, "error", e))
+
+    def cancel(self):
+        """Closes the connection; the thread ends at its next read."""
+        with self._lock:
+            self.cancelled = True
+            response = self._response
+        if response is not None:
+            response.close()
+
+
+# ---------------- HEDGING ----------------
+def hedged_stream(backends: list[Backend], messages: list[dict], temperature: float):
+    """
+    (content, usage) pairs from whichever backend answers first; see the
+    module comment for the policy.
+    """
+    candidates = deque(backends)
+    events = queue.Queue()
+    attempts, winner, first_token_at, last_error = [], None, None, None
+    caller_ticket = rate_limiter.current_ticket.get()
+    paid = False  # the caller's ticket already covers an attempt
+
+    def reserve():
+        """
+        Ticket for another request on the Groq account: the caller's
+        reservation again, or a rough one if the caller has none.
+        """
+        tokens = (caller_ticket.tokens if caller_ticket is not None else
+                  sum(len(str(m.get("content") or "")) for m in messages) // 4
+                  + rate_limiter.OUTPUT_TOKENS)
+        return rate_limiter.get_scheduler().try_acquire(tokens)
+
+    def launch():
+        """
+        Starts the next backend its breaker (and, on the Groq account,
+        the rate-limit budget) lets through; the hedge deadline, or None
+        once no backend is left. Breakers are asked only here, so a
+        half-open probe slot is taken only by a request that is actually
+        sent (and released in `finally`).
+        """
+        nonlocal paid
+        while candidates:
+            backend = candidates.popleft()
+            if not backend.breaker.allow():
+                continue
+            ticket = None
+            if backend.rate_limited:
+                if paid:
+                    ticket = reserve()
+                    if ticket is None:
+                        backend.record("no_budget")
+                        backend.breaker.release()
+                        continue
+                paid = True
+            backend.record("requests")
+            attempts.append(_Attempt(backend, backend.request(messages, temperature),
+                                     events, ticket))
+            return time.monotonic() + backend.hedge_after()
+        return None
+
+    def running():
+        return [a for a in attempts if not a.cancelled]
+
+    hedge_at = launch()
+    if hedge_at is None:
+        raise NoBackendAvailable("every LLM backend's circuit breaker is open")
+    try:
+        while True:
+            timeout = (max(0.0, hedge_at - time.monotonic())
+                       if winner is None and hedge_at is not None else None)
+            try:
+                attempt, kind, value = events.get(timeout=timeout)
+            except queue.Empty:
+                slow = attempts[-1]
+                hedge_at = launch()
+                slow.hedged = hedge_at is not None
+                continue
+
+            if winner is not None and attempt is not winner:
+                continue
+
+            if kind == "error":
+                attempt.cancelled = True
+                attempt.backend.record("errors")
+                if getattr(value, "status_code", None) == 429:
+                    attempt.backend.breaker.release()  # rate_limiter's business
+                else:
+                    attempt.backend.breaker.failure()
+                last_error = value
+                if winner is not None:
+                    raise value
+                hedge_at = launch()
+                if hedge_at is None and not running():
+                    raise value
+                continue
+
+            if winner is None:
+                winner, first_token_at = attempt, time.monotonic()
+                winner.backend.record("wins", first_token_at - winner.started)
+                for other in attempts:
+                    if other is not winner and not other.cancelled:
+                        other.cancel()
+                        if other.hedged:
+                            # Ran past its threshold and lost: a slow call.
+                            other.backend.record("slow")
+                            other.backend.breaker.failure()
+                        else:
+                            other.backend.record("cancelled")
+                            other.backend.breaker.release()
+                metrics.annotate(llm_backend=winner.backend.name,
+                                 llm_attempts=len(attempts),
+                                 hedged=len(attempts) > 1)
+
+            if kind == "done":
+                winner.backend.breaker.success()
+                return
+            yield value
+    finally:
+        for attempt in attempts:
+            if not attempt.cancelled:
+                attempt.cancel()
+                attempt.backend.breaker.release()
+
+
+# ---------------- LANGCHAIN MODEL ----------------
+class HedgedChatModel(BaseChatModel):
+    """
+    Chat model over `backends` (first = primary). Drop-in for ChatGroq in
+    chains, invoke() and stream().
+    """
+
+    backends: list
+    temperature: float = 0.2
+    model_name: str = ""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "hedged"
+
+    def _pairs(self, messages):
+        return hedged_stream(self.backends, convert_to_openai_messages(messages),
+                             self.temperature)
+
+    @staticmethod
+    def _usage(usage: dict | None) -> dict | None:
+        if not usage:
+            return None
+        return {
+            "input_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+        }
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        parts, usage = [], None
+        for content, chunk_usage in self._pairs(messages):
+            parts.append(content)
+            usage = chunk_usage or usage
+        message = AIMessage(content="".join(parts), usage_metadata=self._usage(usage))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for content, usage in self._pairs(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=content, usage_metadata=self._usage(usage),
+            ))
+            if run_manager and content:
+                run_manager.on_llm_new_token(content, chunk=chunk)
+            yield chunk
+
+
+# ---------------- PROCESS-WIDE BACKENDS ----------------
+# Keyed by (url, model): breakers and latency history are shared by every
+# model instance in the process.
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: str, base_url: str, model: str, api_key: str | None = None,
+                event_hooks: dict | None = None, rate_limited: bool = False) -> Backend:
+    with _backends_lock:
+        key = (base_url.rstrip("/"), model)
+        if key not in _backends:
+            _backends[key] = Backend(name, base_url, model, api_key, event_hooks,
+                                     rate_limited)
+        return _backends[key]
+
+
+def configured(model: str, groq_base: str | None = None, api_key: str | None = None,
+               event_hooks: dict | None = None) -> list[Backend]:
+    """
+    Groq `model` first, then every LLM_FALLBACKS entry. Groq backends get
+    `event_hooks` (rate-limit header observation) and the Groq key, and
+    are marked rate_limited.
+    """
+    groq_url = (groq_base or GROQ_BASE).rstrip("/") + "/openai/v1"
+    groq_key = api_key or os.getenv("GROQ_API_KEY")
+    fallback_key = os.getenv(FALLBACK_API_KEY_ENV)
+
+    backends = [get_backend("groq", groq_url, model, groq_key, event_hooks, True)]
+    for entry in FALLBACKS:
+        fallback_model, _, base_url = entry.partition("@")
+        if base_url:
+            backends.append(get_backend(entry, base_url, fallback_model, fallback_key))
+        else:
+            backends.append(get_backend(f"groq:{fallback_model}", groq_url,
+                                        fallback_model, groq_key, event_hooks, True))
+    return backends
+
+
+def stats() -> dict:
+    with _backends_lock:
+        backends = list(_backends.values())
+    return {backend.name: backend.stats() for backend in backends}
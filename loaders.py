@@ -0,0 +1,304 @@
+# ================================
+# Content loaders (YouTube, Google Docs/Drive, PDF, Web)
+# ================================
+
+import os
+import re
+
+from langchain_core.documents import Document
+
+import document_cache
+import downloads
+import html_extract
+import http_client
+import metrics
+import resource_governor
+import summary_cache
+import youtube_transcripts
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+
+# Overridable so the loaders can be pointed at local stand-ins (bench/).
+GOOGLE_DOCS_BASE = os.getenv("GOOGLE_DOCS_BASE", "https://docs.google.com")
+GOOGLE_DRIVE_BASE = os.getenv("GOOGLE_DRIVE_BASE", "https://drive.google.com")
+
+
+class EmptyContentError(ValueError):
+    """Raised when a source loads but contains no readable text."""
+
+
+LoadCancelled = downloads.LoadCancelled
+
+
+# ---------------- YOUTUBE TRANSCRIPT (CLOUD SAFE) ----------------
+def youtube_video_id(url: str) -> str:
+    video_id = summary_cache.youtube_video_id(url)
+    if not video_id:
+        raise ValueError("Invalid YouTube URL")
+
+    return video_id
+
+
+def load_youtube_transcript(url: str):
+    """
+    Transcripts carry no HTTP validators, so they are cached per video id
+    with a plain TTL.
+    """
+    video_id = youtube_video_id(url)
+
+    with metrics.span("youtube.transcript", video_id=video_id) as span:
+        docs = document_cache.cached_load(
+            f"youtube:{video_id}",
+            lambda: fetch_youtube_transcript(url),
+        )
+        span.set_docs(docs)
+
+    return docs
+
+
+def fetch_youtube_transcript(url: str):
+    """
+    Works locally and on Streamlit Cloud.
+    Hedges youtube_transcript_api against in-process yt-dlp. One document
+    per chapter / pause-aligned section, with its time range.
+    """
+    video_id = youtube_video_id(url)
+    transcript = youtube_transcripts.fetch_transcript(video_id, url)
+
+    return transcript.documents(url)
+
+
+# ---------------- FILE PARSING ----------------
+def iter_file_documents(download, source: str):
+    """
+    PDFs are extracted page by page from the in-memory / memory-mapped
+    buffer; other office files go through Unstructured's file partitioner.
+    """
+    with download:
+        if download.kind == "pdf":
+            with metrics.span("pdf.extract", bytes=download.size) as span:
+                pages = 0
+                for page in downloads.iter_pdf_pages(download.stream(), source):
+                    pages += 1
+                    yield page
+                span.set(pages=pages)
+            return
+
+        from unstructured.partition.auto import partition
+
+        with metrics.span("unstructured.partition", bytes=download.size) as span:
+            elements = partition(file=download.fileobj())
+            text = "\n\n".join(str(el) for el in elements)
+            span.set(elements=len(elements))
+        yield Document(page_content=text, metadata={"source": source})
+
+
+def require_text(docs, message: str):
+    """
+    Passes documents through, raising if the first one has no text.
+    """
+    docs = iter(docs)
+    first = next(docs, None)
+
+    if first is None or not first.page_content.strip():
+        raise ValueError(message)
+
+    yield first
+    yield from docs
+
+
+# ---------------- GOOGLE DOCS / DRIVE ----------------
+def iter_google_drive_file(url: str):
+    session = http_client.get_client()
+
+    # Google Docs
+    if "docs.google.com/document" in url:
+        file_id = re.search(r"/d/([^/]+)", url)
+        if not file_id:
+            raise ValueError("Invalid Google Docs URL")
+
+        file_id = file_id.group(1)
+        export_url = f"{GOOGLE_DOCS_BASE}/document/d/{file_id}/export?format=txt"
+
+        def parse(resp):
+            if resp.status_code != 200:
+                resp.close()
+                raise PermissionError(
+                    "Cannot access Google Doc. Share as: Anyone with link → Viewer."
+                )
+
+            with metrics.span("download") as span:
+                download = downloads.read_capped(
+                    resp, resource_governor.limits("google_drive").max_bytes, reject=("html",),
+                )
+                span.set(bytes=download.size)
+
+            with download:
+                text = download.text(resp.encoding or "utf-8").strip()
+
+            if not text:
+                raise ValueError("Google Doc is empty.")
+
+            yield Document(page_content=text, metadata={"source": url})
+
+        yield from document_cache.cached_http_iter(
+            export_url, session, export_url, parse, stream=True
+        )
+        return
+
+    # Google Drive files
+    if "drive.google.com/file" in url:
+        file_id = re.search(r"/d/([^/]+)", url)
+        if not file_id:
+            raise ValueError("Invalid Google Drive file URL")
+
+        file_id = file_id.group(1)
+        download_url = f"{GOOGLE_DRIVE_BASE}/uc?export=download&id={file_id}"
+
+        def parse(resp):
+            if resp.status_code != 200:
+                resp.close()
+                raise PermissionError("Cannot access Google Drive file.")
+
+            # An HTML body here is a login / virus-scan page, not the file.
+            with metrics.span("download") as span:
+                download = downloads.read_capped(
+                    resp, resource_governor.limits("google_drive").max_bytes, reject=("html",),
+                )
+                span.set(bytes=download.size)
+
+            yield from require_text(
+                iter_file_documents(download, url),
+                "File contains no readable text.",
+            )
+
+        yield from document_cache.cached_http_iter(
+            download_url, session, download_url, parse, stream=True
+        )
+        return
+
+    raise ValueError("Unsupported Google Drive URL")
+
+
+def load_google_drive_file(url: str):
+    return list(iter_google_drive_file(url))
+
+
+# ---------------- PDF / WEB ----------------
+def iter_pdf_url(url: str):
+    def parse(resp):
+        resp.raise_for_status()
+        with metrics.span("download") as span:
+            download = downloads.read_capped(
+                resp, resource_governor.limits("pdf").max_bytes, reject=("html",),
+            )
+            span.set(bytes=download.size)
+        yield from iter_file_documents(download, url)
+
+    yield from document_cache.cached_http_iter(
+        url, http_client.get_client(), url, parse,
+        headers={"User-Agent": USER_AGENT},
+        stream=True,
+    )
+
+
+def load_pdf_url(url: str):
+    return list(iter_pdf_url(url))
+
+
+def load_web_page(url: str):
+    """
+    Main article text via the fast extractor (html_extract), with
+    Unstructured as the fallback. The HTTP request is ours so it can be
+    revalidated against the document cache.
+    """
+    def parse(resp):
+        resp.raise_for_status()
+        return html_extract.load_response(resp, url, resource_governor.limits("web").max_bytes)
+
+    return document_cache.cached_http_load(
+        url, http_client.get_client(), url, parse,
+        headers={"User-Agent": USER_AGENT},
+        verify=False,
+        stream=True,
+    )
+
+
+# ---------------- DISPATCH ----------------
+def source_type(url: str) -> str:
+    if "youtube.com" in url or "youtu.be" in url:
+        return "youtube"
+    if "docs.google.com/document" in url or "drive.google.com/file" in url:
+        return "google_drive"
+    if url.lower().endswith(".pdf"):
+        return "pdf"
+    return "web"
+
+
+LOADERS = {
+    "youtube": load_youtube_transcript,
+    "google_drive": load_google_drive_file,
+    "pdf": load_pdf_url,
+    "web": load_web_page,
+}
+
+
+ITERATORS = {
+    "google_drive": iter_google_drive_file,
+    "pdf": iter_pdf_url,
+}
+
+
+def iter_documents(url: str):
+    """
+    Lazy variant of `load_documents`: PDF sources yield pages while later
+    pages are still being extracted. Other sources yield their documents
+    once loaded.
+    """
+    kind = source_type(url)
+    if kind in ITERATORS:
+        return ITERATORS[kind](url)
+    return iter(LOADERS[kind](url))
+
+
+def load_documents(url: str, max_tokens: int | None = None, cancel=None,
+                   on_page=None):
+    """
+    Picks the loader for `url` and returns its documents.
+    Raises EmptyContentError if nothing readable came back, and
+    DocumentTooLarge past `max_tokens` (default: the source type's cap).
+    Once `cancel` (a threading.Event) is set, raises LoadCancelled at the
+    next document or downloaded chunk. Large results are spilled to an
+    mmap as they arrive. `on_page` is called with each document as it
+    arrives, once it has passed those checks (pipeline.load starts map
+    calls from them).
+    """
+    kind = source_type(url)
+
+    def checked():
+        for doc in resource_governor.check_tokens(iter_documents(url), kind, max_tokens):
+            downloads.check_cancelled()
+            if on_page is not None:
+                on_page(doc)
+            yield doc
+
+    token = downloads.cancel_event.set(cancel)
+    try:
+        downloads.check_cancelled()
+        with metrics.span(f"load.{kind}") as span:
+            # Through the iterators, so page-by-page extraction stops at the
+            # token cap (or cancellation).
+            docs = resource_governor.spill(checked())
+            span.set_docs(docs)
+    finally:
+        downloads.cancel_event.reset(token)
+
+    if not docs or not docs[0].page_content.strip():
+        raise EmptyContentError("No readable text found at this URL.")
+
+    return docs
@@ -0,0 +1,235 @@
+# ================================
+# Long-document mode: checkpointed refine over a stream of chunks
+# ================================
+#
+#   summarizer = RefineSummarizer(llm, prompt)
+#   summary = summarizer.summarize(docs)      # resumes from a checkpoint
+#
+# For inputs far beyond what map-reduce can hold or afford in one go (a
+# full-day stream, a 1,000-page PDF). Chunks are produced lazily and
+# folded one at a time into a rolling summary; after every step the
+# summary and the position are written to CHECKPOINT_DIR, so a crash, a
+# restart or a rate-limit failure picks up after the last completed
+# chunk. The documents are read once, one at a time (spilled to an mmap
+# when large; see resource_governor.spill), so memory is bounded by a
+# couple of chunks plus the rolling summary, whatever the input size.
+
+import os
+import json
+import time
+import hashlib
+import itertools
+import contextvars
+
+from langchain_core.prompts import PromptTemplate
+
+import metrics
+import rate_limiter
+from summary_cache import CACHE_DIR
+from summarize_engine import (
+    CHARS_PER_TOKEN, CHUNK_OVERLAP_TOKENS, docs_chars, estimate_tokens, iter_chunks,
+)
+
+# ---------------- CONFIG ----------------
+CHECKPOINT_DIR = os.getenv("LONG_CHECKPOINT_DIR", os.path.join(CACHE_DIR, "long_checkpoints"))
+CHUNK_TOKENS = int(os.getenv("LONG_CHUNK_TOKENS", "4000"))
+# Token cap for documents loaded in this mode (instead of the governor's
+# per-source default).
+MAX_TOKENS = int(os.getenv("LONG_MAX_TOKENS", "5000000"))
+# A failing step is retried this many times (after rate_limiter's own 429
+# retries), with exponential backoff, before the job gives up; the
+# checkpoint keeps everything done so far.
+STEP_RETRIES = int(os.getenv("LONG_STEP_RETRIES", "4"))
+RETRY_BACKOFF_S = float(os.getenv("LONG_RETRY_BACKOFF_S", "5"))
+CHECKPOINT_TTL = int(os.getenv("LONG_CHECKPOINT_TTL", str(7 * 24 * 3600)))
+
+refine_template = """
+Below is a running summary of a long document, covering everything read so far,
+followed by the next part of the document.
+
+Rewrite the summary so it also covers the new part. Keep it under 400 words,
+keep the earlier key points unless the new part supersedes them, and do not
+mention that the document was read in parts.
+
+Summary so far:
+{summary}
+
+Next part:
+{text}
+"""
+
+refine_prompt = PromptTemplate(
+    template=refine_template,
+    input_variables=["summary", "text"],
+)
+
+# Called as progress(chunks_done, chunks_estimated, summary) after every
+# step; set by the caller (e.g. the job worker) around a summarize.
+current_progress = contextvars.ContextVar("long_progress", default=None)
+
+
+# ---------------- CHECKPOINTS ----------------
+class CheckpointStore:
+    """
+    One small JSON file per run: position, rolling summary and a digest
+    of the chunks folded so far. Written atomically after every step.
+    """
+
+    def __init__(self, directory: str = CHECKPOINT_DIR):
+        self.directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - state.get("updated_at", 0) > CHECKPOINT_TTL:
+            return None
+        return state
+
+    def save(self, key: str, state: dict):
+        state["updated_at"] = time.time()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            pass  # read-only filesystem: run without resumability
+
+    def clear(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+
+def checkpoint_key(source: str, first_chunk: str, *parts) -> str:
+    """
+    Where a run's checkpoint lives: the source, the first chunk and
+    whatever else shapes the result (`parts`). The rest of the content is
+    verified while resuming (see RefineSummarizer.summarize), so the
+    documents are never hashed in a pass of their own.
+    """
+    payload = json.dumps([source, chunk_hash(first_chunk), *parts], separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def chunk_hash(chunk: str) -> str:
+    return hashlib.sha256(chunk.encode("utf-8", "surrogatepass")).hexdigest()[:16]
+
+
+def estimate_chunks(docs, chunk_tokens: int = CHUNK_TOKENS) -> int:
+    chars = docs_chars(docs)
+    step = max(1, chunk_tokens - CHUNK_OVERLAP_TOKENS)
+    return max(1, -(-(-(-chars // CHARS_PER_TOKEN) - CHUNK_OVERLAP_TOKENS) // step))
+
+
+# ---------------- SUMMARIZER ----------------
+class RefineSummarizer:
+    """
+    `first_prompt` (a PromptTemplate over {text}) summarizes the first
+    chunk; every later chunk is folded in with `refine_prompt`.
+    """
+
+    def __init__(self, llm, first_prompt: PromptTemplate, key_parts=(),
+                 chunk_tokens: int = CHUNK_TOKENS, store: CheckpointStore | None = None):
+        self.llm = llm
+        self.first_prompt = first_prompt
+        self.key_parts = tuple(key_parts)
+        self.chunk_tokens = chunk_tokens
+        self.store = store or CheckpointStore()
+        self.last_stats = {}
+
+    def _call(self, text: str, summary: str | None) -> str:
+        if summary is None:
+            request = self.first_prompt.format(text=text)
+        else:
+            request = refine_prompt.format(summary=summary, text=text)
+        for attempt in range(STEP_RETRIES + 1):
+            try:
+                message = rate_limiter.invoke(self.llm, request, estimate_tokens(request))
+                return getattr(message, "content", message).strip()
+            except Exception as e:
+                if attempt == STEP_RETRIES or not _retryable(e):
+                    raise
+                metrics.annotate(retries=attempt + 1)
+                time.sleep(RETRY_BACKOFF_S * 2 ** attempt)
+
+    def summarize(self, docs) -> str:
+        """
+        One pass over the documents: chunks are produced lazily and each
+        is hashed into a running digest as it goes by, folded in or (when
+        resuming) skipped. A checkpoint whose digest does not match the
+        skipped chunks is from other content: the run starts over.
+        """
+        total = estimate_chunks(docs, self.chunk_tokens)
+        progress = current_progress.get()
+        chunks = iter_chunks(docs, self.chunk_tokens)
+        first = next(chunks, None)
+        if first is None:
+            return ""
+
+        source = docs[0].metadata.get("source", "")
+        key = checkpoint_key(source, first, self.first_prompt.template, refine_template,
+                             self.chunk_tokens, *self.key_parts)
+        state = self.store.load(key)
+        done = state["chunks"] if state and state.get("digest") else 0
+        summary = state["summary"] if done else None
+        resumed = done
+
+        if progress is not None and done:
+            progress(done, max(total, done + 1), summary)
+
+        digest = hashlib.sha256()
+        with metrics.span("long.refine", resumed_at=resumed, estimated_chunks=total) as span:
+            for index, chunk in enumerate(itertools.chain([first], chunks)):
+                digest.update(chunk_hash(chunk).encode("ascii"))
+                if index < done:
+                    if index == done - 1 and digest.hexdigest() != state["digest"]:
+                        # Content or chunking changed since the checkpoint.
+                        self.store.clear(key)
+                        return self.summarize(docs)
+                    continue
+
+                with metrics.span("llm.refine", chunk=index) as call:
+                    call.set_text(chunk)
+                    summary = self._call(chunk, summary)
+
+                done = index + 1
+                self.store.save(key, {"chunks": done, "summary": summary,
+                                      "digest": digest.hexdigest()})
+                if progress is not None:
+                    # The estimate can run short; stay below 100% until the end.
+                    progress(done, max(total, done + 1), summary)
+
+            if done > index + 1:
+                # Fewer chunks than the checkpoint claims: other content.
+                self.store.clear(key)
+                return self.summarize(docs)
+            span.set(chunks=done, resumed_at=resumed)
+
+        if progress is not None:
+            progress(done, done, summary)
+
+        self.last_stats = {"chunks": done, "resumed_at": resumed}
+        self.store.clear(key)
+        return summary or ""
+
+    def stream(self, docs):
+        """The final summary as a single token (progress goes to current_progress)."""
+        yield self.summarize(docs)
+
+
+def _retryable(exc: Exception) -> bool:
+    """Rate limits, queue timeouts and network-level failures."""
+    return (rate_limiter._is_rate_limit(exc)
+            or isinstance(exc, (rate_limiter.QueueTimeout, TimeoutError, ConnectionError))
+            or type(exc).__name__ in ("APIConnectionError", "APITimeoutError",
+                                      "InternalServerError", "ConnectError",
+                                      "ReadTimeout", "RemoteProtocolError"))
@@ -0,0 +1,442 @@
+# ================================
+# Per-stage timing spans, Prometheus metrics and a JSON trace log
+# ================================
+#
+#   with metrics.trace(url) as t:            # one per request
+#       with metrics.span("load", source="pdf") as s:
+#           docs = ...
+#           s.set_text(text)                 # chars + estimated tokens
+#
+# Every finished span feeds the process-wide histograms (exported in
+# Prometheus text format on METRICS_PORT, if set). Spans opened while a
+# trace is active are also collected into that trace, which is appended
+# to TRACE_FILE when the request finishes (rotated at TRACE_MAX_BYTES).
+
+import os
+import json
+import math
+import time
+import uuid
+import ipaddress
+import threading
+import contextvars
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from summary_cache import CACHE_DIR
+
+# ---------------- CONFIG ----------------
+TRACE_FILE = os.getenv("METRICS_TRACE_FILE", os.path.join(CACHE_DIR, "traces.jsonl"))
+TRACE_LOG = os.getenv("METRICS_TRACE_LOG", "1") != "0"
+# Past this size the trace log moves to TRACE_FILE.1 (older ones to .2 ...),
+# keeping TRACE_BACKUPS files; 0 = never rotate.
+TRACE_MAX_BYTES = int(os.getenv("METRICS_TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_BACKUPS = int(os.getenv("METRICS_TRACE_BACKUPS", "2"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = no exporter
+# No authentication on /metrics: loopback unless METRICS_PUBLIC=1 (e.g.
+# METRICS_HOST=0.0.0.0 for a scraper on another host).
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "0") == "1"
+RECENT_TRACES = int(os.getenv("METRICS_RECENT_TRACES", "50"))
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+           10.0, 30.0, 60.0, math.inf)
+
+CHARS_PER_TOKEN = 4  # same estimate as summarize_engine.estimate_tokens
+
+current_trace = contextvars.ContextVar("metrics_trace", default=None)
+current_span = contextvars.ContextVar("metrics_span", default=None)
+
+
+# ---------------- SPANS ----------------
+class Span:
+    __slots__ = ("name", "parent", "attrs", "start", "offset_s",
+                 "duration_s", "status", "error")
+
+    def __init__(self, name: str, parent: str | None = None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.offset_s = 0.0
+        self.duration_s = None
+        self.status = "ok"
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def set_text(self, text: str):
+        """Input size of this stage, in characters and estimated tokens."""
+        self.attrs["chars"] = len(text)
+        self.attrs["tokens"] = -(-len(text) // CHARS_PER_TOKEN)
+
+    def set_docs(self, docs):
+        """Like set_text over the joined documents, without joining them."""
+        chars = getattr(docs, "chars", None)  # SpilledDocuments keep a running total
+        if chars is None:
+            chars = sum(len(doc.page_content) for doc in docs)
+        chars += 2 * max(0, len(docs) - 1)
+        self.attrs["chars"] = chars
+        self.attrs["tokens"] = -(-chars // CHARS_PER_TOKEN)
+        self.attrs["documents"] = len(docs)
+
+    def to_dict(self) -> dict:
+        record = {
+            "name": self.name,
+            "parent": self.parent,
+            "offset_s": round(self.offset_s, 4),
+            "duration_s": round(self.duration_s or 0.0, 4),
+            "status": self.status,
+        }
+        if self.error:
+            record["error"] = self.error
+        record.update(self.attrs)
+        return record
+
+
+class Trace:
+    """
+    All spans of one request (across the threads it fans out to).
+    """
+
+    def __init__(self, name: str, **attrs):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration_s = None
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        span.offset_s = span.start - self.start
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self) -> list[dict]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.offset_s)
+        return [span.to_dict() for span in spans]
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_s": round(self.duration_s or 0.0, 4),
+            **self.attrs,
+            "spans": self.breakdown(),
+        }
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times the block as stage `name`. Exceptions mark the span as failed
+    and propagate unchanged.
+    """
+    parent = current_span.get()
+    item = Span(name, parent.name if parent else None, **attrs)
+    token = current_span.set(item)
+
+    try:
+        yield item
+    except BaseException as e:
+        # GeneratorExit just means a lazy consumer stopped early.
+        if not isinstance(e, GeneratorExit):
+            item.status = "error"
+            item.error = type(e).__name__
+        raise
+    finally:
+        item.duration_s = time.perf_counter() - item.start
+        try:
+            current_span.reset(token)
+        except ValueError:
+            current_span.set(parent)  # generator resumed in another context
+        get_registry().observe(item)
+        active = current_trace.get()
+        if active is not None:
+            active.add(item)
+
+
+def annotate(**attrs):
+    """
+    Adds attributes (e.g. cache hit flags) to the innermost open span.
+    No-op outside a span.
+    """
+    active = current_span.get()
+    if active is not None:
+        active.set(**attrs)
+
+
+def annotate_trace(**attrs):
+    """
+    Adds attributes (e.g. the summarization plan) to the current trace.
+    No-op outside a trace.
+    """
+    active = current_trace.get()
+    if active is not None:
+        active.attrs.update(attrs)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    """
+    Collects the spans of one request; the finished trace is kept for the
+    debug panel and appended to TRACE_FILE.
+    """
+    item = Trace(name, **attrs)
+    token = current_trace.set(item)
+    try:
+        yield item
+    finally:
+        item.duration_s = time.perf_counter() - item.start
+        current_trace.reset(token)
+        get_registry().record_trace(item)
+
+
+# ---------------- REGISTRY ----------------
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    inner = ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+class MetricsRegistry:
+    """
+    Process-wide stage metrics: duration histograms, error counts, input
+    sizes and cache lookups, keyed by span name.
+    """
+
+    def __init__(self, trace_file: str | None = TRACE_FILE if TRACE_LOG else None,
+                 trace_max_bytes: int = TRACE_MAX_BYTES, trace_backups: int = TRACE_BACKUPS):
+        self.trace_file = trace_file
+        self.trace_max_bytes = trace_max_bytes
+        self.trace_backups = trace_backups
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._durations = {}   # stage -> _Histogram
+        self._errors = {}      # stage -> count
+        self._chars = {}       # stage -> total input chars
+        self._tokens = {}      # stage -> total estimated input tokens
+        self._saved = {}       # stage -> tokens removed before the LLM
+        self._cache = {}       # (stage, result) -> count
+        self._recent = []      # last RECENT_TRACES traces
+        self._gauges = []      # callables -> {metric: (help, value)}
+
+    def observe(self, span: Span):
+        name = span.name
+        with self._lock:
+            hist = self._durations.get(name)
+            if hist is None:
+                hist = self._durations[name] = _Histogram()
+            hist.observe(span.duration_s or 0.0)
+
+            if span.status == "error":
+                self._errors[name] = self._errors.get(name, 0) + 1
+            if "chars" in span.attrs:
+                self._chars[name] = self._chars.get(name, 0) + span.attrs["chars"]
+            if "tokens" in span.attrs:
+                self._tokens[name] = self._tokens.get(name, 0) + span.attrs["tokens"]
+            if "tokens_saved" in span.attrs:
+                self._saved[name] = self._saved.get(name, 0) + span.attrs["tokens_saved"]
+            if "cache_hit" in span.attrs:
+                key = (name, "hit" if span.attrs["cache_hit"] else "miss")
+                self._cache[key] = self._cache.get(key, 0) + 1
+
+    def add_gauges(self, collect):
+        """
+        `collect()` returns {metric name: (help, value)}; it is called on
+        every scrape (names ending in _total are exported as counters).
+        """
+        with self._lock:
+            self._gauges.append(collect)
+
+    def record_trace(self, trace: Trace):
+        record = trace.to_dict()
+        with self._lock:
+            self._recent.append(record)
+            del self._recent[:-RECENT_TRACES]
+
+        if self.trace_file:
+            line = json.dumps(record, default=str) + "\n"
+            try:
+                os.makedirs(os.path.dirname(self.trace_file) or ".", exist_ok=True)
+                with self._file_lock:
+                    with open(self.trace_file, "a", encoding="utf-8") as f:
+                        f.write(line)
+                        full = self.trace_max_bytes and f.tell() >= self.trace_max_bytes
+                    if full:
+                        self._rotate()
+            except OSError:
+                pass  # read-only filesystem: metrics still work
+
+    def _rotate(self):
+        """traces.jsonl -> .1 -> .2 ...; the oldest beyond trace_backups is dropped."""
+        path = self.trace_file
+        if self.trace_backups <= 0:
+            os.remove(path)
+            return
+        for i in range(self.trace_backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+    def recent(self) -> list[dict]:
+        with self._lock:
+            return list(self._recent)
+
+    def summary(self) -> dict:
+        """Per-stage count / mean / errors for the UI."""
+        with self._lock:
+            return {
+                name: {
+                    "count": hist.count,
+                    "mean_s": round(hist.sum / hist.count, 4) if hist.count else 0.0,
+                    "errors": self._errors.get(name, 0),
+                }
+                for name, hist in sorted(self._durations.items())
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP summarizer_stage_duration_seconds Time spent per pipeline stage.",
+                "# TYPE summarizer_stage_duration_seconds histogram",
+            ]
+            for name, hist in sorted(self._durations.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, hist.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(
+                        "summarizer_stage_duration_seconds_bucket"
+                        f"{_labels(stage=name, le=le)} {cumulative}"
+                    )
+                lines.append(f"summarizer_stage_duration_seconds_sum{_labels(stage=name)} {hist.sum}")
+                lines.append(f"summarizer_stage_duration_seconds_count{_labels(stage=name)} {hist.count}")
+
+            for metric, help_text, values in (
+                ("summarizer_stage_errors_total", "Failed stage executions.", self._errors),
+                ("summarizer_stage_input_chars_total", "Input characters per stage.", self._chars),
+                ("summarizer_stage_input_tokens_total", "Estimated input tokens per stage.", self._tokens),
+                ("summarizer_stage_tokens_saved_total", "Estimated tokens removed per stage.", self._saved),
+            ):
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+                for name, value in sorted(values.items()):
+                    lines.append(f"{metric}{_labels(stage=name)} {value}")
+
+            lines += [
+                "# HELP summarizer_cache_lookups_total Cache lookups per stage and result.",
+                "# TYPE summarizer_cache_lookups_total counter",
+            ]
+            for (name, result), value in sorted(self._cache.items()):
+                lines.append(
+                    f"summarizer_cache_lookups_total{_labels(stage=name, result=result)} {value}"
+                )
+            collectors = list(self._gauges)
+
+        for collect in collectors:
+            for metric, (help_text, value) in collect().items():
+                kind = "counter" if metric.endswith("_total") else "gauge"
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}",
+                          f"{metric} {value}"]
+
+        return "\n".join(lines) + "\n"
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> MetricsRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+# ---------------- EXPORTER ----------------
+def require_loopback(host: str, public: bool, setting: str):
+    """
+    Unauthenticated endpoints bind to this machine only; any other address
+    needs the explicit `setting` opt-in (`public`). Raises PermissionError.
+    """
+    if public or host == "localhost":
+        return
+    try:
+        loopback = ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise PermissionError(
+            f"Refusing to serve on {host} without authentication; "
+            f"set {setting}=1 to bind a public address."
+        )
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_registry().render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve(port: int = METRICS_PORT, host: str = METRICS_HOST,
+          public: bool = METRICS_PUBLIC):
+    """
+    Starts the /metrics endpoint once per process (no-op if port is 0 or
+    already taken, e.g. by another Streamlit worker). Non-loopback hosts
+    need `public` (METRICS_PUBLIC=1).
+    """
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        require_loopback(host, public, "METRICS_PUBLIC")
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError:
+            return None
+        threading.Thread(target=_server.serve_forever, daemon=True,
+                         name="metrics").start()
+        return _server
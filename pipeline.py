@@ -0,0 +1,494 @@
+# ================================
+# Load → Summarize pipeline (no Streamlit)
+# ================================
+
+import json
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.prompts import PromptTemplate
+
+import chunk_memo
+import dedup_index
+import document_cache
+import llm_backends
+import loaders
+import long_summarize
+import metrics
+import planner
+import preprocess
+import rate_limiter
+import resource_governor
+import single_flight
+import subtitles
+import summary_cache
+import summarize_engine
+
+# ---------------- LLM ----------------
+MODEL_NAME = "llama-3.1-8b-instant"
+TEMPERATURE = 0.2
+
+
+def build_llm(**kwargs):
+    """
+    ChatGroq, or with LLM_FALLBACKS set a hedged model over Groq and the
+    fallback backends (llm_backends). `base_url` / `api_key` override
+    Groq's for either.
+    """
+    # Every Groq response (including 429s retried inside the SDK) feeds
+    # its rate-limit headers into the shared scheduler.
+    observe = {"response": [rate_limiter.get_scheduler().observe_httpx]}
+
+    if llm_backends.FALLBACKS:
+        return llm_backends.HedgedChatModel(
+            backends=llm_backends.configured(
+                MODEL_NAME, kwargs.get("base_url"), kwargs.get("api_key"), observe,
+            ),
+            temperature=TEMPERATURE,
+            model_name=MODEL_NAME,
+        )
+
+    # Imported here: the Groq SDK is only needed once a summary is requested.
+    import httpx
+    from langchain_groq import ChatGroq
+
+    kwargs.setdefault("http_client", httpx.Client(event_hooks=observe))
+
+    return ChatGroq(
+        model=MODEL_NAME,
+        streaming=False,
+        temperature=TEMPERATURE,
+        **kwargs,
+    )
+
+
+# ---------------- PROMPT ----------------
+prompt_template = """
+Provide a concise summary of the following content in under 300 words.
+
+Content:
+{text}
+"""
+
+prompt = PromptTemplate(
+    template=prompt_template,
+    input_variables=["text"],
+)
+PROMPT_TOKENS = summarize_engine.estimate_tokens(prompt_template)
+
+
+# ---------------- CHAINS ----------------
+_chains = {}
+_chains_lock = threading.Lock()
+
+
+def stuff_chain(llm):
+    """
+    One "stuff" chain per LLM client, built on first use (the bench's
+    baseline; `summarize` sends the same prompt without the chain).
+    """
+    with _chains_lock:
+        cached = _chains.get(id(llm))
+        if cached is None or cached[0] is not llm:
+            from langchain.chains.summarize import load_summarize_chain
+
+            chain = load_summarize_chain(
+                llm=llm,
+                chain_type="stuff",
+                prompt=prompt,
+            )
+            cached = _chains[id(llm)] = (llm, chain)
+        return cached[1]
+
+
+# ---------------- MODES ----------------
+MODES = {
+    "auto": "Full text (map-reduce when long)",
+    "extractive": "Extractive pre-compression (one LLM call)",
+    "chapters": "Per-chapter summaries with timestamps (YouTube)",
+    "long": "Long document (rolling summary, resumable)",
+}
+
+
+def memo_summarizer(llm, docs, bypass: bool = False):
+    """
+    Chunk-memoized map-reduce for sources that are re-summarized after
+    small edits (Google Docs), else None (also when the request bypasses
+    the cache).
+    """
+    source = docs[0].metadata.get("source", "") if docs else ""
+    if not chunk_memo.applies_to(loaders.source_type(source), bypass):
+        return None
+    return chunk_memo.MemoizedSummarizer(
+        llm=llm, map_prompt=prompt, model=MODEL_NAME, temperature=TEMPERATURE,
+    )
+
+
+def maps_early(url: str, mode: str = "auto", bypass: bool = False) -> bool:
+    """
+    Whether `url` is extracted page by page (PDFs, Drive files) and would
+    be map-reduced as-is, so map calls can start during the load.
+    """
+    kind = loaders.source_type(url)
+    return (summarize_engine.EARLY_MAP and mode == "auto" and kind in loaders.ITERATORS
+            and not chunk_memo.applies_to(kind, bypass))
+
+
+def early_map(llm, url: str, mode: str = "auto", bypass: bool = False):
+    """
+    A summarize_engine.EarlyMap for `load(..., early=)` if `maps_early`,
+    else None. The caller closes it once the summary is done.
+    """
+    if not maps_early(url, mode, bypass):
+        return None
+    return summarize_engine.EarlyMap(
+        summarize_engine.MapReduceSummarizer(llm=llm, map_prompt=prompt),
+        start_tokens=planner.call_limit(PROMPT_TOKENS),
+        stop_tokens=planner.MAP_REDUCE_MAX_TOKENS,
+    )
+
+
+def refine_summarizer(llm):
+    return long_summarize.RefineSummarizer(
+        llm=llm, first_prompt=prompt, key_parts=(MODEL_NAME, TEMPERATURE),
+    )
+
+
+def plan(docs, mode: str = "auto", memo=None) -> planner.Plan:
+    """
+    Strategy for `docs` (stuff / map_reduce / extractive), decided before
+    any LLM call and recorded on the current trace.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown summarization mode: {mode}")
+    decision = planner.plan(docs, mode, PROMPT_TOKENS, memo)
+    metrics.annotate_trace(plan=decision.to_dict())
+    return decision
+
+
+def apply_plan(docs, decision: planner.Plan):
+    """
+    "extractive": long inputs are cut down to their top-ranked sentences
+    so they fit a single stuff call.
+    """
+    if decision.strategy != "extractive":
+        return docs
+
+    import extractive  # NumPy only loads when this strategy is used
+
+    docs, _ = extractive.compress_documents(
+        docs, min(extractive.TOKEN_BUDGET, decision.call_limit)
+    )
+    return docs
+
+
+def stream_chapters(llm, docs, decision: planner.Plan):
+    """
+    One "[m:ss] Chapter" section per chapter (or timestamped section of a
+    video without chapters), summarized concurrently and yielded in order.
+    """
+    summarizer = summarize_engine.MapReduceSummarizer(llm=llm, map_prompt=prompt)
+
+    def one(group_docs):
+        text = summarize_engine.docs_text(group_docs)
+        if summarize_engine.estimate_tokens(text) <= decision.call_limit:
+            return summarizer._call(prompt, text)
+        return summarizer.summarize(group_docs)
+
+    groups = subtitles.chapter_groups(docs)
+    pool = ThreadPoolExecutor(max_workers=summarize_engine.MAX_CONCURRENCY)
+    try:
+        # Worker threads inherit the caller's context (rate-limit session, trace).
+        futures = [pool.submit(contextvars.copy_context().run, one, group_docs)
+                   for _, _, _, group_docs in groups]
+        for (title, start_s, end_s, _), future in zip(groups, futures):
+            stamp = subtitles.timestamp(start_s)
+            heading = (f"[{stamp}] {title}" if title is not None
+                       else f"[{stamp}–{subtitles.timestamp(end_s)}]")
+            yield f"**{heading}**\n{future.result().strip()}\n\n"
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def apply_mode(docs, mode: str = "auto"):
+    return apply_plan(docs, plan(docs, mode))
+
+
+# ---------------- IN-FLIGHT DEDUP ----------------
+# Concurrent requests for the same URL share one fetch, and for the same
+# cache key one LLM run (streamed tokens included).
+loads = single_flight.Group("load")
+summary_calls = single_flight.Group("summarize")
+summary_streams = single_flight.Group("stream")
+
+
+# ---------------- STAGES ----------------
+def load(url: str, clean: bool = preprocess.ENABLED, mode: str = "auto", cancel=None,
+         wait: bool = True, early=None):
+    """
+    Loaded documents, cleaned for the LLM unless `clean` is off (raw
+    documents stay in the document cache either way). Loads go through
+    the resource governor; large texts are spilled to an mmap document by
+    document, while loading and again while cleaning. "long"
+    mode lifts the per-source token cap to long_summarize.MAX_TOKENS.
+    `cancel` (a threading.Event) abandons the load with LoadCancelled.
+    With `wait` off, a busy governor raises resource_governor.Busy instead
+    of queueing for a slot. `early` (see `early_map`) gets each page,
+    cleaned, as it is extracted, so map calls start during the load.
+    """
+    kind = loaders.source_type(url)
+    max_tokens = long_summarize.MAX_TOKENS if mode == "long" else None
+    fresh = threading.Event()
+    on_page = None
+
+    if early is not None:
+        cleaner = preprocess.Cleaner(kind) if clean else None
+
+        def on_page(doc):
+            # Pages served from the document cache were most likely
+            # summarized already: the summary cache answers after the load.
+            if fresh.is_set():
+                text = cleaner.clean(doc.page_content) if cleaner else doc.page_content
+                if text.strip():
+                    early.add(text)
+
+    def governed_load():
+        token = document_cache.parsing.set(fresh)
+        try:
+            with resource_governor.get_governor().heavy_load(kind, wait):
+                return loaders.load_documents(url, max_tokens, cancel, on_page)
+        finally:
+            document_cache.parsing.reset(token)
+
+    try:
+        docs = loads.do(json.dumps([summary_cache.fetch_key(url), max_tokens]),
+                        governed_load, cancel=cancel)
+    except single_flight.FlightCancelled:
+        raise loaders.LoadCancelled() from None
+    if clean:
+        docs, _ = preprocess.clean_documents(docs, kind)
+    return docs
+
+
+def tokens_saved(docs) -> int:
+    return sum(doc.metadata.get("tokens_saved", 0) for doc in docs)
+
+
+def cache_key(url: str, docs, mode: str = "auto") -> str:
+    return summary_cache.make_docs_key(
+        url,
+        prompt_template,
+        MODEL_NAME,
+        TEMPERATURE,
+        docs,
+        variant=None if mode == "auto" else mode,
+    )
+
+
+def summarize(llm, docs, mode: str = "auto", bypass: bool = False, early=None) -> str:
+    """
+    Runs the planned strategy: one stuff call for inputs that fit (after
+    extractive compression if planned), parallel map-reduce otherwise, one
+    summary per chapter, or a checkpointed refine in "long" mode.
+    `bypass` skips memoized chunk summaries; a map-reduce reuses the map
+    calls `early` started during the load.
+    """
+    memo = memo_summarizer(llm, docs, bypass)
+    decision = plan(docs, mode, memo)
+    docs = apply_plan(docs, decision)
+
+    if decision.strategy == "refine":
+        with metrics.span("summarize", strategy="refine"):
+            return refine_summarizer(llm).summarize(docs)
+
+    if decision.strategy == "chapters":
+        with metrics.span("summarize", strategy="chapters") as span:
+            span.set_docs(docs)
+            return "".join(stream_chapters(llm, docs, decision)).strip()
+
+    if decision.strategy == "map_reduce":
+        with metrics.span("summarize", strategy="map_reduce",
+                          memoized=memo is not None) as span:
+            span.set_docs(docs)
+            summarizer = memo or summarize_engine.MapReduceSummarizer(
+                llm=llm,
+                map_prompt=prompt,
+                early=early,
+            )
+            return summarizer.summarize(docs)
+
+    # Fits one call, so joining it is cheap.
+    text = summarize_engine.docs_text(docs)
+    with metrics.span("summarize", strategy=decision.strategy) as span:
+        span.set_text(text)
+        with metrics.span("llm.stuff") as call:
+            call.set_text(text)
+            # The prompt the stuff chain would build, sent directly so the
+            # reply's usage settles the rate-limit reservation.
+            message = rate_limiter.invoke(
+                llm, prompt.format(text=text), summarize_engine.estimate_tokens(text),
+            )
+
+    return getattr(message, "content", message)
+
+
+def stream(llm, docs, mode: str = "auto", bypass: bool = False, early=None):
+    """
+    Token iterator for the same strategy `summarize` would pick.
+    """
+    memo = memo_summarizer(llm, docs, bypass)
+    decision = plan(docs, mode, memo)
+    docs = apply_plan(docs, decision)
+
+    if decision.strategy == "refine":
+        tokens = refine_summarizer(llm).stream(docs)
+    elif decision.strategy == "chapters":
+        tokens = stream_chapters(llm, docs, decision)
+    elif decision.strategy == "map_reduce":
+        tokens = (memo or summarize_engine.MapReduceSummarizer(
+            llm=llm,
+            map_prompt=prompt,
+            early=early,
+        )).stream(docs)
+    else:
+        tokens = summarize_engine.stream_stuff(llm, prompt, docs)
+
+    with metrics.span("summarize", strategy=decision.strategy, streamed=True,
+                      memoized=memo is not None) as span:
+        span.set_docs(docs)
+        yield from tokens
+
+
+def summary_flight_key(key: str, bypass: bool) -> str:
+    """Bypassed requests only coalesce with each other (no memoized chunks)."""
+    return f"{key}:bypass" if bypass else key
+
+
+def stream_shared(llm, url: str, docs, mode: str = "auto", key: str | None = None,
+                  bypass: bool = False, early=None):
+    """
+    `stream`, coalesced with identical in-flight requests: followers get
+    the leader's tokens (already produced ones first) instead of a second
+    LLM run.
+    """
+    key = key or cache_key(url, docs, mode)
+    return summary_streams.stream(summary_flight_key(key, bypass),
+                                  lambda: stream(llm, docs, mode, bypass, early))
+
+
+def combined_key(urls, summaries) -> str:
+    return summary_cache.make_key(
+        "\n".join(urls),
+        summarize_engine.combine_template,
+        MODEL_NAME,
+        TEMPERATURE,
+        "\n\n".join(summaries),
+        variant="combined",
+    )
+
+
+def stream_combined(llm, summaries: list[str]):
+    """
+    One cross-document summary from per-document summaries, collapsed
+    level by level first if they do not fit one combine call.
+    """
+    summarizer = summarize_engine.MapReduceSummarizer(llm=llm, map_prompt=prompt)
+    with metrics.span("combine", documents=len(summaries)) as span:
+        text = summarizer.collapse(list(summaries))
+        span.set_text(text)
+        yield from summarize_engine.stream_prompt(
+            llm, summarize_engine.combine_prompt, text
+        )
+
+
+def lookup(cache, key: str) -> str | None:
+    with metrics.span("summary_cache.lookup") as span:
+        summary = cache.get(key)
+        span.set(cache_hit=summary is not None)
+    return summary
+
+
+def lookup_summary(cache, key: str, url: str, docs, mode: str = "auto") -> str | None:
+    """
+    Cached summary for `key`, else the summary of a near-duplicate
+    document (same content under another URL, mirror, AMP page...).
+    A near-duplicate of `url` itself is an edit of it and is never reused,
+    nor are near-duplicates for sources re-summarized chunk by chunk.
+    """
+    summary = lookup(cache, key)
+    if summary is not None or not dedup_index.ENABLED:
+        return summary
+    if chunk_memo.applies_to(loaders.source_type(url)):
+        return None  # living documents: edits go through the chunk memo
+
+    match = dedup_index.lookup_docs(docs, list(MODES).index(mode), url)
+    if match is not None:
+        summary = cache.get(match[0])
+        if summary is not None:
+            cache.put(key, summary)  # exact hit next time
+    return summary
+
+
+def store_summary(cache, key: str, url: str, docs, mode: str, summary: str):
+    cache.put(key, summary)
+    if dedup_index.ENABLED:
+        dedup_index.get_index().add(
+            dedup_index.fingerprint_docs(docs),
+            key, list(MODES).index(mode), dedup_index.source_id(url),
+        )
+
+
+def summarize_cached(llm, url: str, docs, cache=None, bypass: bool = False,
+                     mode: str = "auto", early=None) -> tuple[str, bool]:
+    """
+    Returns (summary, cache_hit).
+    """
+    key = cache_key(url, docs, mode)
+
+    if cache is not None and not bypass:
+        summary = lookup_summary(cache, key, url, docs, mode)
+        if summary is not None:
+            return summary, True
+
+    summary = summary_calls.do(summary_flight_key(key, bypass),
+                               lambda: summarize(llm, docs, mode, bypass, early))
+
+    if cache is not None:
+        store_summary(cache, key, url, docs, mode, summary)
+
+    return summary, False
+
+
+def run(url: str, llm, cache=None, bypass: bool = False,
+        mode: str = "auto") -> dict:
+    """
+    Full pipeline for one URL. Returns a JSON-serializable record.
+    """
+    with metrics.trace(url, source_type=loaders.source_type(url)) as trace:
+        start = time.perf_counter()
+        early = early_map(llm, url, mode, bypass)
+        try:
+            docs = load(url, mode=mode, early=early)
+            loaded = time.perf_counter()
+
+            summary, cache_hit = summarize_cached(llm, url, docs, cache, bypass, mode,
+                                                  early)
+        finally:
+            if early is not None:
+                early.close()
+
+    return {
+        "url": url,
+        "status": "ok",
+        "mode": mode,
+        "source_type": loaders.source_type(url),
+        "summary": summary,
+        "cache_hit": cache_hit,
+        "chars": summarize_engine.docs_chars(docs),
+        "tokens_saved": tokens_saved(docs),
+        "plan": trace.attrs.get("plan"),
+        "load_s": round(loaded - start, 3),
+        "summarize_s": round(time.perf_counter() - loaded, 3),
+    }
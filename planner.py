@@ -0,0 +1,206 @@
+# ================================
+# Token-budget planner: picks the summarization strategy before any LLM call
+# ================================
+#
+#   plan = planner.plan(docs, mode, prompt_tokens, memo=summarizer)
+#   plan.strategy            # "stuff" | "map_reduce" | "extractive" | "chapters" | "refine"
+#   plan.to_dict()           # decision, reason and predicted cost
+#
+# Input size is estimated up front and compared with what one request
+# may carry (model context, Groq's per-minute token limit, our own stuff
+# budget), so oversized inputs never make a doomed round trip.
+
+import os
+from dataclasses import dataclass, field, asdict
+
+import metrics
+import rate_limiter
+import subtitles
+from summarize_engine import (
+    CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, MAX_CONCURRENCY, REDUCE_TOKENS,
+    STUFF_TOKENS, docs_tokens, estimate_tokens,
+)
+
+# ---------------- CONFIG ----------------
+# llama-3.1-8b-instant: 128k context.
+CONTEXT_TOKENS = int(os.getenv("MODEL_CONTEXT_TOKENS", "131072"))
+# Longer inputs are compressed extractively even in "auto" mode: a
+# map-reduce over them would take minutes of rate-limited calls.
+MAP_REDUCE_MAX_TOKENS = int(os.getenv("PLANNER_MAP_REDUCE_MAX_TOKENS", "150000"))
+# Expected length of one chunk summary ("under 300 words").
+SUMMARY_TOKENS = int(os.getenv("PLANNER_SUMMARY_TOKENS", "400"))
+
+
+@dataclass
+class Plan:
+    strategy: str
+    reason: str
+    input_tokens: int
+    call_limit: int
+    calls: int = 1
+    rounds: int = 1
+    predicted_input_tokens: int = 0
+    predicted_output_tokens: int = 0
+    # Lower bound from the TPM budget alone (no queueing for other users).
+    predicted_min_s: float = 0.0
+    memo: dict = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+# ---------------- LIMITS ----------------
+def tokens_per_minute() -> float:
+    """
+    Groq's tokens-per-minute limit as the shared scheduler knows it:
+    GROQ_TPM until the x-ratelimit-limit-tokens header corrects it.
+    """
+    return rate_limiter.get_scheduler().tokens.capacity
+
+
+def call_limit(prompt_tokens: int) -> int:
+    """
+    Largest input one request can carry: within the model context and
+    Groq's tokens-per-minute limit once prompt and output are reserved,
+    and never above our own stuff budget.
+    """
+    return max(0, int(min(
+        STUFF_TOKENS,
+        CONTEXT_TOKENS - rate_limiter.OUTPUT_TOKENS - prompt_tokens,
+        tokens_per_minute() - rate_limiter.OUTPUT_TOKENS - prompt_tokens,
+    )))
+
+
+# ---------------- COST MODEL ----------------
+def _reduce_levels(count: int) -> tuple[int, int, int]:
+    """
+    (calls, rounds, input tokens) to collapse `count` chunk summaries the
+    way MapReduceSummarizer does, plus the final combine call.
+    """
+    calls = rounds = tokens = 0
+    summaries = [SUMMARY_TOKENS] * count
+    while len(summaries) > 1 and sum(summaries) > REDUCE_TOKENS:
+        batches, current = [], []
+        for size in summaries:
+            if len(current) >= 2 and sum(current) + size > REDUCE_TOKENS:
+                batches.append(current)
+                current = []
+            current.append(size)
+        batches.append(current)
+        calls += len(batches)
+        rounds += 1
+        tokens += sum(summaries)
+        summaries = [SUMMARY_TOKENS] * len(batches)
+    if count > 1:
+        calls, rounds, tokens = calls + 1, rounds + 1, tokens + sum(summaries)
+    return calls, rounds, tokens
+
+
+def _finish(plan: Plan, prompt_tokens: int) -> Plan:
+    plan.predicted_input_tokens += plan.calls * prompt_tokens
+    plan.predicted_output_tokens = plan.calls * SUMMARY_TOKENS
+    total = plan.predicted_input_tokens + plan.predicted_output_tokens
+    tpm = tokens_per_minute()
+    plan.predicted_min_s = round(max(0, total - tpm) / tpm * 60, 1)
+    return plan
+
+
+def predict_map_reduce(map_tokens: list[int], chunks: int) -> tuple[int, int, int]:
+    """
+    (calls, rounds, input tokens): one map call per entry of `map_tokens`
+    (the chunks not already summarized), then the reduce over all
+    `chunks` summaries.
+    """
+    reduce_calls, reduce_rounds, reduce_tokens = _reduce_levels(chunks)
+    return (
+        len(map_tokens) + reduce_calls,
+        -(-len(map_tokens) // MAX_CONCURRENCY) + reduce_rounds,
+        sum(map_tokens) + reduce_tokens,
+    )
+
+
+def _chunked_cost(tokens: int) -> tuple[int, int, int]:
+    """predict_map_reduce for `tokens` cut into overlapping CHUNK_TOKENS chunks."""
+    step = max(1, CHUNK_TOKENS - CHUNK_OVERLAP_TOKENS)
+    count = max(1, -(-(tokens - CHUNK_OVERLAP_TOKENS) // step))
+    return predict_map_reduce([min(CHUNK_TOKENS, tokens)] * count, count)
+
+
+# ---------------- PLANNER ----------------
+def plan(docs, mode: str = "auto", prompt_tokens: int = 0, memo=None) -> Plan:
+    """
+    refine     mode is "long": chunks folded one by one into a rolling,
+               checkpointed summary (long_summarize)
+    chapters   mode is "chapters" and the documents are timestamped
+               (YouTube): one summary per chapter / section, any length
+    stuff      the input fits one call
+    extractive it does not, and mode is "extractive" or the input is too
+               long to map-reduce in reasonable time
+    map_reduce otherwise; with `memo` (a chunk_memo.MemoizedSummarizer)
+               chunk summaries already cached are not counted
+    The decision is recorded on a "plan" span.
+    """
+    tokens = docs_tokens(docs)
+    limit = call_limit(prompt_tokens)
+
+    with metrics.span("plan", input_tokens=tokens, call_limit=limit) as span:
+        if mode == "long":
+            import long_summarize
+
+            chunks = long_summarize.estimate_chunks(docs)
+            result = Plan("refine", "long-document mode", tokens, limit,
+                          calls=chunks, rounds=chunks,
+                          predicted_input_tokens=tokens + chunks * SUMMARY_TOKENS)
+
+        elif mode == "chapters" and subtitles.is_timed(docs):
+            calls = rounds = input_tokens = 0
+            groups = subtitles.chapter_groups(docs)
+            for _, _, _, group in groups:
+                group_tokens = docs_tokens(group)
+                if group_tokens <= limit:
+                    group_calls, group_rounds, group_input = 1, 1, group_tokens
+                else:
+                    group_calls, group_rounds, group_input = _chunked_cost(group_tokens)
+                calls += group_calls
+                input_tokens += group_input
+                rounds = max(rounds, group_rounds)
+            result = Plan("chapters", f"{len(groups)} timestamped sections", tokens, limit,
+                          calls=calls,
+                          rounds=rounds * -(-len(groups) // MAX_CONCURRENCY),
+                          predicted_input_tokens=input_tokens)
+
+        elif tokens <= limit:
+            result = Plan("stuff", "fits one call", tokens, limit,
+                          predicted_input_tokens=tokens)
+
+        elif mode == "extractive" or tokens > MAP_REDUCE_MAX_TOKENS:
+            import extractive  # NumPy only loads when this strategy is picked
+
+            budget = min(extractive.TOKEN_BUDGET, limit)
+            reason = ("extractive mode" if mode == "extractive"
+                      else f"over {MAP_REDUCE_MAX_TOKENS} tokens")
+            result = Plan("extractive", reason, tokens, limit,
+                          predicted_input_tokens=budget)
+
+        elif memo is not None:
+            chunks, summaries = memo.prepare(docs)
+            uncached = [estimate_tokens(chunk)
+                        for chunk, summary in zip(chunks, summaries) if summary is None]
+            calls, rounds, input_tokens = predict_map_reduce(uncached, len(chunks))
+            result = Plan("map_reduce", "too long for one call", tokens, limit,
+                          calls=calls, rounds=rounds,
+                          predicted_input_tokens=input_tokens,
+                          memo={"chunks": len(chunks),
+                                "cached": len(chunks) - len(uncached)})
+
+        else:
+            calls, rounds, input_tokens = _chunked_cost(tokens)
+            result = Plan("map_reduce", "too long for one call", tokens, limit,
+                          calls=calls, rounds=rounds,
+                          predicted_input_tokens=input_tokens)
+
+        _finish(result, prompt_tokens)
+        span.set(strategy=result.strategy, reason=result.reason,
+                 predicted_calls=result.calls,
+                 predicted_tokens=result.predicted_input_tokens + result.predicted_output_tokens)
+    return result
@@ -0,0 +1,183 @@
+# ================================
+# Speculative prefetch: load a URL while the user is still deciding
+# ================================
+#
+#   prefetcher = prefetch.get_prefetcher()
+#   prefetcher.prefetch(session, url, mode)    # on every URL change
+#   prefetcher.get(session)                    # -> Prefetch (status, tokens)
+#
+# Users paste a URL and pause a few seconds before clicking. As soon as
+# the input holds a valid URL, the content is loaded (transcript, Drive
+# or web fetch) and token-counted in the background. The load goes
+# through pipeline.load, so:
+#
+# * its documents land in the document cache, where the job's own load
+#   finds them (in any process sharing the cache);
+# * a job started while the prefetch is still running joins it through
+#   single-flight instead of fetching again.
+#
+# One prefetch per session, keyed by URL: a new URL cancels the previous
+# one (queued ones never start; running ones stop at the next document or
+# downloaded chunk), while a mode change keeps it. Prefetches never queue
+# for a heavy-load slot: the load asks the governor with wait=False and
+# is skipped when no slot is free.
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import validators
+
+import loaders
+import metrics
+import pipeline
+import resource_governor
+from summarize_engine import docs_tokens
+
+# ---------------- CONFIG ----------------
+ENABLED = os.getenv("PREFETCH", "1") != "0"
+WORKERS = int(os.getenv("PREFETCH_WORKERS", "2"))
+# Finished prefetches are forgotten after this long (the document cache
+# keeps their content; see DOC_CACHE_FRESH_SECONDS).
+KEEP_SECONDS = int(os.getenv("PREFETCH_KEEP_SECONDS", "600"))
+
+
+@dataclass
+class Prefetch:
+    url: str
+    mode: str
+    status: str = "queued"  # queued | loading | ready | failed | cancelled | skipped
+    tokens: int | None = None
+    documents: int | None = None
+    error: str | None = None
+    duration_s: float | None = None
+    started_at: float = field(default_factory=time.time)
+    cancel: threading.Event = field(default_factory=threading.Event, repr=False)
+    future: object = field(default=None, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in ("queued", "loading")
+
+
+class Prefetcher:
+    """
+    Background loads keyed by browser session, on a small thread pool
+    separate from the job workers.
+    """
+
+    def __init__(self, workers: int = WORKERS):
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._stats = {"started": 0, "ready": 0, "failed": 0,
+                       "cancelled": 0, "skipped": 0}
+
+    def prefetch(self, session, url: str, mode: str = "auto") -> Prefetch | None:
+        """
+        Starts loading `url` for `session` (in `mode`, for the token cap)
+        unless a prefetch of that URL is already running or done; any
+        other prefetch of the session is cancelled. Invalid URLs just
+        cancel.
+        """
+        url = (url or "").strip()
+        if not url or not validators.url(url):
+            self.cancel(session)
+            return None
+
+        with self._lock:
+            self._prune()
+            current = self._sessions.get(session)
+            if current is not None and current.url == url \
+                    and current.status not in ("failed", "cancelled", "skipped"):
+                return current
+            if current is not None:
+                self._cancel(current)
+
+            item = self._sessions[session] = Prefetch(url, mode)
+            # Shortcut only: the load itself takes the slot without waiting.
+            if not resource_governor.get_governor().has_capacity(loaders.source_type(url)):
+                item.status = "skipped"
+                self._stats["skipped"] += 1
+                return item
+            self._stats["started"] += 1
+            item.future = self._pool.submit(self._run, item)
+        return item
+
+    def get(self, session) -> Prefetch | None:
+        with self._lock:
+            return self._sessions.get(session)
+
+    def cancel(self, session):
+        with self._lock:
+            item = self._sessions.pop(session, None)
+            if item is not None:
+                self._cancel(item)
+
+    def _cancel(self, item: Prefetch):
+        if item.finished:
+            return
+        item.cancel.set()
+        if item.future is not None and item.future.cancel():
+            item.status = "cancelled"  # never started
+            self._stats["cancelled"] += 1
+
+    def _prune(self):
+        cutoff = time.time() - KEEP_SECONDS
+        for session, item in list(self._sessions.items()):
+            if item.finished and item.started_at < cutoff:
+                del self._sessions[session]
+
+    def _run(self, item: Prefetch):
+        if item.cancel.is_set():
+            self._finish(item, "cancelled")
+            return
+        item.status = "loading"
+        start = time.perf_counter()
+        try:
+            with metrics.trace("prefetch", url=item.url, mode=item.mode), \
+                    metrics.span("prefetch", source=loaders.source_type(item.url)) as span:
+                docs = pipeline.load(item.url, mode=item.mode, cancel=item.cancel,
+                                     wait=False)
+                # The planner's estimate; spilled documents are counted from
+                # their running total, not read back from the mmap.
+                item.documents = len(docs)
+                item.tokens = docs_tokens(docs)
+                span.set(documents=item.documents, tokens=item.tokens)
+        except loaders.LoadCancelled:
+            self._finish(item, "cancelled", start)
+        except resource_governor.Busy:
+            self._finish(item, "skipped", start)
+        except Exception as e:
+            item.error = str(e) or type(e).__name__
+            self._finish(item, "failed", start)
+        else:
+            self._finish(item, "ready", start)
+
+    def _finish(self, item: Prefetch, status: str, start: float | None = None):
+        with self._lock:
+            if start is not None:
+                item.duration_s = round(time.perf_counter() - start, 3)
+            item.status = status
+            self._stats[status] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = sum(not item.finished for item in self._sessions.values())
+        return stats
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    global _prefetcher
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
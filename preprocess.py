@@ -0,0 +1,219 @@
+# ================================
+# Token-reduction cleanup between loading and summarization
+# ================================
+
+import os
+import re
+from collections import Counter
+
+from langchain_core.documents import Document
+
+import metrics
+import resource_governor
+from summarize_engine import estimate_tokens
+
+# ---------------- CONFIG ----------------
+ENABLED = os.getenv("PREPROCESS", "1") != "0"
+# Comma-separated subset of STEPS; empty = each source's default profile.
+ONLY_STEPS = [s.strip() for s in os.getenv("PREPROCESS_STEPS", "").split(",") if s.strip()]
+# Caption overlap: repeated word runs of this length (or longer) are dropped.
+MIN_OVERLAP_WORDS = int(os.getenv("PREPROCESS_MIN_OVERLAP_WORDS", "4"))
+MAX_OVERLAP_WORDS = int(os.getenv("PREPROCESS_MAX_OVERLAP_WORDS", "32"))
+# Short lines (nav, page headers/footers) are dropped from their
+# REPEAT_LINE_COUNT-th occurrence on. Earlier occurrences stay, so pages
+# can be cleaned one by one as they are extracted.
+REPEAT_LINE_COUNT = int(os.getenv("PREPROCESS_REPEAT_LINE_COUNT", "3"))
+REPEAT_LINE_MAX_CHARS = 200
+BOILERPLATE_MAX_CHARS = 160
+
+
+# ---------------- STEPS ----------------
+_SPACES = re.compile(r"[ \t\f\v\u00a0\u200b\u200c\u200d\ufeff]+")
+_BLANK_LINES = re.compile(r"\n\s*\n(\s*\n)+")
+
+# Non-speech cues in auto-captions: [Music], [Applause], (laughs), ♪ ...
+_CAPTION_TAGS = re.compile(
+    r"\[\s*(?:music|applause|laughter|laughs|cheering|silence|inaudible|"
+    r"foreign|noise|background noise|sound|no audio)[^\]]{0,20}\]"
+    r"|\(\s*(?:music|applause|laughter|laughs|cheering|inaudible)\s*\)"
+    r"|[♪♫]+",
+    re.IGNORECASE,
+)
+
+# Banner / nav / footer phrases. A line is dropped only if it consists of
+# nothing else (one phrase, or several separated by | · •), so prose that
+# merely mentions cookies, logging in or newsletters is kept.
+_NAV_PHRASE = re.compile(
+    r"(?:accept|reject|allow|manage)(?: all)?(?: cookies| cookie settings)?"
+    r"|cookie (?:settings|preferences|policy|notice)|privacy(?: policy)?"
+    r"|terms(?: of (?:use|service))?|(?:\w+ )?all rights reserved"
+    r"|©.*|copyright (?:© ?)?\d{4}.*|skip to (?:main )?content"
+    r"|sign (?:in|up|out)|log ?(?:in|out)|register|subscribe(?: now| today)?"
+    r"|(?:sign up for|subscribe to) (?:our|the) newsletter|newsletter"
+    r"|share(?: (?:on|this)(?: \w+)?)?|follow us(?: on \w+)?|advertisement"
+    r"|back to top|related (?:posts|articles|stories)",
+    re.IGNORECASE,
+)
+_NAV_SEPARATORS = re.compile(r"\s*[|·•]\s*")
+# Consent banners are whole sentences: "We use cookies to ...".
+_COOKIE_BANNER = re.compile(r"^(?:this (?:web)?site|we) uses? cookies\b", re.IGNORECASE)
+
+
+def normalize_whitespace(text: str) -> str:
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return _BLANK_LINES.sub("\n\n", "\n".join(lines)).strip()
+
+
+def strip_caption_tags(text: str) -> str:
+    return _CAPTION_TAGS.sub(" ", text)
+
+
+def dedup_caption_overlap(text: str, min_words: int = MIN_OVERLAP_WORDS,
+                          max_words: int = MAX_OVERLAP_WORDS) -> str:
+    """
+    Rolling captions repeat the tail of the previous line at the start of
+    the next one ("and then we went | then we went to the store"). Drops
+    any run of `min_words`..`max_words` words that exactly repeats the
+    words just before it.
+    """
+    words = text.split()
+    out = []
+    i = 0
+
+    while i < len(words):
+        word = words[i]
+        skip = 0
+        # Longest candidate first: earliest start within the window.
+        for start in range(max(0, len(out) - max_words), len(out) - min_words + 1):
+            if out[start] == word:
+                size = len(out) - start
+                if words[i:i + size] == out[start:]:
+                    skip = size
+                    break
+        if skip:
+            i += skip
+            continue
+        out.append(word)
+        i += 1
+
+    return " ".join(out)
+
+
+def is_boilerplate(line: str) -> bool:
+    """
+    A short line made only of cookie-banner, nav or footer phrases
+    ("Sign in | Subscribe", "© 2024 Example Inc.", "Back to top").
+    """
+    line = line.strip()
+    if not line or len(line) > BOILERPLATE_MAX_CHARS:
+        return False
+    if _COOKIE_BANNER.match(line):
+        return True
+    segments = [seg.strip(" .!:»›>") for seg in _NAV_SEPARATORS.split(line)]
+    return all(_NAV_PHRASE.fullmatch(seg) for seg in segments if seg)
+
+
+def remove_boilerplate(text: str) -> str:
+    return "\n".join(line for line in text.split("\n") if not is_boilerplate(line))
+
+
+def remove_repeated_lines(text: str, counts: Counter,
+                          min_count: int = REPEAT_LINE_COUNT) -> str:
+    """
+    Drops short lines already seen `min_count - 1` times; `counts` carries
+    over from the previous documents.
+    """
+    kept = []
+    for line in text.split("\n"):
+        key = line.strip()
+        if key and len(key) <= REPEAT_LINE_MAX_CHARS:
+            counts[key] += 1
+            if counts[key] >= min_count:
+                continue
+        kept.append(line)
+    return "\n".join(kept)
+
+
+STEPS = ["caption_tags", "caption_overlap", "boilerplate", "repeated_lines", "whitespace"]
+
+PROFILES = {
+    "youtube": ["caption_tags", "caption_overlap", "whitespace"],
+    "web": ["boilerplate", "repeated_lines", "whitespace"],
+    "pdf": ["repeated_lines", "whitespace"],
+    "google_drive": ["repeated_lines", "whitespace"],
+}
+
+
+# ---------------- STAGE ----------------
+class Cleaner:
+    """
+    The cleaning steps for one source, applied a document at a time in
+    order (repeated-line counts carry over), so the text of pages still
+    being extracted comes out the same as a `clean_documents` pass.
+    """
+
+    def __init__(self, source_type: str, steps: list[str] | None = None):
+        self.steps = steps or ONLY_STEPS or PROFILES.get(source_type, ["whitespace"])
+        unknown = set(self.steps) - set(STEPS)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing steps: {sorted(unknown)}")
+        self._line_counts = Counter()
+
+    def clean(self, text: str) -> str:
+        if "caption_tags" in self.steps:
+            text = strip_caption_tags(text)
+        if "boilerplate" in self.steps:
+            text = remove_boilerplate(text)
+        if "repeated_lines" in self.steps:
+            text = remove_repeated_lines(text, self._line_counts)
+        if "caption_overlap" in self.steps:
+            text = dedup_caption_overlap(text)
+        if "whitespace" in self.steps:
+            text = normalize_whitespace(text)
+        return text
+
+
+def clean_documents(docs, source_type: str, steps: list[str] | None = None):
+    """
+    Returns (cleaned_docs, report). Each cleaned document carries
+    `tokens_before` / `tokens_saved` in its metadata; documents that would
+    end up empty are dropped, and if nothing is left the input is
+    returned unchanged.
+    """
+    cleaner = Cleaner(source_type, steps)
+    per_doc = []
+
+    def clean():
+        # One document at a time, so a spilled input stays spilled.
+        for doc in docs:
+            before = estimate_tokens(doc.page_content)
+            text = cleaner.clean(doc.page_content)
+            after = estimate_tokens(text)
+            per_doc.append({"tokens_before": before, "tokens_after": after,
+                            "tokens_saved": before - after})
+            if text.strip():
+                yield Document(
+                    page_content=text,
+                    metadata={**doc.metadata, "tokens_before": before,
+                              "tokens_saved": before - after},
+                )
+
+    with metrics.span("preprocess", source=source_type) as span:
+        span.set_docs(docs)
+        cleaned = resource_governor.spill(clean())
+
+        report = {
+            "steps": cleaner.steps,
+            "tokens_before": sum(d["tokens_before"] for d in per_doc),
+            "tokens_after": sum(d["tokens_after"] for d in per_doc),
+            "documents": per_doc,
+        }
+        report["tokens_saved"] = report["tokens_before"] - report["tokens_after"]
+        span.set(tokens_saved=report["tokens_saved"], steps=",".join(cleaner.steps))
+
+    if not cleaned:
+        report.update(tokens_after=report["tokens_before"], tokens_saved=0,
+                      fallback=True)
+        return docs, report
+
+    return cleaned, report
@@ -0,0 +1,390 @@
+# ================================
+# Client-side Groq rate-limit scheduler (RPM + TPM token buckets)
+# ================================
+
+import os
+import re
+import time
+import threading
+import contextvars
+from collections import deque
+
+import metrics
+
+# ---------------- CONFIG ----------------
+# Starting limits; TPM is corrected from x-ratelimit-* headers once Groq answers.
+RPM = int(os.getenv("GROQ_RPM", "30"))
+TPM = int(os.getenv("GROQ_TPM", "6000"))
+# Completion tokens count against TPM too; reserve this much per request.
+OUTPUT_TOKENS = int(os.getenv("GROQ_OUTPUT_TOKENS", "512"))
+MAX_WAIT = float(os.getenv("GROQ_MAX_QUEUE_WAIT", "120"))
+RATE_LIMIT_RETRIES = int(os.getenv("GROQ_RATE_LIMIT_RETRIES", "2"))
+
+# Fairness key for the current caller (Streamlit session, batch job, ...).
+current_session = contextvars.ContextVar("rate_limit_session", default="default")
+# Ticket of the LLM request being sent from this context (see `call`), so
+# the response-header hook can tell which request its correction covers.
+current_ticket = contextvars.ContextVar("rate_limit_ticket", default=None)
+
+
+class QueueTimeout(RuntimeError):
+    """Raised when a request could not be admitted within the max wait."""
+
+
+def parse_duration(value: str | None) -> float | None:
+    """
+    Groq reset headers look like "7.66s", "2m59.56s" or "1h2m3s".
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = re.findall(r"([\d.]+)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+# ---------------- TOKEN BUCKET ----------------
+class TokenBucket:
+    """
+    `capacity` units per minute, refilled continuously. The level may go
+    negative when actual usage turns out higher than estimated.
+    """
+
+    def __init__(self, capacity: float):
+        self.capacity = float(capacity)
+        self.level = float(capacity)
+        self.scale = 1.0
+        self._last = time.monotonic()
+
+    def refill(self, now: float):
+        rate = self.capacity * self.scale / 60.0
+        self.level = min(self.capacity, self.level + (now - self._last) * rate)
+        self._last = now
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        missing = min(amount, self.capacity) - self.level
+        if missing <= 0:
+            return 0.0
+        return missing / (self.capacity * self.scale / 60.0)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+# ---------------- SCHEDULER ----------------
+class _Waiter:
+    __slots__ = ("tokens", "enqueued_at")
+
+    def __init__(self, tokens: int):
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+
+
+class Ticket:
+    def __init__(self, scheduler, tokens: int, waited_s: float = 0.0):
+        self.scheduler = scheduler
+        self.tokens = tokens
+        self.waited_s = waited_s
+        # Set once Groq's x-ratelimit-remaining-tokens for this request
+        # has been applied: the bucket then already reflects its usage.
+        self.corrected = False
+
+    def settle(self, actual_tokens: int | None):
+        """
+        Corrects the TPM bucket once real usage is known, unless the
+        response headers already did.
+        """
+        if actual_tokens is not None and not self.corrected:
+            self.scheduler._adjust_tokens(actual_tokens - self.tokens)
+
+
+class RateLimitScheduler:
+    """
+    Admits LLM requests through an RPM and a TPM token bucket.
+
+    Waiting requests are queued per session and served round-robin across
+    sessions, so one session's map-reduce fan-out cannot starve the rest.
+    Limits adapt to Groq's x-ratelimit-* headers; a 429 empties the
+    buckets, pauses admission for Retry-After and backs the rate off until
+    requests succeed again.
+    """
+
+    def __init__(self, rpm: int = RPM, tpm: int = TPM, max_wait: float = MAX_WAIT):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._queues = {}       # session -> deque[_Waiter]
+        self._order = deque()   # sessions with waiters, round-robin order
+        self._paused_until = 0.0
+        self._stats = {"admitted": 0, "timeouts": 0, "rate_limited": 0,
+                       "wait_total_s": 0.0, "wait_max_s": 0.0}
+
+    # ----- queueing -----
+    def _head(self):
+        if not self._order:
+            return None
+        return self._queues[self._order[0]][0]
+
+    def _pop_head(self):
+        session = self._order.popleft()
+        queue = self._queues[session]
+        queue.popleft()
+        if queue:
+            self._order.append(session)  # back of the line for fairness
+        else:
+            del self._queues[session]
+
+    def _remove(self, session, waiter):
+        queue = self._queues.get(session)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del self._queues[session]
+            self._order.remove(session)
+
+    def _wait_needed(self, tokens: int, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(
+            self._paused_until - now,
+            self.requests.wait_for(1),
+            self.tokens.wait_for(tokens),
+        )
+
+    def acquire(self, tokens: int, session: str | None = None,
+                timeout: float | None = None) -> Ticket:
+        session = session or current_session.get()
+        timeout = self.max_wait if timeout is None else timeout
+        waiter = _Waiter(tokens)
+        deadline = waiter.enqueued_at + timeout
+
+        with self._cond:
+            if session not in self._queues:
+                self._queues[session] = deque()
+                self._order.append(session)
+            self._queues[session].append(waiter)
+
+            while True:
+                now = time.monotonic()
+                wait_s = None
+
+                if self._head() is waiter:
+                    wait_s = self._wait_needed(tokens, now)
+                    if wait_s <= 0:
+                        self.requests.take(1)
+                        self.tokens.take(tokens)
+                        self._pop_head()
+                        self._cond.notify_all()
+                        break
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._remove(session, waiter)
+                    self._stats["timeouts"] += 1
+                    self._cond.notify_all()
+                    raise QueueTimeout(
+                        "The summarizer is busy (Groq rate limit). "
+                        "Please try again in a minute."
+                    )
+
+                self._cond.wait(min(wait_s, remaining) if wait_s else remaining)
+
+            waited = time.monotonic() - waiter.enqueued_at
+            self._stats["admitted"] += 1
+            self._stats["wait_total_s"] += waited
+            self._stats["wait_max_s"] = max(self._stats["wait_max_s"], waited)
+
+        metrics.annotate(queue_wait_s=round(waited, 4))
+        return Ticket(self, tokens, waited)
+
+    def try_acquire(self, tokens: int) -> Ticket | None:
+        """
+        A ticket if `tokens` can be admitted right now without queueing
+        (nobody waiting, buckets not short), else None. For optional
+        requests such as hedges, which must not jump or join the queue.
+        """
+        with self._cond:
+            if self._head() is not None or self._wait_needed(tokens, time.monotonic()) > 0:
+                return None
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            self._stats["admitted"] += 1
+        return Ticket(self, tokens)
+
+    def _adjust_tokens(self, delta: int):
+        with self._cond:
+            self.tokens.level -= delta
+            self._cond.notify_all()
+
+    # ----- adaptation -----
+    def observe(self, status: int, headers):
+        """
+        Feed every Groq HTTP response (status + headers) into the limiter.
+        """
+        now = time.monotonic()
+        with self._cond:
+            # Groq: *-tokens are per minute (TPM); *-requests are per day,
+            # so they only matter once exhausted.
+            limit = headers.get("x-ratelimit-limit-tokens")
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            try:
+                if limit:
+                    self.tokens.capacity = float(limit)
+                if remaining is not None:
+                    self.tokens.refill(now)
+                    self.tokens.level = min(self.tokens.level, float(remaining))
+                    ticket = current_ticket.get()
+                    if ticket is not None:
+                        ticket.corrected = True
+                if headers.get("x-ratelimit-remaining-requests") == "0":
+                    reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                    self._paused_until = max(self._paused_until, now + (reset or 60.0))
+            except ValueError:
+                pass
+
+            if status == 429:
+                self._stats["rate_limited"] += 1
+                retry_after = parse_duration(headers.get("retry-after")) or 1.0
+                self._paused_until = max(self._paused_until, now + retry_after)
+                for bucket in (self.requests, self.tokens):
+                    bucket.level = min(bucket.level, 0.0)
+                    bucket.scale = max(0.1, bucket.scale * 0.8)
+            elif status < 400:
+                for bucket in (self.requests, self.tokens):
+                    bucket.scale = min(1.0, bucket.scale + 0.02)
+
+            self._cond.notify_all()
+
+    def observe_httpx(self, response):
+        """httpx response event hook (see pipeline.build_llm)."""
+        self.observe(response.status_code, response.headers)
+
+    # ----- metrics -----
+    def stats(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            waiting = [w for q in self._queues.values() for w in q]
+            stats = dict(self._stats)
+            stats.update(
+                queue_depth=len(waiting),
+                sessions_waiting=len(self._queues),
+                oldest_wait_s=round(
+                    max((now - w.enqueued_at for w in waiting), default=0.0), 3
+                ),
+                mean_wait_s=round(
+                    stats["wait_total_s"] / stats["admitted"], 3
+                ) if stats["admitted"] else 0.0,
+                rpm_limit=self.requests.capacity,
+                tpm_limit=self.tokens.capacity,
+                rate_scale=round(self.tokens.scale, 3),
+                paused_s=round(max(0.0, self._paused_until - now), 3),
+            )
+        stats["wait_total_s"] = round(stats["wait_total_s"], 3)
+        stats["wait_max_s"] = round(stats["wait_max_s"], 3)
+        return stats
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> RateLimitScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RateLimitScheduler()
+        return _scheduler
+
+
+# ---------------- CALL HELPERS ----------------
+def _is_rate_limit(exc: Exception) -> bool:
+    return type(exc).__name__ == "RateLimitError" or getattr(exc, "status_code", None) == 429
+
+
+def _usage(message) -> int | None:
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens")
+
+
+def _sent(fn, ticket: Ticket):
+    """`fn()` with `ticket` current, so response headers are credited to it."""
+    token = current_ticket.set(ticket)
+    try:
+        return fn()
+    finally:
+        current_ticket.reset(token)
+
+
+def call(fn, prompt_tokens: int):
+    """
+    Runs `fn()` once admitted for `prompt_tokens` (+ reserved output),
+    retrying on 429 after the scheduler's pause. `fn` should return the
+    LLM message: its usage settles the reservation.
+    """
+    scheduler = get_scheduler()
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        ticket = scheduler.acquire(prompt_tokens + OUTPUT_TOKENS)
+        try:
+            result = _sent(fn, ticket)
+        except Exception as e:
+            if attempt < RATE_LIMIT_RETRIES and _is_rate_limit(e):
+                continue  # observe() already paused the queue
+            raise
+        ticket.settle(_usage(result))
+        return result
+
+
+def invoke(llm, text: str, prompt_tokens: int):
+    return call(lambda: llm.invoke(text), prompt_tokens)
+
+
+def stream(llm, text: str, prompt_tokens: int):
+    """
+    llm.stream(text) admitted through the scheduler, settled with the
+    usage reported in the stream (normally on its last chunk). Retried on
+    429 only if nothing has been yielded yet.
+    """
+    scheduler = get_scheduler()
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        ticket = scheduler.acquire(prompt_tokens + OUTPUT_TOKENS)
+        started, used = False, None
+        try:
+            chunks = iter(llm.stream(text))
+            while True:
+                # The ticket is current only while the next chunk is fetched
+                # (the consumer runs in this context between chunks).
+                chunk = _sent(lambda: next(chunks, None), ticket)
+                if chunk is None:
+                    break
+                started = True
+                tokens = _usage(chunk)
+                if tokens is not None:
+                    used = (used or 0) + tokens  # chunk usages add up, like the chunks
+                yield chunk
+        except Exception as e:
+            if not started and attempt < RATE_LIMIT_RETRIES and _is_rate_limit(e):
+                continue
+            raise
+        ticket.settle(used)
+        return
+
+
+def run_in_session(session: str, fn, *args, **kwargs):
+    """
+    Calls `fn` with `session` as the fairness key for every LLM call it makes.
+    """
+    token = current_session.set(session)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        current_session.reset(token)
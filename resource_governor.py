@@ -0,0 +1,387 @@
+# ================================
+# Process-wide resource governor: heavy-load slots, size caps, RSS watermark
+# ================================
+#
+#   with resource_governor.get_governor().heavy_load("pdf"):
+#       docs = loaders.load_documents(url)
+#   docs = resource_governor.spill(iter_docs)   # large texts → mmap
+#
+# Every session and job worker shares one process, so memory is bounded
+# here rather than per request:
+#
+# * At most MAX_HEAVY_LOADS downloads + extractions (PDF, Drive files,
+#   Unstructured) run at once; the rest queue, up to MAX_WAIT seconds.
+# * New loads also wait while resident memory is above RSS_HIGH_MB, until
+#   it drops below RSS_LOW_MB, and are rejected after MAX_WAIT.
+# * Each source type has a byte cap (download size) and a token cap
+#   (extracted text); oversized documents fail early instead of being
+#   held and sent to the LLM.
+# * Once extracted text passes SPILL_CHARS, further documents go straight
+#   to a memory-mapped temp file as they are extracted, and are
+#   materialized one at a time while they wait for the LLM. Keys, token
+#   counts and fingerprints are computed document by document, so the
+#   full text is never joined into one string.
+
+import gc
+import os
+import mmap
+import time
+import weakref
+import tempfile
+import threading
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+import downloads
+import html_extract
+import metrics
+from summarize_engine import CHARS_PER_TOKEN
+
+# ---------------- CONFIG ----------------
+MAX_HEAVY_LOADS = int(os.getenv("GOVERNOR_MAX_HEAVY_LOADS", "2"))
+HEAVY_SOURCES = [s.strip() for s in os.getenv(
+    "GOVERNOR_HEAVY_SOURCES", "google_drive,pdf,web").split(",") if s.strip()]
+MAX_WAIT = float(os.getenv("GOVERNOR_MAX_WAIT", "60"))
+# 0 = no watermark.
+RSS_HIGH_MB = float(os.getenv("GOVERNOR_RSS_HIGH_MB", "0"))
+RSS_LOW_MB = float(os.getenv("GOVERNOR_RSS_LOW_MB", str(RSS_HIGH_MB * 0.9)))
+SPILL_CHARS = int(os.getenv("GOVERNOR_SPILL_CHARS", str(1024 * 1024)))
+# ~2 MB of text; a 10-hour livestream transcript is ~150k tokens.
+DEFAULT_MAX_TOKENS = int(os.getenv("GOVERNOR_MAX_TOKENS", "500000"))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class Overloaded(RuntimeError):
+    """No heavy-load slot (or memory headroom) within the max wait."""
+
+
+class Busy(BaseException):
+    """
+    No slot free right now for a caller that does not wait (prefetch).
+    Not an Exception, so single-flight followers take the load over
+    instead of sharing the refusal.
+    """
+
+
+class DocumentTooLarge(downloads.PayloadTooLarge):
+    """Extracted text over the source type's token cap."""
+
+
+# ---------------- LIMITS ----------------
+@dataclass(frozen=True)
+class Limits:
+    max_bytes: int
+    max_tokens: int
+
+
+def _limits(source_type: str, max_bytes: int) -> Limits:
+    name = source_type.upper()
+    return Limits(
+        int(os.getenv(f"GOVERNOR_MAX_BYTES_{name}", str(max_bytes))),
+        int(os.getenv(f"GOVERNOR_MAX_TOKENS_{name}", str(DEFAULT_MAX_TOKENS))),
+    )
+
+
+LIMITS = {
+    "google_drive": _limits("google_drive", downloads.MAX_DOWNLOAD_BYTES),
+    "pdf": _limits("pdf", downloads.MAX_DOWNLOAD_BYTES),
+    "web": _limits("web", html_extract.MAX_BYTES),
+    # Subtitles are streamed and never held as bytes.
+    "youtube": _limits("youtube", downloads.MAX_DOWNLOAD_BYTES),
+}
+
+
+def limits(source_type: str) -> Limits:
+    return LIMITS.get(source_type) or _limits(source_type, downloads.MAX_DOWNLOAD_BYTES)
+
+
+def rss_bytes() -> int:
+    """Current resident set size (peak on platforms without /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def check_tokens(docs, source_type: str, max_tokens: int | None = None):
+    """
+    Passes documents through, raising DocumentTooLarge as soon as their
+    text exceeds `max_tokens` (default: the source type's token cap), so
+    page-by-page extraction stops there.
+    """
+    max_tokens = max_tokens or limits(source_type).max_tokens
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chars = 0
+    for doc in docs:
+        chars += len(doc.page_content)
+        if chars > max_chars:
+            get_governor().count("rejected_too_large")
+            raise DocumentTooLarge(
+                f"Document has over {max_tokens:,} tokens of text, "
+                f"the limit for {source_type}."
+            )
+        yield doc
+
+
+# ---------------- SPILLED DOCUMENTS ----------------
+class SpilledDocuments(Sequence):
+    """
+    Read-only list of Documents whose text lives in an mmap over an
+    anonymous temp file, filled with `append` as documents arrive.
+    Indexing or iterating materializes one Document at a time; metadata
+    stays in memory.
+    """
+
+    def __init__(self, docs=()):
+        self._file = tempfile.TemporaryFile()
+        self._offsets = array("Q", [0])
+        self._metadata = []
+        self._map = None
+        self.chars = 0
+        for doc in docs:
+            self.append(doc)
+
+    @property
+    def nbytes(self) -> int:
+        return self._offsets[-1]
+
+    def append(self, doc: Document):
+        data = doc.page_content.encode("utf-8")
+        self._file.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._metadata.append(doc.metadata)
+        self.chars += len(doc.page_content)
+
+    def _mapped(self):
+        """The mmap, remapped if documents were appended since."""
+        if self._map is None or len(self._map) < self.nbytes:
+            self._file.flush()
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def __len__(self) -> int:
+        return len(self._metadata)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start, end = self._offsets[index], self._offsets[index + 1]
+        text = self._mapped()[start:end].decode("utf-8") if end > start else ""
+        return Document(page_content=text, metadata=dict(self._metadata[index]))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+def spill(docs, threshold: int | None = None):
+    """
+    Collects documents from an iterable as they arrive. They stay in a
+    list while their text is under `threshold` (default SPILL_CHARS)
+    characters; past it, they
+    move to a SpilledDocuments file that the rest are appended to, so at
+    most `threshold` characters plus one document are held at a time.
+    """
+    threshold = SPILL_CHARS if threshold is None else threshold
+    if threshold <= 0 or isinstance(docs, SpilledDocuments):
+        return docs if isinstance(docs, SpilledDocuments) else list(docs)
+    held, chars, spilled = [], 0, None
+    for doc in docs:
+        if spilled is not None:
+            spilled.append(doc)
+            continue
+        held.append(doc)
+        chars += len(doc.page_content)
+        if chars > threshold:
+            spilled = SpilledDocuments(held)
+            held = None
+    if spilled is None:
+        return held
+    with metrics.span("governor.spill", documents=len(spilled), bytes=spilled.nbytes):
+        get_governor().track_spill(spilled)
+    return spilled
+
+
+# ---------------- GOVERNOR ----------------
+class ResourceGovernor:
+    """
+    Heavy-load slots and the RSS watermark, with current / peak usage.
+    """
+
+    def __init__(self, max_heavy: int = MAX_HEAVY_LOADS, max_wait: float = MAX_WAIT,
+                 rss_high_mb: float = RSS_HIGH_MB, rss_low_mb: float = RSS_LOW_MB):
+        self.max_heavy = max(1, max_heavy)
+        self.max_wait = max_wait
+        self.rss_high = int(rss_high_mb * 1024 * 1024)
+        self.rss_low = int(min(rss_low_mb, rss_high_mb) * 1024 * 1024)
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = 0
+        self._spilled = 0
+        self._over_watermark = False
+        self._stats = {
+            "heavy_loads": 0, "heavy_loads_peak": 0, "queued": 0, "wait_total_s": 0.0,
+            "rejected_overload": 0, "rejected_busy": 0, "rejected_too_large": 0,
+            "spilled_docs": 0, "spilled_bytes_peak": 0, "rss_peak_bytes": 0,
+        }
+
+    def count(self, name: str, amount: int = 1):
+        with self._cond:
+            self._stats[name] += amount
+
+    def _collect_if_high(self):
+        """
+        One full collection before memory is declared over the watermark.
+        Runs outside the lock: it can take a while, and admissions and
+        releases in other threads must not wait for it.
+        """
+        if self.rss_high and not self._over_watermark and rss_bytes() >= self.rss_high:
+            gc.collect()
+
+    def _memory_ok(self) -> bool:
+        """
+        Hysteresis: once over the high watermark, admission resumes only
+        below the low one. Called with the lock held.
+        """
+        rss = rss_bytes()
+        self._stats["rss_peak_bytes"] = max(self._stats["rss_peak_bytes"], rss)
+        if not self.rss_high:
+            return True
+        if rss >= self.rss_high:
+            self._over_watermark = True
+        elif self._over_watermark and rss < (self.rss_low or self.rss_high):
+            self._over_watermark = False
+        return not self._over_watermark
+
+    def has_capacity(self, source_type: str) -> bool:
+        """
+        Whether a load of `source_type` would start without queueing.
+        Only a hint (the slot can be gone a moment later); speculative
+        work is admitted with heavy_load(wait=False).
+        """
+        self._collect_if_high()
+        with self._cond:
+            if not self._memory_ok():
+                return False
+            return source_type not in HEAVY_SOURCES or self._active < self.max_heavy
+
+    @contextmanager
+    def heavy_load(self, source_type: str, wait: bool = True):
+        """
+        Holds a heavy-load slot (heavy source types only) once memory is
+        below the watermark. Raises Overloaded after `max_wait`, or Busy
+        at once if `wait` is off.
+        """
+        heavy = source_type in HEAVY_SOURCES
+        start = time.monotonic()
+        self._collect_if_high()
+        with self._cond:
+            queued = False
+            while not self._memory_ok() or (heavy and self._active >= self.max_heavy):
+                if not wait:
+                    self._stats["rejected_busy"] += 1
+                    raise Busy(source_type)
+                remaining = self.max_wait - (time.monotonic() - start)
+                if remaining <= 0:
+                    self._stats["rejected_overload"] += 1
+                    if queued:
+                        self._waiting -= 1
+                    reason = ("memory above watermark" if self._over_watermark
+                              else f"{self._active} heavy loads running")
+                    raise Overloaded(f"Server busy ({reason}); try again shortly.")
+                if not queued:
+                    queued = True
+                    self._waiting += 1
+                    self._stats["queued"] += 1
+                # Memory is polled: nothing notifies when RSS drops.
+                self._cond.wait(min(remaining, 0.5))
+            if queued:
+                self._waiting -= 1
+            waited = time.monotonic() - start
+            self._stats["wait_total_s"] += waited
+            if heavy:
+                self._active += 1
+                self._stats["heavy_loads"] += 1
+                self._stats["heavy_loads_peak"] = max(self._stats["heavy_loads_peak"],
+                                                      self._active)
+        metrics.annotate(governor_wait_s=round(waited, 3))
+        try:
+            yield
+        finally:
+            if heavy:
+                with self._cond:
+                    self._active -= 1
+                    self._cond.notify()
+
+    def track_spill(self, spilled: SpilledDocuments):
+        with self._cond:
+            self._spilled += spilled.nbytes
+            self._stats["spilled_docs"] += 1
+            self._stats["spilled_bytes_peak"] = max(self._stats["spilled_bytes_peak"],
+                                                    self._spilled)
+        weakref.finalize(spilled, self._release_spill, spilled.nbytes)
+
+    def _release_spill(self, nbytes: int):
+        with self._cond:
+            self._spilled -= nbytes
+
+    def stats(self) -> dict:
+        rss = rss_bytes()
+        with self._cond:
+            self._stats["rss_peak_bytes"] = max(self._stats["rss_peak_bytes"], rss)
+            stats = dict(self._stats)
+            stats.update(
+                heavy_loads_active=self._active,
+                heavy_loads_limit=self.max_heavy,
+                waiting=self._waiting,
+                spilled_bytes=self._spilled,
+                rss_bytes=rss,
+                rss_high_bytes=self.rss_high,
+                over_watermark=self._over_watermark,
+            )
+        stats["wait_total_s"] = round(stats["wait_total_s"], 3)
+        return stats
+
+    def gauges(self) -> dict:
+        """Prometheus gauges (current and peak usage)."""
+        stats = self.stats()
+        return {
+            "summarizer_heavy_loads": ("Heavy loads running.", stats["heavy_loads_active"]),
+            "summarizer_heavy_loads_peak": ("Most heavy loads at once.", stats["heavy_loads_peak"]),
+            "summarizer_loads_waiting": ("Loads queued for a slot or memory.", stats["waiting"]),
+            "summarizer_rss_bytes": ("Resident set size.", stats["rss_bytes"]),
+            "summarizer_rss_peak_bytes": ("Peak resident set size seen.", stats["rss_peak_bytes"]),
+            "summarizer_spilled_bytes": ("Extracted text held in mmap spill files.", stats["spilled_bytes"]),
+            "summarizer_spilled_peak_bytes": ("Peak spilled text.", stats["spilled_bytes_peak"]),
+            "summarizer_loads_rejected_total": ("Loads rejected (overload).", stats["rejected_overload"]),
+            "summarizer_documents_too_large_total": ("Documents over their token cap.", stats["rejected_too_large"]),
+        }
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> ResourceGovernor:
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor()
+            metrics.get_registry().add_gauges(_governor.gauges)
+        return _governor
@@ -0,0 +1,302 @@
+# ================================
+# Single-flight: coalesce identical concurrent work
+# ================================
+#
+#   loads = single_flight.Group("load")
+#   docs = loads.do(key, lambda: load(url))          # one call per key at a time
+#
+#   tokens = summaries.stream(key, lambda: llm_stream(...))
+#   for token in tokens: ...                         # followers replay + follow
+#
+# The first caller for a key (the leader) does the work; callers arriving
+# while it is in flight (followers) wait for the leader's result instead
+# of repeating it. Results are not kept after the flight lands; caching
+# is the caches' job.
+
+import os
+import copy
+import time
+import threading
+import contextvars
+
+import metrics
+
+# ---------------- CONFIG ----------------
+# Longest a follower waits for the leader's result before giving up.
+FOLLOW_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "600"))
+# How often a waiting follower checks its cancel event.
+CANCEL_POLL = 0.25
+
+
+class FlightCancelled(RuntimeError):
+    """The shared work was abandoned before it produced a result."""
+
+
+class FlightTimeout(TimeoutError):
+    """A follower gave up waiting for the leader's result."""
+
+
+class FlightFailed(RuntimeError):
+    """The shared work failed with an exception that could not be copied."""
+
+
+def _copy(error: BaseException) -> BaseException:
+    """
+    A copy of the leader's exception for one follower to raise: raising
+    the same instance from several threads would interleave their
+    tracebacks on it. Same type and arguments; the original is chained
+    as the cause by the caller.
+    """
+    try:
+        return copy.copy(error)
+    except Exception:
+        return FlightFailed(f"{type(error).__name__}: {error}")
+
+
+# ---------------- CALLS ----------------
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+
+# ---------------- STREAMS ----------------
+class _Stream:
+    """
+    One producer thread feeding any number of subscribers. Every
+    subscriber sees all tokens from the start (late joiners replay the
+    buffer). When the last subscriber leaves early, the producer is told
+    to stop and closes its source iterator.
+    """
+
+    def __init__(self, group, key, make_tokens, context):
+        self.group = group
+        self.key = key
+        self.tokens = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        self.cancel = threading.Event()
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(
+            target=context.run, args=(self._produce, make_tokens),
+            daemon=True, name=f"flight-{group.name}",
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def _produce(self, make_tokens):
+        source = None
+        try:
+            source = make_tokens()
+            for token in source:
+                with self._cond:
+                    self.tokens.append(token)
+                    self._cond.notify_all()
+                if self.cancel.is_set():
+                    raise FlightCancelled("All subscribers left.")
+        except BaseException as e:
+            with self._cond:
+                self.error = e
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()  # e.g. ends the streaming HTTP response early
+            self.group._land(self.key, self)
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def subscribe(self):
+        """
+        Registers a subscriber and returns its token iterator, or None if
+        the flight was already abandoned (the caller should start anew).
+        """
+        with self._cond:
+            if self.cancel.is_set():
+                return None
+            self.subscribers += 1
+        return _Subscription(self)
+
+    def _leave(self):
+        with self._cond:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished:
+                self.cancel.set()
+
+    def _follow(self):
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self.tokens) and not self.finished:
+                    self._cond.wait()
+                pending = self.tokens[position:]
+                position = len(self.tokens)
+                finished, error = self.finished, self.error
+
+            yield from pending
+
+            if finished and position >= len(self.tokens):
+                if error is not None:
+                    raise _copy(error) from error
+                return
+
+
+class _Subscription:
+    """
+    One subscriber's token iterator. The subscriber leaves when it is
+    exhausted, closed or garbage collected, whether or not it was ever
+    iterated (a generator that never started would not run its cleanup).
+    """
+
+    def __init__(self, flight: _Stream):
+        self._flight = flight
+        self._tokens = flight._follow()
+        self._left = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._tokens)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._left:
+            return
+        self._left = True
+        self._tokens.close()
+        self._flight._leave()
+
+    def __del__(self):
+        self.close()
+
+
+# ---------------- GROUP ----------------
+class Group:
+    """
+    In-flight deduplication for one kind of work (loads, summaries, ...).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._stats = {"leaders": 0, "followers": 0, "cancelled": 0, "errors": 0,
+                       "timeouts": 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def do(self, key, fn, cancel=None, timeout: float | None = None):
+        """
+        Runs `fn()` unless an identical call is in flight, in which case
+        its result (or a copy of its exception) is shared. If the leader is
+        interrupted (not an ordinary exception), a waiting follower takes
+        over. A follower raises FlightCancelled once `cancel` (a
+        threading.Event) is set, and FlightTimeout after `timeout` seconds
+        (default FOLLOW_TIMEOUT).
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self._stats["leaders"] += 1
+                else:
+                    self._stats["followers"] += 1
+
+            if leader:
+                return self._lead(key, call, fn)
+
+            with metrics.span(f"single_flight.{self.name}", role="follower"):
+                self._wait(call, cancel, FOLLOW_TIMEOUT if timeout is None else timeout)
+            if call.cancelled:
+                continue  # leader went away: try to become the leader
+            if call.error is not None:
+                raise _copy(call.error) from call.error
+            return call.result
+
+    def _wait(self, call, cancel, timeout: float):
+        deadline = time.monotonic() + timeout
+        while not call.done.is_set():
+            if cancel is not None and cancel.is_set():
+                self._count("cancelled")
+                raise FlightCancelled(f"Stopped waiting for the {self.name} in flight.")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._count("timeouts")
+                raise FlightTimeout(
+                    f"The {self.name} in flight took over {timeout:.0f}s."
+                )
+            call.done.wait(min(remaining, CANCEL_POLL) if cancel is not None else remaining)
+
+    def _lead(self, key, call, fn):
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            self._count("errors")
+            raise
+        except BaseException:
+            call.cancelled = True
+            self._count("cancelled")
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def stream(self, key, make_tokens):
+        """
+        Iterator over the tokens of `make_tokens()`, shared with every
+        concurrent caller using the same key. The producer runs on its
+        own thread in the first caller's context (rate-limit session,
+        trace), so no single caller's cancellation stops the others.
+        """
+        while True:
+            with self._lock:
+                flight = self._streams.get(key)
+                leader = flight is None or flight.cancel.is_set()
+                if leader:
+                    flight = self._streams[key] = _Stream(
+                        self, key, make_tokens, contextvars.copy_context()
+                    )
+
+            tokens = flight.subscribe()
+            if tokens is not None:
+                break  # else: abandoned between lookup and subscribe
+
+        self._count("leaders" if leader else "followers")
+        if leader:
+            flight.start()
+        else:
+            metrics.annotate(single_flight=self.name, role="follower")
+        return tokens
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._streams.get(key) is flight:
+                del self._streams[key]
+            if flight.cancel.is_set():
+                self._stats["cancelled"] += 1
+            elif flight.error is not None:
+                self._stats["errors"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._streams)
+        return stats
@@ -0,0 +1,103 @@
+# ================================
+# Startup timing (cold start + first render)
+# ================================
+#
+# In the app:    startup.mark("imports", t0) / startup.mark("first_render", t0)
+# From a shell:  python startup.py   → per-module import times, fresh interpreter each
+
+import os
+import sys
+import json
+import time
+import subprocess
+import threading
+
+from summary_cache import CACHE_DIR
+
+REPORT_FILE = os.path.join(CACHE_DIR, "startup.jsonl")
+
+_lock = threading.Lock()
+_marks = {}
+
+
+def process_age() -> float | None:
+    """
+    Seconds since this process started (Linux only), i.e. how long the
+    container/server has been up when a mark is taken.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def mark(name: str, since: float):
+    """
+    Records `name` once per process, measured from `since` (perf_counter).
+    The first-render mark also appends the full report to REPORT_FILE.
+    """
+    with _lock:
+        if name in _marks:
+            return
+        _marks[name] = round(time.perf_counter() - since, 4)
+
+        if name == "first_render":
+            _marks["process_age_at_first_render"] = process_age()
+            _write(dict(_marks, pid=os.getpid(), at=time.time()))
+
+
+def _write(record: dict):
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(REPORT_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError:
+        pass
+
+
+def report() -> dict:
+    with _lock:
+        return dict(_marks)
+
+
+# ---------------- IMPORT PROFILE ----------------
+MODULES = [
+    "streamlit",
+    "validators",
+    "api_key_prod",
+    "summary_cache",
+    "document_cache",
+    "http_client",
+    "loaders",
+    "summarize_engine",
+    "pipeline",
+    "langchain_groq",
+    "langchain.chains.summarize",
+]
+
+
+def import_times(modules=MODULES) -> dict:
+    """
+    Cold import time of each module in a fresh interpreter.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    times = {}
+    for module in modules:
+        code = (
+            "import time; t = time.perf_counter(); "
+            f"import {module}; print(time.perf_counter() - t)"
+        )
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=here,
+            capture_output=True, text=True,
+        )
+        times[module] = round(float(out.stdout), 4) if out.returncode == 0 else None
+    return times
+
+
+if __name__ == "__main__":
+    print(json.dumps(import_times(), indent=2))
@@ -0,0 +1,330 @@
+# ================================
+# Timed transcripts: streaming json3 parsing into a compact, sliceable form
+# ================================
+#
+#   transcript = subtitles.parse_json3(resp, chapters=info.get("chapters"))
+#   transcript.slice(600, 1200).text          # minutes 10-20
+#   transcript.sections(max_tokens=3000)      # split at chapters / pauses
+#   transcript.documents(url)                 # one Document per section
+#
+# A 10-hour livestream's auto captions are tens of MB of json3, mostly
+# per-word "segs" dicts. They are decoded one event at a time from the
+# byte stream, and only the joined text plus two typed arrays (character
+# offset and start time of each caption event) are kept, so memory stays
+# proportional to the spoken text, not to the json3 file.
+
+import io
+import json
+import codecs
+import bisect
+from array import array
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+
+import downloads
+from summarize_engine import CHARS_PER_TOKEN, CHUNK_TOKENS
+
+READ_SIZE = 1 << 16
+# A section boundary is placed at the longest pause within the last
+# SPLIT_WINDOW share of the section's budget.
+SPLIT_WINDOW = 0.2
+
+
+class SubtitleFormatError(ValueError):
+    """The stream is not json3 subtitles."""
+
+
+def timestamp(seconds: float) -> str:
+    """1:02:03 or 2:03, as YouTube shows them."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+# ---------------- TRANSCRIPT ----------------
+@dataclass
+class Section:
+    start_s: float
+    end_s: float
+    text: str
+    chapter: str | None = None
+    chapter_start_s: float | None = None
+
+
+class Transcript:
+    """
+    Caption text joined with single spaces; `offsets[i]` is where event i
+    starts in `text` and `starts_ms[i]` when it is spoken. `chapters` is a
+    list of (start_ms, title).
+    """
+
+    __slots__ = ("text", "offsets", "starts_ms", "end_ms", "chapters")
+
+    def __init__(self, text: str = "", offsets=None, starts_ms=None,
+                 end_ms: int = 0, chapters=()):
+        self.text = text
+        self.offsets = offsets if offsets is not None else array("L")
+        self.starts_ms = starts_ms if starts_ms is not None else array("L")
+        self.end_ms = max(end_ms, self.starts_ms[-1] if self.starts_ms else 0)
+        self.chapters = list(chapters)
+
+    @classmethod
+    def from_segments(cls, segments, chapters=()) -> "Transcript":
+        """From (start_ms, text[, duration_ms]) tuples in time order."""
+        out = io.StringIO()
+        offsets, starts_ms = array("L"), array("L")
+        size, end_ms = 0, 0
+        for start_ms, text, *duration in segments:
+            text = " ".join(text.split())
+            if not text:
+                continue
+            if size:
+                out.write(" ")
+                size += 1
+            offsets.append(size)
+            starts_ms.append(max(0, int(start_ms)))
+            out.write(text)
+            size += len(text)
+            end_ms = max(end_ms, int(start_ms) + int(duration[0] if duration else 0))
+        return cls(out.getvalue(), offsets, starts_ms, end_ms, chapters)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def duration_s(self) -> float:
+        return self.end_ms / 1000
+
+    def _span(self, i: int, j: int) -> str:
+        """Text of events i..j-1."""
+        if i >= j:
+            return ""
+        end = self.offsets[j] - 1 if j < len(self.offsets) else len(self.text)
+        return self.text[self.offsets[i]:end]
+
+    def time_at(self, char: int) -> float:
+        """Seconds at which the character at `char` is spoken."""
+        i = max(0, bisect.bisect_right(self.offsets, char) - 1)
+        return self.starts_ms[i] / 1000 if len(self) else 0.0
+
+    def index_at(self, seconds: float) -> int:
+        """First event starting at or after `seconds`."""
+        return bisect.bisect_left(self.starts_ms, int(seconds * 1000))
+
+    def slice(self, start_s: float, end_s: float | None = None) -> "Transcript":
+        """Events starting in [start_s, end_s), as a new Transcript."""
+        i = self.index_at(start_s)
+        j = len(self) if end_s is None else self.index_at(end_s)
+        if i >= j:
+            return Transcript()
+        base = self.offsets[i]
+        offsets = array("L", (offset - base for offset in self.offsets[i:j]))
+        end_ms = self.end_ms if j == len(self) else self.starts_ms[j]
+        # Chapters starting inside the slice, plus the one already running.
+        marks = sorted(self.chapters)
+        first = max(0, bisect.bisect_right(marks, (self.starts_ms[i], "\uffff")) - 1)
+        chapters = [(ms, title) for ms, title in marks[first:] if ms < end_ms]
+        return Transcript(self._span(i, j), offsets, self.starts_ms[i:j], end_ms, chapters)
+
+    # ---- sections ----
+    def _cuts(self, i: int, j: int, max_chars: int) -> list[int]:
+        """
+        Boundaries splitting events i..j-1 into runs of at most
+        `max_chars`, each placed at the longest pause near its target size.
+        """
+        cuts = []
+        while i < j and self._end(j) - self.offsets[i] > max_chars:
+            # Even-sized runs rather than full ones and a short remainder.
+            remaining = self._end(j) - self.offsets[i]
+            target = -(-remaining // -(-remaining // max_chars))
+            limit = bisect.bisect_right(self.offsets, self.offsets[i] + target, i, j)
+            earliest = bisect.bisect_left(
+                self.offsets, self.offsets[i] + int(target * (1 - SPLIT_WINDOW)), i + 1, limit,
+            )
+            lo = max(i + 1, min(earliest, limit - 1))
+            cut = max(range(lo, max(lo + 1, limit)),
+                      key=lambda k: (self.starts_ms[k] - self.starts_ms[k - 1], k))
+            if cut >= j:
+                break
+            cuts.append(cut)
+            i = cut
+        return cuts
+
+    def _end(self, j: int) -> int:
+        return self.offsets[j] if j < len(self.offsets) else len(self.text)
+
+    def sections(self, max_tokens: int = CHUNK_TOKENS) -> list[Section]:
+        """
+        Chapters if the video has them (long ones split further),
+        otherwise runs of up to `max_tokens` cut at pauses.
+        """
+        if not len(self):
+            return []
+        max_chars = max_tokens * CHARS_PER_TOKEN
+
+        ranges = []  # (first event, end event, chapter title, chapter start ms)
+        marks = sorted(self.chapters)
+        if marks:
+            bounds = [self.index_at(ms / 1000) for ms, _ in marks] + [len(self)]
+            # Speech before the first chapter mark belongs to the first chapter.
+            bounds[0] = 0
+            for (ms, title), i, j in zip(marks, bounds, bounds[1:]):
+                if i < j:
+                    ranges.append((i, j, title, ms))
+        else:
+            ranges.append((0, len(self), None, None))
+
+        sections = []
+        for i, j, title, chapter_ms in ranges:
+            cuts = self._cuts(i, j, max_chars)
+            for a, b in zip([i] + cuts, cuts + [j]):
+                end_ms = self.starts_ms[b] if b < len(self) else self.end_ms
+                sections.append(Section(
+                    start_s=self.starts_ms[a] / 1000,
+                    end_s=end_ms / 1000,
+                    text=self._span(a, b),
+                    chapter=title,
+                    chapter_start_s=None if chapter_ms is None else chapter_ms / 1000,
+                ))
+        return sections
+
+    def documents(self, source: str, max_tokens: int = CHUNK_TOKENS) -> list[Document]:
+        """
+        One Document per section, with its time range (and chapter) in the
+        metadata. Section breaks become paragraph breaks in docs_text, so
+        the chunker splits there first.
+        """
+        docs = []
+        for section in self.sections(max_tokens):
+            metadata = {"source": source, "start_s": section.start_s, "end_s": section.end_s}
+            if section.chapter is not None:
+                metadata["chapter"] = section.chapter
+                metadata["chapter_start_s"] = section.chapter_start_s
+            docs.append(Document(page_content=section.text, metadata=metadata))
+        return docs
+
+
+# ---------------- JSON3 STREAMING ----------------
+class _Stream:
+    """Decoded text buffer over a byte source, refilled on demand."""
+
+    def __init__(self, source):
+        if hasattr(source, "read"):
+            self._chunks = iter(lambda: source.read(READ_SIZE), b"")
+        else:
+            self._chunks = iter(source)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Appends the next chunk; False at end of input."""
+        if self.eof:
+            return False
+        downloads.check_cancelled()
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self._decoder.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self._decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self, skip: str = " \t\r\n") -> str:
+        """Next character not in `skip` ("" at end of input)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in skip:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise SubtitleFormatError(f"expected {char!r} in json3 stream")
+        self.pos += 1
+
+    def value(self):
+        """Decodes one JSON value, reading more input until it is complete."""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise SubtitleFormatError("truncated json3 stream") from None
+                continue
+            # A number at the buffer's end may continue in the next chunk.
+            if end == len(self.buf) and not self.eof and isinstance(value, (int, float)):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json3_events(source):
+    """
+    Caption events of a json3 document, decoded one at a time from
+    `source` (a binary file object or an iterable of byte chunks).
+    Top-level keys other than "events" (styles, pens...) are skipped.
+    """
+    stream = _Stream(source)
+    stream.expect("{")
+    while stream.peek(" \t\r\n,") not in ("}", ""):
+        key = stream.value()
+        stream.expect(":")
+        if key != "events":
+            stream.value()
+            continue
+        stream.expect("[")
+        while stream.peek(" \t\r\n,") != "]":
+            if stream.peek() == "":
+                raise SubtitleFormatError("truncated json3 stream")
+            yield stream.value()
+        stream.pos += 1
+
+
+def parse_json3(source, chapters=None) -> Transcript:
+    """
+    Transcript from a json3 stream. `chapters` as yt-dlp reports them
+    ({"start_time": s, "title": ...}).
+    """
+    segments = (
+        (event.get("tStartMs", 0),
+         "".join(seg.get("utf8", "") for seg in event["segs"]),
+         event.get("dDurationMs", 0))
+        for event in iter_json3_events(source)
+        if event.get("segs")
+    )
+    marks = [(int(c.get("start_time", 0) * 1000), c.get("title") or "")
+             for c in chapters or []]
+    return Transcript.from_segments(segments, marks)
+
+
+def chapter_groups(docs) -> list[tuple[str, float, float, list]]:
+    """
+    (title, start_s, end_s, documents) per chapter of timestamped
+    documents, in order; untitled sections are groups of their own.
+    """
+    groups = []
+    for doc in docs:
+        meta = doc.metadata
+        title = meta.get("chapter")
+        if groups and title is not None and groups[-1][0] == title \
+                and groups[-1][1] == meta.get("chapter_start_s"):
+            groups[-1][2] = meta.get("end_s", groups[-1][2])
+            groups[-1][3].append(doc)
+            continue
+        start = meta.get("chapter_start_s") if title is not None else meta.get("start_s", 0.0)
+        groups.append([title, start, meta.get("end_s", start), [doc]])
+    return [tuple(group) for group in groups]
+
+
+def is_timed(docs) -> bool:
+    return bool(docs) and all("start_s" in doc.metadata for doc in docs)
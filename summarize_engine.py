@@ -0,0 +1,354 @@
+# ================================
+# Token-aware parallel map-reduce summarization
+# ================================
+
+import os
+import time
+import itertools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.prompts import PromptTemplate
+
+import metrics
+import rate_limiter
+
+# ---------------- CONFIG ----------------
+# Budgets are in (estimated) tokens. Defaults leave headroom for the
+# prompt and the summary itself inside Groq's per-request limits.
+STUFF_TOKENS = int(os.getenv("SUMMARY_STUFF_TOKENS", "5000"))
+CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("SUMMARY_CHUNK_OVERLAP_TOKENS", "100"))
+REDUCE_TOKENS = int(os.getenv("SUMMARY_REDUCE_TOKENS", "4000"))
+MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+# Start map calls for page-by-page sources while later pages are still
+# being extracted (EarlyMap).
+EARLY_MAP = os.getenv("SUMMARY_EARLY_MAP", "1") != "0"
+
+# ---------------- PROMPTS ----------------
+combine_template = """
+Combine the following partial summaries into one concise summary in under 300 words.
+Keep the most important points and remove repetition.
+
+Partial summaries:
+{text}
+"""
+
+combine_prompt = PromptTemplate(
+    template=combine_template,
+    input_variables=["text"],
+)
+
+
+# ---------------- TOKENS ----------------
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for Llama-3 on English).
+    Good enough for budgeting; never used for billing.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def docs_text(docs) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def docs_chars(docs) -> int:
+    """len(docs_text(docs)), one document at a time."""
+    chars = getattr(docs, "chars", None)  # SpilledDocuments keep a running total
+    count = len(docs) if chars is not None else 0
+    if chars is None:
+        chars = 0
+        for doc in docs:
+            chars += len(doc.page_content)
+            count += 1
+    return chars + 2 * max(0, count - 1)
+
+
+def docs_tokens(docs) -> int:
+    """estimate_tokens(docs_text(docs)) without joining the text."""
+    return -(-docs_chars(docs) // CHARS_PER_TOKEN)
+
+
+def split_text(text: str, chunk_tokens: int = CHUNK_TOKENS,
+               overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> list[str]:
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_tokens * CHARS_PER_TOKEN,
+        chunk_overlap=overlap_tokens * CHARS_PER_TOKEN,
+    )
+    return splitter.split_text(text)
+
+
+class Chunker:
+    """
+    Push-style `iter_chunks`: `add` takes one document's text and returns
+    the chunks it completed, `finish` the rest.
+    """
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS,
+                 overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self._limit = 2 * chunk_tokens * CHARS_PER_TOKEN
+        self._buffer = ""
+
+    def add(self, text: str) -> list[str]:
+        self._buffer = f"{self._buffer}\n\n{text}" if self._buffer else text
+        if len(self._buffer) <= self._limit:
+            return []
+        pieces = split_text(self._buffer, self.chunk_tokens, self.overlap_tokens)
+        self._buffer = pieces[-1]
+        return pieces[:-1]
+
+    def finish(self) -> list[str]:
+        buffer, self._buffer = self._buffer, ""
+        if not buffer.strip():
+            return []
+        return split_text(buffer, self.chunk_tokens, self.overlap_tokens)
+
+
+def iter_chunks(docs, chunk_tokens: int = CHUNK_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """
+    Incremental `split_text(docs_text(docs))`: consumes documents lazily
+    (e.g. PDF pages still being extracted) and yields each chunk as soon
+    as text after it has arrived.
+    """
+    chunker = Chunker(chunk_tokens, overlap_tokens)
+    for doc in docs:
+        yield from chunker.add(doc.page_content)
+    yield from chunker.finish()
+
+
+# ---------------- ENGINE ----------------
+class MapReduceSummarizer:
+    """
+    Splits documents into token-budgeted chunks, summarizes the chunks
+    concurrently (map) and combines the partial summaries level by level
+    until they fit a single combine call (reduce).
+    """
+
+    def __init__(self, llm, map_prompt: PromptTemplate,
+                 reduce_prompt: PromptTemplate = combine_prompt,
+                 chunk_tokens: int = CHUNK_TOKENS,
+                 reduce_tokens: int = REDUCE_TOKENS,
+                 max_concurrency: int = MAX_CONCURRENCY,
+                 early=None):
+        self.llm = llm
+        self.map_prompt = map_prompt
+        self.reduce_prompt = reduce_prompt
+        self.chunk_tokens = chunk_tokens
+        self.reduce_tokens = reduce_tokens
+        self.max_concurrency = max(1, max_concurrency)
+        self.early = early
+
+    def _call(self, prompt: PromptTemplate, text: str) -> str:
+        stage = "llm.map" if prompt is self.map_prompt else "llm.reduce"
+        with metrics.span(stage) as span:
+            span.set_text(text)
+            message = rate_limiter.invoke(
+                self.llm, prompt.format(text=text), estimate_tokens(text)
+            )
+        return getattr(message, "content", message)
+
+    def _submit(self, pool, prompt: PromptTemplate, text: str):
+        # Worker threads inherit the caller's context (rate-limit session).
+        context = contextvars.copy_context()
+        return pool.submit(context.run, self._call, prompt, text)
+
+    def _stream_call(self, prompt: PromptTemplate, text: str):
+        yield from stream_prompt(self.llm, prompt, text)
+
+    def _parallel(self, prompt: PromptTemplate, texts: list[str]) -> list[str]:
+        if len(texts) == 1:
+            return [self._call(prompt, texts[0])]
+
+        workers = min(self.max_concurrency, len(texts))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [self._submit(pool, prompt, text) for text in texts]
+            return [future.result() for future in futures]
+
+    def _group(self, summaries: list[str]) -> list[str]:
+        """
+        Packs consecutive summaries into batches that fit `reduce_tokens`.
+        Always makes progress: at least two summaries per batch.
+        """
+        batches, current, current_tokens = [], [], 0
+
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if len(current) >= 2 and current_tokens + tokens > self.reduce_tokens:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(summary)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+
+        return ["\n\n".join(batch) for batch in batches]
+
+    def _map_chunks(self, chunks) -> list[str]:
+        """
+        Submits each chunk as soon as it is produced, so the map step
+        overlaps with extraction when `chunks` is lazy. Chunks already sent
+        by `self.early` (an EarlyMap) wait for that call instead.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = []
+            for chunk in chunks:
+                future = self.early.take(chunk) if self.early is not None else None
+                futures.append(future or self._submit(pool, self.map_prompt, chunk))
+            return [future.result() for future in futures]
+
+    def map(self, docs) -> list[str]:
+        return self._map_chunks(iter_chunks(docs, self.chunk_tokens))
+
+    def collapse(self, summaries: list[str]) -> str:
+        """
+        Reduces partial summaries hierarchically and returns the text for
+        the final combine call.
+        """
+        while len(summaries) > 1 and (
+            estimate_tokens("\n\n".join(summaries)) > self.reduce_tokens
+        ):
+            summaries = self._parallel(self.reduce_prompt, self._group(summaries))
+
+        return "\n\n".join(summaries)
+
+    def summarize(self, docs) -> str:
+        summaries = self.map(docs)
+        if len(summaries) == 1:
+            return summaries[0]
+        return self._call(self.reduce_prompt, self.collapse(summaries))
+
+    def stream(self, docs):
+        """
+        Same as `summarize`, but yields the tokens of the final LLM call
+        (the reduce step, or the only map call) as they arrive.
+        """
+        chunks = iter_chunks(docs, self.chunk_tokens)
+        head = list(itertools.islice(chunks, 2))
+
+        if len(head) == 1:
+            yield from self._stream_call(self.map_prompt, head[0])
+            return
+
+        summaries = self._map_chunks(itertools.chain(head, chunks))
+        yield from self._stream_call(self.reduce_prompt, self.collapse(summaries))
+
+
+class EarlyMap:
+    """
+    Map calls started while a document is still loading. Page texts
+    passed to `add` are cut into chunks the way `iter_chunks` cuts the
+    finished document; the chunks are sent once the text is past
+    `start_tokens` (too long to stuff), and past `stop_tokens` (too long
+    to map-reduce) everything is cancelled. A MapReduceSummarizer built
+    with `early=` takes over the calls whose chunks came out the same;
+    `close` cancels the rest.
+    """
+
+    def __init__(self, summarizer: MapReduceSummarizer, start_tokens: int,
+                 stop_tokens: int):
+        self.summarizer = summarizer
+        self.start_tokens = start_tokens
+        self.stop_tokens = stop_tokens
+        self.started = self.reused = 0
+        self.closed = False
+        self._chunker = Chunker(summarizer.chunk_tokens)
+        self._chars = self._docs = 0
+        self._waiting = []
+        self._futures = {}
+        self._pool = None
+
+    def add(self, text: str):
+        if self.closed:
+            return
+        self._chars += len(text) + (2 if self._docs else 0)
+        self._docs += 1
+        tokens = -(-self._chars // CHARS_PER_TOKEN)
+        if tokens > self.stop_tokens:
+            self.close()
+            return
+
+        self._waiting.extend(self._chunker.add(text))
+        if tokens > self.start_tokens:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.summarizer.max_concurrency)
+            for chunk in self._waiting:
+                future = self.summarizer._submit(self._pool, self.summarizer.map_prompt, chunk)
+                self._futures.setdefault(chunk, []).append(future)
+                self.started += 1
+            self._waiting = []
+
+    def take(self, chunk: str):
+        """The call started for `chunk`, or None; each is handed out once."""
+        futures = self._futures.get(chunk)
+        if not futures:
+            return None
+        self.reused += 1
+        return futures.pop(0)
+
+    def close(self):
+        """Cancels the calls not taken that have not reached the LLM yet."""
+        self.closed = True
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        self._futures = {}
+        if self.started:
+            metrics.annotate_trace(early_map={"started": self.started,
+                                              "reused": self.reused})
+
+
+def needs_map_reduce(docs, stuff_tokens: int = STUFF_TOKENS) -> bool:
+    return docs_tokens(docs) > stuff_tokens
+
+
+# ---------------- STREAMING ----------------
+def stream_prompt(llm, prompt: PromptTemplate, text: str):
+    chunks = rate_limiter.stream(llm, prompt.format(text=text), estimate_tokens(text))
+    with metrics.span("llm.stream") as span:
+        span.set_text(text)
+        for chunk in chunks:
+            token = getattr(chunk, "content", chunk)
+            if token:
+                yield token
+
+
+def stream_stuff(llm, prompt: PromptTemplate, docs):
+    """
+    Streaming equivalent of the "stuff" chain: all documents in one prompt.
+    """
+    yield from stream_prompt(llm, prompt, docs_text(docs))
+
+
+class TimedStream:
+    """
+    Wraps a token iterator and records time-to-first-token and total time,
+    measured from construction (i.e. from when the request started).
+    """
+
+    def __init__(self, tokens):
+        self._tokens = tokens
+        self._start = time.perf_counter()
+        self.first_token_s = None
+        self.total_s = None
+        self.parts = []
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def __iter__(self):
+        for token in self._tokens:
+            if self.first_token_s is None:
+                self.first_token_s = time.perf_counter() - self._start
+            self.parts.append(token)
+            yield token
+        self.total_s = time.perf_counter() - self._start
@@ -0,0 +1,294 @@
+# ================================
+# Summary Cache (in-process LRU + SQLite)
+# ================================
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# ---------------- CONFIG ----------------
+CACHE_DIR = os.getenv(
+    "SUMMARY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"),
+)
+TTL_SECONDS = int(os.getenv("SUMMARY_CACHE_TTL", str(7 * 24 * 3600)))
+MEMORY_ENTRIES = int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", "256"))
+DISK_ENTRIES = int(os.getenv("SUMMARY_CACHE_DISK_ENTRIES", "20000"))
+BYPASS = os.getenv("SUMMARY_CACHE_BYPASS", "0") == "1"
+
+
+# ---------------- KEYS ----------------
+# Query parameters that never change the content (click/campaign tracking).
+TRACKING_PARAMS = frozenset((
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid",
+    "mc_cid", "mc_eid", "igshid", "_ga", "_gl", "ref", "ref_src", "ref_url",
+    "spm", "cmpid", "ocid", "usp", "amp", "outputtype",
+))
+YOUTUBE_HOSTS = ("youtube.com", "m.youtube.com", "music.youtube.com",
+                 "youtube-nocookie.com")
+_AMP_CACHE_PATH = re.compile(r"^/(?:amp/|c/)?s/([^/]+)(/.*)?$")
+
+
+def _youtube_video_id(host: str, path: str, query: dict) -> str | None:
+    if host == "youtu.be":
+        return path.strip("/").split("/")[0] or None
+    if host in YOUTUBE_HOSTS:
+        if path == "/watch":
+            return query.get("v")
+        for prefix in ("/shorts/", "/embed/", "/live/", "/v/"):
+            if path.startswith(prefix):
+                return path[len(prefix):].split("/")[0] or None
+    return None
+
+
+def youtube_video_id(url: str) -> str | None:
+    """Video id of any YouTube URL form (watch, youtu.be, shorts, embed, live, v)."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[len("www."):]
+    return _youtube_video_id(host, parts.path, dict(parse_qsl(parts.query)))
+
+
+def fetch_key(url: str) -> str:
+    """
+    The URL as it will be fetched, for document caching and load dedup:
+    only what cannot change the response is dropped (surrounding space,
+    the fragment, the case of scheme and host). Unlike normalize_url,
+    http/https, www./m./amp. hosts and query parameters stay distinct.
+    """
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or "/",
+                       parts.query, ""))
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form used for summary cache keys (which also hash the
+    content), so different URLs for the same content share entries:
+    https, lowercase host without "www."/"m.",
+    no fragment, tracking parameters dropped, sorted query, no trailing
+    slash. AMP variants map to the article, and every YouTube URL form
+    (youtu.be, shorts, embed, timestamps) to ``youtube.com/watch?v=<id>``.
+    """
+    parts = urlsplit(url.strip())
+    scheme = "https" if parts.scheme.lower() in ("http", "https") else parts.scheme.lower()
+    host = parts.netloc.lower()
+    path = parts.path
+
+    # Google AMP cache / ampproject CDN: /amp/s/<host>/<path>
+    if host in ("www.google.com", "google.com") or host.endswith(".cdn.ampproject.org"):
+        match = _AMP_CACHE_PATH.match(path)
+        if match:
+            host, path = match.group(1).lower(), match.group(2) or "/"
+
+    for prefix in ("www.", "m.", "amp."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    host = host.replace(".m.", ".")  # en.m.wikipedia.org
+
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    video_id = _youtube_video_id(host, path, dict(query))
+    if video_id:
+        return urlunsplit(("https", "youtube.com", "/watch", urlencode({"v": video_id}), ""))
+
+    query = [
+        (key, value) for key, value in query
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+    path = re.sub(r"/amp/?$", "", path).rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ""))
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def docs_hash(docs) -> str:
+    """text_hash of the documents' texts joined by blank lines, hashed one at a time."""
+    digest = hashlib.sha256()
+    for i, doc in enumerate(docs):
+        if i:
+            digest.update(b"\n\n")
+        digest.update(doc.page_content.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def make_key(url: str, prompt_template: str, model: str,
+             temperature: float, doc_text: str, variant: str | None = None) -> str:
+    """
+    `variant` distinguishes summaries of the same input produced another
+    way (e.g. extractive mode); None keeps the original key.
+    """
+    return _key(url, prompt_template, model, temperature, text_hash(doc_text), variant)
+
+
+def make_docs_key(url: str, prompt_template: str, model: str,
+                  temperature: float, docs, variant: str | None = None) -> str:
+    """`make_key` over documents, without joining their text."""
+    return _key(url, prompt_template, model, temperature, docs_hash(docs), variant)
+
+
+def _key(url: str, prompt_template: str, model: str, temperature: float,
+         digest: str, variant: str | None) -> str:
+    parts = [normalize_url(url), prompt_template, model, float(temperature), digest]
+    if variant:
+        parts.append(variant)
+    payload = json.dumps(parts, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ---------------- CACHE ----------------
+class SummaryCache:
+    """
+    Two-tier summary cache.
+    Memory tier is a bounded LRU; disk tier is SQLite with TTL and
+    least-recently-used eviction once `disk_entries` is exceeded.
+    """
+
+    def __init__(self, path: str | None = None, ttl: int = TTL_SECONDS,
+                 memory_entries: int = MEMORY_ENTRIES,
+                 disk_entries: int = DISK_ENTRIES):
+        self.path = path or os.path.join(CACHE_DIR, "summaries.sqlite3")
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()  # key -> (created_at, summary)
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                       "writes": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " key TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_summaries_accessed"
+            " ON summaries(accessed_at)"
+        )
+        self._db.commit()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _remember(self, key: str, created_at: float, summary: str):
+        self._memory[key] = (created_at, summary)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._db.execute(
+                "SELECT summary, created_at FROM summaries WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            summary, created_at = row
+            if self._expired(created_at, now):
+                self._db.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                self._db.commit()
+                self._stats["misses"] += 1
+                return None
+
+            self._db.execute(
+                "UPDATE summaries SET accessed_at = ? WHERE key = ?",
+                (now, key),
+            )
+            self._db.commit()
+            self._remember(key, created_at, summary)
+            self._stats["disk_hits"] += 1
+            return summary
+
+    def put(self, key: str, summary: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, summary)
+            self._db.execute(
+                "INSERT OR REPLACE INTO summaries"
+                " (key, summary, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, summary, now, now),
+            )
+            self._stats["writes"] += 1
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        if self.ttl > 0:
+            cur = self._db.execute(
+                "DELETE FROM summaries WHERE created_at < ?",
+                (now - self.ttl,),
+            )
+            self._stats["evictions"] += cur.rowcount
+
+        (count,) = self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        overflow = count - self.disk_entries
+        if overflow > 0:
+            cur = self._db.execute(
+                "DELETE FROM summaries WHERE key IN ("
+                " SELECT key FROM summaries ORDER BY accessed_at LIMIT ?)",
+                (overflow,),
+            )
+            self._stats["evictions"] += cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM summaries")
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (disk_entries,) = self._db.execute(
+                "SELECT COUNT(*) FROM summaries"
+            ).fetchone()
+            stats = dict(self._stats)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["memory_entries"] = len(self._memory)
+        stats["disk_entries"] = disk_entries
+        stats["hit_rate"] = (
+            (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        )
+        return stats
+
+
+# ---------------- PROCESS-WIDE INSTANCE ----------------
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SummaryCache:
+    """
+    One cache per process, shared by every Streamlit session.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SummaryCache()
+        return _cache
@@ -0,0 +1,30 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Modules are flat at the repo root; caches go to a scratch directory.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SUMMARY_CACHE_DIR", tempfile.mkdtemp(prefix="summarizer-tests-"))
+# Fake LLMs answer instantly; the Groq rate limits would only slow tests.
+os.environ.setdefault("GROQ_RPM", "100000")
+os.environ.setdefault("GROQ_TPM", "100000000")
+
+
+@pytest.fixture(scope="session")
+def standins():
+    """The bench's local stand-ins (bench/standins.py)."""
+    sys.path.insert(0, os.path.join(ROOT, "bench"))
+    import standins
+
+    return standins
+
+
+@pytest.fixture(scope="session")
+def content_server(standins):
+    """Local HTML pages, PDFs and Google Docs/Drive exports."""
+    server = standins.ContentServer(pdf_pages=5, html_paragraphs=20, doc_paragraphs=10).start()
+    yield server
+    server.stop()
@@ -0,0 +1,67 @@
+import random
+
+from langchain_core.documents import Document
+
+import chunk_memo
+import pipeline
+import summary_cache
+
+
+def article(words=6000, seed=7):
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(500)]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+# ---------------- CHUNKING ----------------
+def test_split_gives_back_the_text():
+    text = article()
+    chunks = chunk_memo.split(text, min_tokens=100, target_tokens=200, max_tokens=400)
+    assert "".join(chunks) == text
+    assert len(chunks) > 5
+    assert all(len(chunk) <= 400 * chunk_memo.CHARS_PER_TOKEN + 20 for chunk in chunks)
+
+
+def test_split_by_document_matches_the_joined_text():
+    rng = random.Random(5)
+    texts = [article(rng.randint(0, 700), seed=i) + rng.choice(["", " ", "\n"])
+             for i in range(30)]
+    texts[3] = ""
+    texts[7] = "  " + texts[7]
+    kwargs = dict(min_tokens=100, target_tokens=200, max_tokens=400)
+    chunks = list(chunk_memo.iter_split(iter(texts), **kwargs))
+    assert chunks == chunk_memo.split("\n\n".join(texts), **kwargs)
+
+
+def test_an_edit_only_changes_nearby_chunks():
+    text = article()
+    middle = len(text) // 2
+    edited = text[:middle] + " an inserted sentence here " + text[middle:]
+    kwargs = dict(min_tokens=100, target_tokens=200, max_tokens=400)
+    before = chunk_memo.split(text, **kwargs)
+    after = chunk_memo.split(edited, **kwargs)
+    changed = set(after) - set(before)
+    assert 1 <= len(changed) <= 3
+    assert before[0] == after[0] and before[-1] == after[-1]
+
+
+# ---------------- BYPASS ----------------
+def test_applies_to_respects_the_request_bypass(monkeypatch):
+    monkeypatch.setattr(chunk_memo, "ENABLED", True)
+    monkeypatch.setattr(chunk_memo, "SOURCES", ["google_drive"])
+    monkeypatch.setattr(summary_cache, "BYPASS", False)
+    assert chunk_memo.applies_to("google_drive")
+    assert not chunk_memo.applies_to("google_drive", bypass=True)
+    assert not chunk_memo.applies_to("web")
+    monkeypatch.setattr(summary_cache, "BYPASS", True)
+    assert not chunk_memo.applies_to("google_drive")
+
+
+def test_memo_summarizer_skipped_for_bypassed_requests(monkeypatch):
+    monkeypatch.setattr(chunk_memo, "ENABLED", True)
+    monkeypatch.setattr(chunk_memo, "SOURCES", ["google_drive"])
+    monkeypatch.setattr(summary_cache, "BYPASS", False)
+    docs = [Document(page_content=article(200),
+                     metadata={"source": "https://docs.google.com/document/d/abc/edit"})]
+    assert isinstance(pipeline.memo_summarizer(None, docs), chunk_memo.MemoizedSummarizer)
+    assert pipeline.memo_summarizer(None, docs, bypass=True) is None
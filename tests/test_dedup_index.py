@@ -0,0 +1,72 @@
+import random
+
+from langchain_core.documents import Document
+
+import dedup_index
+from dedup_index import DedupIndex
+
+
+def words(n, seed):
+    rng = random.Random(seed)
+    return " ".join(f"word{rng.randrange(2000)}" for _ in range(n))
+
+
+def test_short_texts_have_no_fingerprint():
+    assert dedup_index.fingerprint(words(dedup_index.MIN_WORDS - 1, 1)) is None
+
+
+def test_fingerprint_of_documents_matches_joined_text():
+    docs = [Document(page_content=words(n, n)) for n in (120, 0, 300, 5)]
+    text = "\n\n".join(d.page_content for d in docs)
+    assert dedup_index.fingerprint_docs(docs) == dedup_index.fingerprint(text)
+
+
+def test_fingerprint_does_not_depend_on_batch_size(monkeypatch):
+    text = words(1000, 3)
+    expected = dedup_index.fingerprint(text)
+    monkeypatch.setattr(dedup_index, "SHINGLE_BATCH", 7)
+    assert dedup_index.fingerprint(text) == expected
+
+
+def test_near_duplicates_match_and_others_do_not(tmp_path):
+    index = DedupIndex(path=str(tmp_path / "index.npz"))
+    original = words(600, 4)
+    edited = original.replace("word1 ", "word1 extra ", 1) + " trailing"
+    key = "ab" * 32
+
+    index.add(dedup_index.fingerprint(original), key, tag=0)
+    match = index.lookup(dedup_index.fingerprint(edited), tag=0)
+    assert match is not None and match[0] == key
+    assert index.lookup(dedup_index.fingerprint(edited), tag=1) is None
+    assert index.lookup(dedup_index.fingerprint(words(600, 5)), tag=0) is None
+
+
+def test_index_persists(tmp_path):
+    path = str(tmp_path / "index.npz")
+    index = DedupIndex(path=path)
+    fp = dedup_index.fingerprint(words(400, 6))
+    index.add(fp, "cd" * 32)
+    index.save()
+    assert DedupIndex(path=path).lookup(fp) == ("cd" * 32, 0)
+
+
+def test_matches_exclude_the_same_source(tmp_path):
+    index = DedupIndex(path=None)
+    fp = dedup_index.fingerprint(words(600, 7))
+    a, b = dedup_index.source_id("https://a.example/x"), dedup_index.source_id("https://b.example/x")
+    index.add(fp, "ef" * 32, source=a)
+    assert index.lookup(fp, exclude=a) is None
+    assert index.lookup(fp, exclude=b) == ("ef" * 32, 0)
+    index.add(fp, "01" * 32)  # unknown source
+    assert index.lookup(fp, exclude=a) is None
+
+
+def test_old_index_files_load_with_unknown_sources(tmp_path):
+    import numpy as np
+    path = str(tmp_path / "old.npz")
+    old = np.array([(5, bytes.fromhex("ab" * 32), 0)],
+                   dtype=[("fingerprint", "<u8"), ("key", "S32"), ("tag", "u1")])
+    np.savez(path, entries=old)
+    index = DedupIndex(path=path)
+    assert index.lookup(5) == ("ab" * 32, 0)
+    assert index.lookup(5, exclude=dedup_index.source_id("https://a.example/")) is None
@@ -0,0 +1,61 @@
+import json
+import zlib
+
+from langchain_core.documents import Document
+
+import document_cache
+import resource_governor
+
+
+def test_encode_roundtrip():
+    docs = [Document(page_content="line\nbreak ✓", metadata={"page": 1}),
+            Document(page_content="", metadata={})]
+    out = list(document_cache._decode(document_cache._encode(docs)))
+    assert [(d.page_content, d.metadata) for d in out] == [(d.page_content, d.metadata) for d in docs]
+
+
+def test_large_bodies_decode_spilled(monkeypatch):
+    docs = [Document(page_content="x" * 1000, metadata={"page": i}) for i in range(50)]
+    body = document_cache._encode(docs)
+    monkeypatch.setattr(resource_governor, "SPILL_CHARS", 10_000)
+    out = document_cache._decode(body)
+    assert isinstance(out, resource_governor.SpilledDocuments)
+    assert out[49].metadata == {"page": 49}
+
+
+def test_bodies_in_the_old_array_format_still_decode():
+    body = zlib.compress(json.dumps([{"page_content": "old", "metadata": {"a": 1}}]).encode())
+    (doc,) = document_cache._decode(body)
+    assert doc.page_content == "old" and doc.metadata == {"a": 1}
+
+
+def test_put_get(tmp_path):
+    cache = document_cache.DocumentCache(path=str(tmp_path / "docs.sqlite3"))
+    cache.put("https://a.example/page", [Document(page_content="hello")], etag='"1"')
+    entry = cache.get("https://a.example/page")
+    assert entry.docs[0].page_content == "hello"
+    assert entry.conditional_headers() == {"If-None-Match": '"1"'}
+    assert cache.get("https://a.example/other") is None
+
+
+def test_cache_key_is_the_exact_fetch_url():
+    key = document_cache.DocumentCache.key
+    assert key("https://example.com/a?ref=x") != key("https://example.com/a")
+    assert key("http://www.example.com/a") != key("https://example.com/a")
+    assert key("https://EXAMPLE.com/a#frag") == key("https://example.com/a")
+    assert key("youtube:abc123") == "youtube:abc123"
+
+
+def test_get_decodes_only_when_docs_are_used(tmp_path, monkeypatch):
+    cache = document_cache.DocumentCache(path=str(tmp_path / "docs.sqlite3"))
+    cache.put("https://a.example/page", [Document(page_content="hello")], etag='"1"')
+    decoded = []
+    decode = document_cache._decode
+    monkeypatch.setattr(document_cache, "_decode", lambda body: decoded.append(body) or decode(body))
+
+    entry = cache.get("https://a.example/page")
+    assert entry.conditional_headers() == {"If-None-Match": '"1"'}
+    assert decoded == []  # a stale entry answered 200 is never decoded
+    assert entry.docs[0].page_content == "hello"
+    assert entry.docs[0].page_content == "hello"
+    assert len(decoded) == 1
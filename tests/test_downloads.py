@@ -0,0 +1,102 @@
+import io
+import threading
+
+import pytest
+
+import downloads
+
+
+class StreamedResponse:
+    """`stream=True` response stand-in: serves `body` in `chunk` bytes."""
+
+    def __init__(self, body: bytes, chunk: int = 1024, headers=None):
+        self.body = body
+        self.chunk = chunk
+        self.headers = headers or {}
+        self.served = 0
+        self.closed = False
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), self.chunk):
+            self.served += 1
+            yield self.body[start:start + self.chunk]
+
+    def close(self):
+        self.closed = True
+
+
+def test_sniff_kind():
+    assert downloads.sniff_kind(b"%PDF-1.7\n...") == "pdf"
+    assert downloads.sniff_kind(b"PK\x03\x04rest") == "zip"
+    assert downloads.sniff_kind(b"  \n<!DOCTYPE html><html>") == "html"
+    assert downloads.sniff_kind(b"<meta charset=utf-8><head>") == "html"
+    assert downloads.sniff_kind(b"plain text") == "unknown"
+
+
+def test_small_bodies_stay_in_memory():
+    resp = StreamedResponse(b"%PDF-" + b"x" * 5000)
+    with downloads.read_capped(resp) as download:
+        assert download.kind == "pdf" and download.size == 5005
+        assert isinstance(download.stream(), io.BytesIO)
+        assert download.stream().read() == resp.body
+    assert resp.closed
+
+
+def test_large_bodies_spill_to_a_memory_mapped_file(monkeypatch):
+    monkeypatch.setattr(downloads, "SPOOL_BYTES", 4096)
+    body = bytes(range(256)) * 64
+    with downloads.read_capped(StreamedResponse(body)) as download:
+        assert not isinstance(download.stream(), io.BytesIO)
+        assert download.stream().read() == body
+        assert download.fileobj().read() == body  # for parsers that need a file
+
+
+def test_declared_size_over_the_cap_is_rejected_unread():
+    resp = StreamedResponse(b"x" * 100, headers={"Content-Length": "100"})
+    with pytest.raises(downloads.PayloadTooLarge):
+        downloads.read_capped(resp, max_bytes=99)
+    assert resp.served == 0 and resp.closed
+
+
+def test_body_growing_past_the_cap_is_cut_off():
+    resp = StreamedResponse(b"x" * 10_000, chunk=1000)
+    with pytest.raises(downloads.PayloadTooLarge):
+        downloads.read_capped(resp, max_bytes=2500)
+    assert resp.served == 3 and resp.closed
+
+
+def test_rejected_kind_aborts_on_the_first_chunk():
+    resp = StreamedResponse(b"<html><body>Sign in</body></html>" * 100, chunk=64)
+    with pytest.raises(PermissionError):
+        downloads.read_capped(resp, reject=("html",))
+    assert resp.served == 1 and resp.closed
+
+
+def test_cancelled_load_stops_between_chunks():
+    cancel = threading.Event()
+    resp = StreamedResponse(b"x" * 10_000, chunk=1000)
+    chunks = resp.iter_content
+
+    def cancel_after_two(size):
+        for i, chunk in enumerate(chunks(size)):
+            if i == 2:
+                cancel.set()
+            yield chunk
+
+    resp.iter_content = cancel_after_two
+    token = downloads.cancel_event.set(cancel)
+    try:
+        with pytest.raises(downloads.LoadCancelled):
+            downloads.read_capped(resp)
+    finally:
+        downloads.cancel_event.reset(token)
+    assert resp.served == 3 and resp.closed
+
+
+def test_pdf_pages_are_yielded_one_at_a_time(standins):
+    pages = downloads.iter_pdf_pages(io.BytesIO(standins.make_pdf(3)), "https://a.example/r.pdf")
+    first = next(pages)
+    assert first.metadata == {"source": "https://a.example/r.pdf", "page": 0,
+                              "page_label": "1", "total_pages": 3}
+    assert first.page_content
+    assert [page.metadata["page"] for page in pages] == [1, 2]
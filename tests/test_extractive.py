@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+import extractive
+
+
+def dense_tfidf(units):
+    """The straightforward units × vocabulary version, for comparison."""
+    vocab, rows = {}, []
+    for unit in units:
+        words = [w for w in extractive._WORD.findall(unit.lower())
+                 if w not in extractive.STOPWORDS and len(w) > 1]
+        rows.append([vocab.setdefault(w, len(vocab)) for w in words])
+    counts = np.zeros((len(units), len(vocab)))
+    for row, cols in enumerate(rows):
+        for col in cols:
+            counts[row, col] += 1
+    df = np.count_nonzero(counts, axis=0)
+    tfidf = np.log1p(counts) * (np.log((1.0 + len(units)) / (1.0 + df)) + 1.0)
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return tfidf / norms
+
+
+UNITS = [
+    "Solar panels convert sunlight into electricity.",
+    "Wind turbines convert wind into electricity, mostly at night.",
+    "The the and of.",
+    "Batteries store electricity from solar panels for the evening.",
+    "Grid operators balance supply and demand every second.",
+]
+
+
+def test_sparse_similarity_matches_dense():
+    expected = dense_tfidf(UNITS)
+    for block in (1, 3, 2048):
+        similarity = extractive.similarity_matrix(extractive.tfidf_matrix(UNITS), block)
+        assert np.allclose(similarity, expected @ expected.T, atol=1e-5)
+
+
+def test_matrix_stores_only_present_terms():
+    matrix = extractive.tfidf_matrix(UNITS)
+    assert len(matrix.data) == sum(len(set(dense_row.nonzero()[0]))
+                                   for dense_row in dense_tfidf(UNITS))
+    assert matrix.indptr[3] == matrix.indptr[2]  # stopwords only
+
+
+def test_compress_stays_within_budget():
+    text = " ".join(f"Sentence {i} talks about topic {i % 17} and detail {i}." for i in range(2000))
+    compressed, report = extractive.compress(text, token_budget=500)
+    assert report["compressed"] and report["tokens_after"] <= 500
+    assert compressed
+
+
+def test_documents_are_compressed_without_joining_them(monkeypatch):
+    from langchain_core.documents import Document
+
+    docs = [Document(page_content=" ".join(
+                f"Page {p} sentence {i} covers topic {(p * 7 + i) % 23}." for i in range(60)),
+                metadata={"page": p})
+            for p in range(40)]
+    expected, _ = extractive.compress("\n\n".join(doc.page_content for doc in docs), 500)
+    monkeypatch.setattr(extractive, "docs_text", lambda docs: pytest.fail("text joined"))
+
+    (compressed,), report = extractive.compress_documents(docs, token_budget=500)
+    assert compressed.page_content == expected
+    assert report["compressed"] and compressed.metadata["page"] == 0
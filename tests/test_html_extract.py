@@ -0,0 +1,110 @@
+import html_extract
+
+ARTICLE = " ".join(
+    f"Paragraph {i} explains how the cache, the queue and the model fit together."
+    for i in range(4)
+)
+
+PAGE = f"""<!DOCTYPE html><html><head><title>Caching notes | Example Blog</title></head>
+<body>
+<nav><a href="/">Home</a> <a href="/about">About</a></nav>
+<div class="cookie-consent">We use cookies to improve your experience, accept all.</div>
+<div class="sidebar"><p>Popular posts, tags and links, linked everywhere, all of them.</p></div>
+<div id="content" class="post">
+  <h1>Caching notes</h1>
+  <p>{ARTICLE}</p>
+  <p>{ARTICLE}</p>
+  <p>A short closing line.</p>
+</div>
+<div class="comments"><p>Great post, thanks a lot for sharing this with everyone!</p></div>
+<footer>Copyright Example Blog. All rights reserved.</footer>
+</body></html>"""
+
+
+class StreamedResponse:
+    def __init__(self, body: bytes, content_type="text/html; charset=utf-8", chunk=256):
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.chunk = chunk
+        self.closed = False
+
+    def iter_content(self, size):
+        for start in range(0, len(self.body), self.chunk):
+            yield self.body[start:start + self.chunk]
+
+    def close(self):
+        self.closed = True
+
+
+def test_extract_keeps_the_article_and_drops_boilerplate():
+    text, report = html_extract.extract_html(PAGE)
+    assert text.startswith("Caching notes")
+    assert text.count(ARTICLE) == 2
+    assert "A short closing line." in text
+    for boilerplate in ("cookies", "Popular posts", "Great post", "All rights reserved", "About"):
+        assert boilerplate not in text
+    assert report["title"] == "Caching notes | Example Blog"
+    assert report["candidates"] > 0
+
+
+def test_link_heavy_containers_lose():
+    links = "".join(f"<a href='/{i}'>Link number {i}, to somewhere else</a> " for i in range(20))
+    page = f"<html><body><div><p>{links}</p></div><div><p>{ARTICLE}</p></div></body></html>"
+    text, _ = html_extract.extract_html(page)
+    assert ARTICLE in text and "Link number" not in text
+
+
+def test_read_html_stops_at_max_bytes():
+    body = PAGE.encode() * 50
+    resp = StreamedResponse(body)
+    root, data, stopped = html_extract.read_html(resp, max_bytes=2000, enough_chars=0)
+    assert stopped == "max_bytes" and len(data) == 2000
+    assert root is not None and resp.closed
+
+
+def test_read_html_stops_once_enough_text_arrived():
+    resp = StreamedResponse(PAGE.encode() * 50)
+    _, data, stopped = html_extract.read_html(resp, enough_chars=1000)
+    assert stopped == "enough_text"
+    assert len(data) < len(resp.body)
+
+
+def test_load_response_uses_the_fast_path(monkeypatch):
+    monkeypatch.setattr(html_extract, "MIN_CHARS", 100)
+    (doc,) = html_extract.load_response(StreamedResponse(PAGE.encode()), "https://a.example/p")
+    assert doc.metadata == {"source": "https://a.example/p",
+                            "title": "Caching notes | Example Blog", "extractor": "fast"}
+
+
+def test_too_little_text_falls_back_to_unstructured(monkeypatch):
+    calls = []
+
+    def partition(fileobj, content_type):
+        calls.append((fileobj.read(), content_type))
+        return "Fallback text " * 100, 3
+
+    monkeypatch.setattr(html_extract, "partition", partition)
+    page = b"<html><body><p>Too short to trust.</p></body></html>"
+    (doc,) = html_extract.load_response(StreamedResponse(page), "https://a.example/p")
+    assert doc.metadata["extractor"] == "unstructured"
+    assert calls == [(page, "text/html")]
+
+
+def test_other_content_types_go_to_unstructured(monkeypatch):
+    monkeypatch.setattr(html_extract, "partition",
+                        lambda fileobj, content_type: (fileobj.read().decode(), 1))
+    resp = StreamedResponse(b"plain body", content_type="text/plain")
+    (doc,) = html_extract.load_response(resp, "https://a.example/notes.txt")
+    assert doc.page_content == "plain body"
+    assert doc.metadata["extractor"] == "unstructured"
+
+
+def test_fast_path_text_is_kept_when_unstructured_fails(monkeypatch):
+    def partition(fileobj, content_type):
+        raise RuntimeError("unstructured is not installed")
+
+    monkeypatch.setattr(html_extract, "partition", partition)
+    monkeypatch.setattr(html_extract, "MIN_CHARS", 10_000)
+    (doc,) = html_extract.load_response(StreamedResponse(PAGE.encode()), "https://a.example/p")
+    assert doc.metadata["extractor"] == "fast"  # under MIN_CHARS, but better than nothing
+    assert ARTICLE in doc.page_content
@@ -0,0 +1,33 @@
+import pytest
+import requests
+
+import http_client
+
+
+def test_request_without_a_free_host_slot_raises_host_busy():
+    client = http_client.HttpClient(per_host_limit=1, slot_timeout=0.01)
+    client._slot("http://busy.example/a").acquire()  # the host's only slot
+    with pytest.raises(http_client.HostBusy) as info:
+        client.get("http://busy.example/b")
+    assert isinstance(info.value, requests.exceptions.RequestException)
+    assert "busy.example" in str(info.value)
+    assert client.stats()["busy"] == 1
+
+
+def test_streamed_response_holds_its_slot_until_closed(content_server):
+    client = http_client.HttpClient(per_host_limit=1, slot_timeout=0.01)
+    url = content_server.url("web", 1)
+    resp = client.get(url, stream=True)
+    with pytest.raises(http_client.HostBusy):
+        client.get(url)
+    resp.close()
+    resp.close()  # releases once
+    assert client.get(url).status_code == 200
+    assert client.stats()["requests"] == 2
+
+
+def test_new_sessions_share_the_pool():
+    client = http_client.HttpClient()
+    session = client.new_session()
+    assert session is not client.session
+    assert session.get_adapter("https://a.example") is client.adapter
@@ -0,0 +1,96 @@
+import time
+
+import pytest
+
+import job_service
+from job_service import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def finished(store, status, age):
+    job, _ = store.create(f"https://example.com/{status}-{age}")
+    store.update(job["id"], status=status, finished_at=time.time() - age)
+    return job["id"]
+
+
+# ---------------- PURGE ----------------
+def test_purge_drops_every_finished_status(store):
+    old = [finished(store, status, 3600) for status in ("done", "error", "cancelled")]
+    recent = finished(store, "cancelled", 10)
+    queued, _ = store.create("https://example.com/queued")
+    running, _ = store.create("https://example.com/running")
+    store.update(running["id"], status="running")
+
+    store.purge(retention=60)
+
+    assert all(store.get(job_id) is None for job_id in old)
+    assert store.get(recent) is not None
+    assert store.get(queued["id"])["status"] == "queued"
+    assert store.get(running["id"])["status"] == "running"
+
+
+def test_cancelled_queued_job_is_purged(store):
+    job, _ = store.create("https://example.com/a")
+    assert store.cancel(job["id"])["status"] == "cancelled"
+    store.purge(retention=-1)
+    assert store.get(job["id"]) is None
+
+
+# ---------------- API BINDING ----------------
+def test_api_listens_on_loopback_by_default(store):
+    service = job_service.JobService(store, llm_factory=None, workers=0)
+    server = job_service.serve(service, port=0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"
+    finally:
+        server.shutdown()
+
+
+def test_public_address_needs_opt_in(store):
+    service = job_service.JobService(store, llm_factory=None, workers=0)
+    with pytest.raises(PermissionError, match="JOB_API_PUBLIC"):
+        job_service.serve(service, port=0, host="0.0.0.0", public=False)
+    server = job_service.serve(service, port=0, host="0.0.0.0", public=True)
+    server.shutdown()
+
+
+def get_status(server, path):
+    import json
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+    try:
+        with urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as resp:
+            return resp.status, json.loads(resp.read())
+    except HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_bad_wait_or_version_is_a_400(store):
+    job, _ = store.create("https://example.com/a")
+    service = job_service.JobService(store, llm_factory=None, workers=0)
+    server = job_service.serve(service, port=0)
+    try:
+        for query in ("wait=soon", "wait=1&version=latest", "wait=nan", "wait=-1"):
+            status, body = get_status(server, f"/jobs/{job['id']}?{query}")
+            assert status == 400 and "wait" in body["error"]
+        assert get_status(server, f"/jobs/{job['id']}?wait=0&version=0")[0] == 200
+    finally:
+        server.shutdown()
+
+
+# ---------------- CLAIM ----------------
+def test_claim_takes_the_oldest_queued_job_once(store):
+    first, _ = store.create("https://example.com/first")
+    second, _ = store.create("https://example.com/second")
+    other = JobStore(store.path)  # another process's connection
+
+    claimed = store.claim("w1")
+    assert claimed["id"] == first["id"] and claimed["status"] == "running"
+    assert claimed["worker"] == "w1" and claimed["attempts"] == 1
+    assert other.claim("w2")["id"] == second["id"]
+    assert store.claim("w1") is None
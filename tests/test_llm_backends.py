@@ -0,0 +1,170 @@
+import threading
+
+import pytest
+
+import llm_backends
+import rate_limiter
+from llm_backends import CircuitBreaker
+
+
+# ---------------- CIRCUIT BREAKER ----------------
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, cooldown_s=60)
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.opened == 1
+
+
+def test_breaker_success_resets_the_count():
+    breaker = CircuitBreaker(failures=2, cooldown_s=60)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failures=1, cooldown_s=0)
+    breaker.failure()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()  # probe in flight
+
+
+def test_half_open_probe_outcomes():
+    breaker = CircuitBreaker(failures=1, cooldown_s=0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open"
+    assert breaker.opened == 3
+
+
+def test_released_probe_frees_the_slot():
+    breaker = CircuitBreaker(failures=1, cooldown_s=0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+
+
+# ---------------- HEDGING ----------------
+class FakeBackend:
+    """Backend stand-in: _Attempt sends through `client.send`."""
+
+    def __init__(self, name, tokens=("a", "b"), delay_s=0.0, failures=1, cooldown_s=60,
+                 rate_limited=False):
+        self.name = name
+        self.rate_limited = rate_limited
+        self.breaker = CircuitBreaker(failures=failures, cooldown_s=cooldown_s)
+        self.client = self
+        self.tokens = tokens
+        self.delay_s = delay_s
+        self.sent = 0
+        self.outcomes = []
+
+    def request(self, messages, temperature):
+        return None
+
+    def send(self, request, stream=True):
+        self.sent += 1
+        return FakeResponse(self.tokens, self.delay_s)
+
+    def hedge_after(self):
+        return 0.05
+
+    def record(self, outcome, ttft_s=None):
+        self.outcomes.append(outcome)
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, tokens, delay_s):
+        self.tokens = tokens
+        self.closed = threading.Event()
+        self.delay_s = delay_s
+
+    def iter_lines(self):
+        if self.closed.wait(self.delay_s):
+            return
+        for token in self.tokens:
+            yield 'data: {"choices": [{"delta": {"content": "%s"}}]}' % token
+        yield "data: [DONE]"
+
+    def close(self):
+        self.closed.set()
+
+
+def test_hedged_stream_uses_primary_when_fast():
+    primary, fallback = FakeBackend("p"), FakeBackend("f")
+    out = [content for content, _ in llm_backends.hedged_stream([primary, fallback], [], 0.2)]
+    assert "".join(out) == "ab"
+    assert primary.sent == 1 and fallback.sent == 0
+
+
+def test_hedged_stream_hedges_a_slow_primary():
+    primary, fallback = FakeBackend("p", delay_s=2), FakeBackend("f", tokens=("x",))
+    out = [content for content, _ in llm_backends.hedged_stream([primary, fallback], [], 0.2)]
+    assert out == ["x"]
+    assert "slow" in primary.outcomes
+
+
+def test_unlaunched_half_open_backend_keeps_its_probe_slot():
+    primary = FakeBackend("p")
+    fallback = FakeBackend("f", cooldown_s=0)
+    fallback.breaker.failure()  # open; half-open on the next allow()
+
+    list(llm_backends.hedged_stream([primary, fallback], [], 0.2))
+
+    assert fallback.sent == 0
+    assert fallback.breaker.allow()
+
+
+def test_no_backend_available():
+    backend = FakeBackend("p")
+    backend.breaker.failure()
+    with pytest.raises(llm_backends.NoBackendAvailable):
+        list(llm_backends.hedged_stream([backend], [], 0.2))
+
+
+# ---------------- SAME-ACCOUNT HEDGES ----------------
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = rate_limiter.RateLimitScheduler(rpm=1000, tpm=10_000)
+    monkeypatch.setattr(rate_limiter, "get_scheduler", lambda: scheduler)
+    return scheduler
+
+
+def hedge_on_same_account(scheduler, delay_s=2):
+    primary = FakeBackend("p", delay_s=delay_s, rate_limited=True)
+    fallback = FakeBackend("f", tokens=("x",), rate_limited=True)
+    caller = rate_limiter.Ticket(scheduler, 4000)
+    token = rate_limiter.current_ticket.set(caller)
+    try:
+        out = [content for content, _ in llm_backends.hedged_stream([primary, fallback], [], 0.2)]
+    finally:
+        rate_limiter.current_ticket.reset(token)
+    return out, primary, fallback
+
+
+def test_same_account_hedge_takes_its_own_ticket(scheduler):
+    out, _, fallback = hedge_on_same_account(scheduler)
+    assert out == ["x"] and fallback.sent == 1
+    assert scheduler.tokens.level <= 6000 + 1  # the caller's reservation again
+
+
+def test_same_account_hedge_skipped_without_budget(scheduler):
+    scheduler.tokens.level = 0
+    out, primary, fallback = hedge_on_same_account(scheduler, delay_s=0.2)
+    assert out == ["a", "b"] and primary.sent == 1
+    assert fallback.sent == 0 and fallback.outcomes == ["no_budget"]
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+import document_cache
+import loaders
+import resource_governor
+
+
+@pytest.fixture
+def docs_cache(tmp_path, monkeypatch):
+    cache = document_cache.DocumentCache(path=str(tmp_path / "docs.sqlite3"))
+    monkeypatch.setattr(document_cache, "get_cache", lambda: cache)
+    return cache
+
+
+def test_source_type():
+    assert loaders.source_type("https://youtu.be/abc") == "youtube"
+    assert loaders.source_type("https://www.youtube.com/watch?v=abc") == "youtube"
+    assert loaders.source_type("https://docs.google.com/document/d/x/edit") == "google_drive"
+    assert loaders.source_type("https://drive.google.com/file/d/x/view") == "google_drive"
+    assert loaders.source_type("https://a.example/Report.PDF") == "pdf"
+    assert loaders.source_type("https://a.example/post") == "web"
+
+
+def test_pdf_loads_page_by_page(content_server, docs_cache):
+    url = content_server.url("pdf", 1)
+    seen = []
+    docs = loaders.load_documents(url, on_page=seen.append)
+    assert [doc.metadata["page"] for doc in docs] == [0, 1, 2, 3, 4]
+    assert all(doc.metadata["total_pages"] == 5 for doc in docs)
+    assert [doc.page_content for doc in seen] == [doc.page_content for doc in docs]
+
+
+def test_second_load_is_served_from_the_document_cache(content_server, docs_cache):
+    url = content_server.url("pdf", 2)
+    first = loaders.load_documents(url)
+    again = loaders.load_documents(url)
+    assert [d.page_content for d in again] == [d.page_content for d in first]
+    assert docs_cache.stats()["hits"] == 1
+
+
+def test_web_page_keeps_the_article_only(content_server, docs_cache):
+    (doc,) = loaders.load_documents(content_server.url("web", 1))
+    assert doc.metadata["extractor"] == "fast"
+    assert "Bench article" in doc.page_content
+    assert "cookies" not in doc.page_content
+    assert "All rights reserved" not in doc.page_content
+
+
+def test_google_docs_export(content_server, docs_cache, monkeypatch):
+    monkeypatch.setattr(loaders, "GOOGLE_DOCS_BASE", f"{content_server.base_url}/docs.google.com")
+    url = "https://docs.google.com/document/d/doc1/edit"
+    (doc,) = loaders.load_documents(url)
+    assert doc.metadata == {"source": url}
+    assert doc.page_content.strip()
+
+
+def test_google_drive_pdf(content_server, docs_cache, monkeypatch):
+    monkeypatch.setattr(loaders, "GOOGLE_DRIVE_BASE", f"{content_server.base_url}/drive.google.com")
+    docs = loaders.load_documents("https://drive.google.com/file/d/file1/view")
+    assert len(docs) == 5
+
+
+def test_token_cap_stops_extraction(content_server, docs_cache):
+    with pytest.raises(resource_governor.DocumentTooLarge):
+        loaders.load_documents(content_server.url("pdf", 3), max_tokens=100)
+
+
+def test_cancelled_load(content_server, docs_cache):
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(loaders.LoadCancelled):
+        loaders.load_documents(content_server.url("pdf", 4), cancel=cancel)
+
+
+def test_invalid_youtube_url():
+    with pytest.raises(ValueError):
+        loaders.youtube_video_id("https://www.youtube.com/feed/trending")
@@ -0,0 +1,86 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+
+import long_summarize
+from long_summarize import CheckpointStore, RefineSummarizer
+
+FIRST = PromptTemplate(template="Summarize: {text}", input_variables=["text"])
+
+
+class FakeLLM:
+    """Returns the number of calls so far; raises on call `fail_at`."""
+
+    def __init__(self, fail_at=None):
+        self.calls = 0
+        self.fail_at = fail_at
+
+    def invoke(self, text):
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise ValueError("boom")
+        return f"summary {self.calls}"
+
+
+def make_docs(pages=12, words=400, seed="w"):
+    return [Document(page_content=" ".join(f"{seed}{p}_{i}" for i in range(words)),
+                     metadata={"source": "https://a.example/doc.pdf", "page": p})
+            for p in range(pages)]
+
+
+def summarizer(llm, tmp_path):
+    return RefineSummarizer(llm, FIRST, chunk_tokens=500,
+                            store=CheckpointStore(str(tmp_path)))
+
+
+def test_one_call_per_chunk_and_checkpoint_cleared(tmp_path):
+    docs = make_docs()
+    llm = FakeLLM()
+    result = summarizer(llm, tmp_path).summarize(docs)
+    chunks = sum(1 for _ in long_summarize.iter_chunks(docs, 500))
+    assert llm.calls == chunks and result == f"summary {chunks}"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_resumes_after_a_failure(tmp_path):
+    docs = make_docs()
+    with pytest.raises(ValueError):
+        summarizer(FakeLLM(fail_at=4), tmp_path).summarize(docs)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    llm = FakeLLM()
+    run = summarizer(llm, tmp_path)
+    run.summarize(docs)
+    chunks = sum(1 for _ in long_summarize.iter_chunks(docs, 500))
+    assert run.last_stats == {"chunks": chunks, "resumed_at": 3}
+    assert llm.calls == chunks - 3
+
+
+def test_changed_content_starts_over(tmp_path):
+    docs = make_docs()
+    with pytest.raises(ValueError):
+        summarizer(FakeLLM(fail_at=4), tmp_path).summarize(docs)
+
+    # Same source and first page, different later pages.
+    edited = docs[:1] + make_docs(seed="x")[1:]
+    llm = FakeLLM()
+    run = summarizer(llm, tmp_path)
+    run.summarize(edited)
+    assert run.last_stats["resumed_at"] == 0
+    assert llm.calls == sum(1 for _ in long_summarize.iter_chunks(edited, 500))
+
+
+def test_progress_is_reported(tmp_path):
+    seen = []
+    token = long_summarize.current_progress.set(lambda done, total, s: seen.append((done, total)))
+    try:
+        summarizer(FakeLLM(), tmp_path).summarize(make_docs())
+    finally:
+        long_summarize.current_progress.reset(token)
+    assert seen[-1][0] == seen[-1][1]
+    assert all(done < total for done, total in seen[:-1])
+
+
+def test_retryable_errors():
+    assert long_summarize._retryable(TimeoutError())
+    assert not long_summarize._retryable(ValueError())
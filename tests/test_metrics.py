@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+import metrics
+from metrics import MetricsRegistry
+
+
+def record(registry, n):
+    for i in range(n):
+        with metrics.trace(f"request-{i}"):
+            pass
+    return registry
+
+
+def test_trace_log_rotates_and_keeps_backups(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    registry = MetricsRegistry(str(path), trace_max_bytes=2000, trace_backups=2)
+    monkeypatch.setattr(metrics, "get_registry", lambda: registry)
+    record(registry, 200)
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"]
+    for name in files:
+        size = (tmp_path / name).stat().st_size
+        assert size < 2000 + 500
+    last = (tmp_path / "traces.jsonl").read_text().splitlines()[-1]
+    assert json.loads(last)["name"] == "request-199"
+
+
+def test_trace_log_without_backups_is_truncated(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    registry = MetricsRegistry(str(path), trace_max_bytes=1000, trace_backups=0)
+    monkeypatch.setattr(metrics, "get_registry", lambda: registry)
+    record(registry, 100)
+    assert [p.name for p in tmp_path.iterdir()] in ([], ["traces.jsonl"])
+    assert not path.exists() or path.stat().st_size < 1000
+
+
+def test_exporter_refuses_public_address_without_opt_in():
+    with pytest.raises(PermissionError, match="METRICS_PUBLIC"):
+        metrics.serve(port=1, host="0.0.0.0", public=False)
+    metrics.require_loopback("127.0.0.1", False, "X")
+    metrics.require_loopback("::1", False, "X")
+    metrics.require_loopback("localhost", False, "X")
@@ -0,0 +1,187 @@
+import random
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+import chunk_memo
+import dedup_index
+import document_cache
+import loaders
+import pipeline
+import summarize_engine
+import summary_cache
+
+
+def article(words=6000, seed=11):
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(3000)]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    index = dedup_index.DedupIndex(path=None)
+    monkeypatch.setattr(dedup_index, "ENABLED", True)
+    monkeypatch.setattr(dedup_index, "get_index", lambda: index)
+    return summary_cache.SummaryCache(path=str(tmp_path / "summaries.sqlite3"))
+
+
+def summarized(cache, url, text):
+    docs = [Document(page_content=text, metadata={"source": url})]
+    key = pipeline.cache_key(url, docs)
+    pipeline.store_summary(cache, key, url, docs, "auto", f"summary of {url}")
+    return docs
+
+
+def edited(text):
+    words = text.split(" ")
+    middle = len(words) // 2
+    return " ".join(words[:middle] + ["One", "freshly", "inserted", "sentence."] + words[middle:])
+
+
+# ---------------- NEAR-DUPLICATES ----------------
+def test_one_sentence_edit_is_a_near_duplicate():
+    text = article()
+    distance = bin(dedup_index.fingerprint(text) ^ dedup_index.fingerprint(edited(text))).count("1")
+    assert distance <= dedup_index.MAX_DISTANCE
+
+
+def test_edited_document_at_the_same_url_is_summarized_again(cache):
+    url = "https://example.com/report"
+    text = article()
+    summarized(cache, url, text)
+
+    docs = [Document(page_content=edited(text), metadata={"source": url})]
+    key = pipeline.cache_key(url, docs)
+    assert pipeline.lookup_summary(cache, key, url, docs) is None
+    assert cache.get(key) is None  # the old summary was not copied to the new key
+
+
+def test_same_content_at_another_url_reuses_the_summary(cache):
+    text = article()
+    summarized(cache, "https://example.com/report", text)
+
+    mirror = "https://mirror.example.org/report"
+    docs = [Document(page_content=edited(text), metadata={"source": mirror})]
+    key = pipeline.cache_key(mirror, docs)
+    assert pipeline.lookup_summary(cache, key, mirror, docs) == "summary of https://example.com/report"
+
+
+def test_chunk_memo_sources_never_reuse_near_duplicates(cache, monkeypatch):
+    monkeypatch.setattr(chunk_memo, "ENABLED", True)
+    monkeypatch.setattr(chunk_memo, "SOURCES", ["google_drive"])
+    text = article()
+    summarized(cache, "https://example.com/report", text)
+
+    doc_url = "https://docs.google.com/document/d/abc/edit"
+    docs = [Document(page_content=text, metadata={"source": doc_url})]
+    assert pipeline.lookup_summary(cache, pipeline.cache_key(doc_url, docs), doc_url, docs) is None
+
+
+# ---------------- EARLY MAP ----------------
+class CountingLLM:
+    def __init__(self):
+        self.prompts = []
+        self.lock = threading.Lock()
+
+    def invoke(self, text):
+        with self.lock:
+            self.prompts.append(text)
+            return f"summary {len(self.prompts)}"
+
+
+def pdf_pages(count=12, words=900):
+    return [Document(page_content=f"Running header\n{article(words, seed=page)}",
+                     metadata={"source": "https://a.example/report.pdf", "page": page})
+            for page in range(count)]
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def pdf_source(tmp_path, monkeypatch):
+    """
+    A PDF source served through the document cache. Records, as each page
+    is extracted, how many map calls state["early"] has started.
+    """
+    docs_cache = document_cache.DocumentCache(path=str(tmp_path / "docs.sqlite3"))
+    monkeypatch.setattr(document_cache, "get_cache", lambda: docs_cache)
+    state = {"early": None, "started_at_page": []}
+
+    def iter_pdf(url):
+        def parse(resp):
+            for page in pdf_pages():
+                early = state["early"]
+                state["started_at_page"].append(early.started if early else 0)
+                yield page
+
+        session = type("Session", (), {"get": lambda self, *a, **kw: FakeResponse()})()
+        yield from document_cache.cached_http_iter(url, session, url, parse)
+
+    monkeypatch.setitem(loaders.ITERATORS, "pdf", iter_pdf)
+    monkeypatch.setitem(loaders.LOADERS, "pdf", lambda url: list(iter_pdf(url)))
+    return state
+
+
+def test_early_map_calls_are_taken_over_by_map_reduce():
+    docs = pdf_pages()
+    llm = CountingLLM()
+    early = summarize_engine.EarlyMap(
+        summarize_engine.MapReduceSummarizer(llm, pipeline.prompt),
+        start_tokens=summarize_engine.STUFF_TOKENS, stop_tokens=10**6,
+    )
+    for doc in docs:
+        early.add(doc.page_content)
+    summaries = summarize_engine.MapReduceSummarizer(llm, pipeline.prompt, early=early).map(docs)
+    early.close()
+
+    chunks = list(summarize_engine.iter_chunks(docs))
+    assert len(summaries) == len(chunks)
+    assert early.started > 0 and early.reused == early.started
+    assert len(llm.prompts) == len(chunks)  # no chunk summarized twice
+
+
+def test_early_map_stops_past_the_map_reduce_limit():
+    llm = CountingLLM()
+    early = summarize_engine.EarlyMap(
+        summarize_engine.MapReduceSummarizer(llm, pipeline.prompt),
+        start_tokens=10**6, stop_tokens=2000,
+    )
+    for doc in pdf_pages():
+        early.add(doc.page_content)
+    assert early.closed and early.started == 0
+
+
+def test_pdf_map_calls_start_while_pages_are_extracted(cache, pdf_source):
+    url = "https://a.example/report.pdf"
+    assert pipeline.maps_early(url)
+    llm = CountingLLM()
+    early = pdf_source["early"] = pipeline.early_map(llm, url)
+
+    docs = pipeline.load(url, early=early)
+    # Map calls went out before the last pages had been extracted.
+    assert pdf_source["started_at_page"][-1] > 0
+
+    summary = pipeline.summarize(llm, docs, early=early)
+    early.close()
+    chunks = list(summarize_engine.iter_chunks(docs))
+    assert summary and early.reused == early.started
+    assert len(llm.prompts) == len(chunks) + 1  # each chunk once, then the reduce
+
+
+def test_cached_pdf_pages_start_no_map_calls(cache, pdf_source):
+    url = "https://a.example/report.pdf"
+    pipeline.load(url)  # now in the document cache
+
+    llm = CountingLLM()
+    early = pipeline.early_map(llm, url)
+    pipeline.load(url, early=early)
+    early.close()
+    assert early.started == 0 and llm.prompts == []
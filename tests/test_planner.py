@@ -0,0 +1,34 @@
+from langchain_core.documents import Document
+
+import planner
+import rate_limiter
+
+
+def docs_of(tokens):
+    return [Document(page_content="x" * (tokens * 4), metadata={"source": "https://a.example"})]
+
+
+def scheduler(monkeypatch, tpm):
+    limiter = rate_limiter.RateLimitScheduler(rpm=1000, tpm=tpm)
+    monkeypatch.setattr(rate_limiter, "get_scheduler", lambda: limiter)
+    return limiter
+
+
+def test_call_limit_follows_the_tpm_reported_by_groq(monkeypatch):
+    limiter = scheduler(monkeypatch, tpm=1_000_000)
+    assert planner.call_limit(100) == planner.STUFF_TOKENS
+
+    limiter.observe(200, {"x-ratelimit-limit-tokens": "3000"})
+    assert planner.call_limit(100) == 3000 - rate_limiter.OUTPUT_TOKENS - 100
+    assert planner.plan(docs_of(2500), prompt_tokens=100).strategy == "map_reduce"
+
+
+def test_predicted_time_uses_the_current_tpm(monkeypatch):
+    limiter = scheduler(monkeypatch, tpm=1_000_000)
+    docs = docs_of(40_000)
+    assert planner.plan(docs).predicted_min_s == 0
+
+    limiter.observe(200, {"x-ratelimit-limit-tokens": "6000"})
+    decision = planner.plan(docs)
+    total = decision.predicted_input_tokens + decision.predicted_output_tokens
+    assert decision.predicted_min_s == round((total - 6000) / 6000 * 60, 1)
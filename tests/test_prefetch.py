@@ -0,0 +1,115 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import prefetch
+import resource_governor
+
+PARAGRAPH = b"<p>" + b"Slow pages still arrive a paragraph at a time. " * 20 + b"</p>\n"
+
+
+class SlowPage(BaseHTTPRequestHandler):
+    """
+    An article sent in HTTP chunks, one paragraph every 50 ms (about 5 s).
+    `server.sending` is set once the body has started; `server.dropped`
+    once the client hung up before the end.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            self.chunk(b"<html><body><article>")
+            self.server.sending.set()
+            for _ in range(100):
+                self.chunk(PARAGRAPH)
+                time.sleep(0.05)
+            self.chunk(b"</article></body></html>")
+            self.chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.dropped.set()
+            self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def httpd():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SlowPage)
+    httpd.sending, httpd.dropped = threading.Event(), threading.Event()
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+
+
+@pytest.fixture
+def server(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def wait_finished(item, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not item.finished and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return item
+
+
+def test_mode_change_keeps_the_prefetch(server):
+    prefetcher = prefetch.Prefetcher()
+    first = prefetcher.prefetch("s", f"{server}/article-mode", "auto")
+    assert prefetcher.prefetch("s", f"{server}/article-mode", "long") is first
+    prefetcher.cancel("s")
+    wait_finished(first)
+
+
+def test_single_document_load_is_cancelled_mid_download(httpd, server):
+    prefetcher = prefetch.Prefetcher()
+    item = prefetcher.prefetch("s", f"{server}/article-cancel")
+    assert httpd.sending.wait(5)
+    assert item.status == "loading"
+    prefetcher.prefetch("s", f"{server}/another-article")
+    wait_finished(item)
+    assert item.status == "cancelled"
+    # The download was abandoned, not read to the end.
+    assert httpd.dropped.wait(5)
+    prefetcher.cancel("s")
+
+
+def test_skipped_without_a_free_slot(server, monkeypatch):
+    governor = resource_governor.ResourceGovernor(max_heavy=1, max_wait=5)
+    monkeypatch.setattr(resource_governor, "get_governor", lambda: governor)
+    # has_capacity said yes, but the slot was taken before the load started.
+    monkeypatch.setattr(governor, "has_capacity", lambda source_type: True)
+    prefetcher = prefetch.Prefetcher()
+    with governor.heavy_load("web"):
+        item = wait_finished(prefetcher.prefetch("s", f"{server}/article-busy"))
+    assert item.status == "skipped"
+    assert governor.stats()["queued"] == 0
+
+
+def test_tokens_are_counted_without_reading_spilled_pages(monkeypatch):
+    from langchain_core.documents import Document
+
+    import pipeline
+    import summarize_engine
+
+    pages = [Document(page_content="word " * 500, metadata={"page": i}) for i in range(8)]
+    spilled = resource_governor.SpilledDocuments(pages)
+    monkeypatch.setattr(pipeline, "load", lambda *args, **kwargs: spilled)
+    monkeypatch.setattr(resource_governor.SpilledDocuments, "__getitem__",
+                        lambda self, index: pytest.fail("page read back from the mmap"))
+
+    item = wait_finished(prefetch.Prefetcher().prefetch("s", "https://a.example/report.pdf"))
+    assert item.status == "ready"
+    assert item.tokens == summarize_engine.docs_tokens(pages)
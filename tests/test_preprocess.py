@@ -0,0 +1,100 @@
+from collections import Counter
+
+import pytest
+from langchain_core.documents import Document
+
+import preprocess
+
+
+def test_caption_overlap_is_dropped():
+    text = "and then we went then we went to the store to the store and bought milk"
+    assert (preprocess.dedup_caption_overlap(text, min_words=2, max_words=8)
+            == "and then we went to the store and bought milk")
+
+
+def test_single_repeated_word_is_kept_below_min_words():
+    assert preprocess.dedup_caption_overlap("very very good", min_words=2) == "very very good"
+
+
+def test_repeated_lines_are_dropped_from_their_nth_occurrence():
+    texts = [f"Site menu\nPage {i} body text\nCopyright 2024" for i in range(4)]
+    counts = Counter()
+    cleaned = [preprocess.remove_repeated_lines(text, counts, min_count=3) for text in texts]
+    assert cleaned[:2] == texts[:2]
+    assert cleaned[2:] == ["Page 2 body text", "Page 3 body text"]
+
+
+def test_cleaning_page_by_page_matches_clean_documents():
+    docs = [Document(page_content=f"Header\n\nBody   of page {i}.\nFooter", metadata={})
+            for i in range(5)]
+    cleaned, _ = preprocess.clean_documents(docs, "pdf")
+    cleaner = preprocess.Cleaner("pdf")
+    assert [cleaner.clean(doc.page_content) for doc in docs] == [
+        doc.page_content for doc in cleaned]
+    assert "Header" not in cleaned[4].page_content
+
+
+def test_clean_documents_profile_for_web():
+    docs = [Document(page_content=f"Accept cookies\n\nArticle   paragraph {i}.\n\n\n\nEnd",
+                     metadata={"source": "https://example.com"}) for i in range(3)]
+    cleaned, report = preprocess.clean_documents(docs, "web")
+    assert [doc.page_content for doc in cleaned][2] == "Article paragraph 2."
+    assert report
+
+
+# ---------------- BOILERPLATE ----------------
+def test_banner_and_nav_lines_are_dropped():
+    for line in ("Accept all cookies", "Sign in | Subscribe", "Back to top »",
+                 "© 2024 Example Media. All rights reserved.", "Privacy policy · Terms of use",
+                 "We use cookies to improve your experience on our site.",
+                 "Skip to main content", "Share on Twitter", "Advertisement"):
+        assert preprocess.is_boilerplate(line), line
+
+
+def test_prose_that_mentions_banner_words_is_kept():
+    article = "\n".join([
+        "Chocolate chip cookie recipe",
+        "Preheat the oven and bake each cookie for 10 minutes.",
+        "Since March, users must log in with two-factor authentication.",
+        "The platform lets writers subscribe readers to a paid newsletter.",
+        "Share of revenue from advertisement fell to 40% this year.",
+    ])
+    assert preprocess.remove_boilerplate(article) == article
+
+
+# ---------------- STAGE ----------------
+def test_youtube_profile_strips_tags_and_caption_overlap():
+    docs = [Document(page_content="[Music] so today we look at so today we look at caches",
+                     metadata={"start_s": 0.0})]
+    (doc,), report = preprocess.clean_documents(docs, "youtube")
+    assert doc.page_content == "so today we look at caches"
+    assert doc.metadata["start_s"] == 0.0  # timing survives cleaning
+    assert report["steps"] == preprocess.PROFILES["youtube"]
+
+
+def test_report_counts_tokens_per_document():
+    docs = [Document(page_content="Body text.  \n\n\n\nMore   text.", metadata={}),
+            Document(page_content="Short.", metadata={})]
+    cleaned, report = preprocess.clean_documents(docs, "pdf")
+    assert [d["tokens_saved"] for d in report["documents"]] == [
+        doc.metadata["tokens_saved"] for doc in cleaned]
+    assert report["tokens_saved"] == report["tokens_before"] - report["tokens_after"]
+
+
+def test_documents_cleaned_to_nothing_are_dropped():
+    docs = [Document(page_content="Accept all cookies", metadata={"page": 0}),
+            Document(page_content="Real content here.", metadata={"page": 1})]
+    cleaned, _ = preprocess.clean_documents(docs, "web")
+    assert [doc.metadata["page"] for doc in cleaned] == [1]
+
+
+def test_input_is_returned_when_nothing_would_be_left():
+    docs = [Document(page_content="Accept all cookies", metadata={})]
+    cleaned, report = preprocess.clean_documents(docs, "web")
+    assert cleaned is docs
+    assert report["fallback"] and report["tokens_saved"] == 0
+
+
+def test_unknown_steps_are_rejected():
+    with pytest.raises(ValueError):
+        preprocess.Cleaner("web", steps=["whitespace", "spellcheck"])
@@ -0,0 +1,92 @@
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+import rate_limiter
+
+
+class FakeLLM:
+    def __init__(self, chunks, result=None):
+        self.chunks = chunks
+        self.result = result
+
+    def stream(self, text):
+        yield from self.chunks
+
+    def invoke(self, text):
+        return self.result
+
+
+@pytest.fixture
+def adjustments(monkeypatch):
+    scheduler = rate_limiter.RateLimitScheduler(rpm=1000, tpm=1_000_000)
+    monkeypatch.setattr(rate_limiter, "get_scheduler", lambda: scheduler)
+    seen = []
+    monkeypatch.setattr(scheduler, "_adjust_tokens", seen.append)
+    return seen
+
+
+def usage(total):
+    return {"input_tokens": total - 10, "output_tokens": 10, "total_tokens": total}
+
+
+def test_stream_settles_with_the_reported_usage(adjustments):
+    chunks = [AIMessageChunk(content="a"), AIMessageChunk(content="b"),
+              AIMessageChunk(content="", usage_metadata=usage(130))]
+    out = list(rate_limiter.stream(FakeLLM(chunks), "text", prompt_tokens=100))
+    assert out == chunks
+    assert adjustments == [130 - (100 + rate_limiter.OUTPUT_TOKENS)]
+
+
+def test_stream_without_usage_keeps_the_estimate(adjustments):
+    list(rate_limiter.stream(FakeLLM([AIMessageChunk(content="a")]), "text", 100))
+    assert adjustments == []
+
+
+def test_invoke_and_stream_settle_alike(adjustments):
+    rate_limiter.invoke(FakeLLM([], AIMessage(content="x", usage_metadata=usage(130))),
+                        "text", 100)
+    list(rate_limiter.stream(
+        FakeLLM([AIMessageChunk(content="x", usage_metadata=usage(130))]), "text", 100))
+    assert adjustments[0] == adjustments[1]
+
+
+class HeaderLLM(FakeLLM):
+    """Sends Groq's remaining-tokens header to the scheduler (as the httpx hook does)."""
+
+    def _respond(self):
+        rate_limiter.get_scheduler().observe(200, {"x-ratelimit-remaining-tokens": "5000"})
+
+    def stream(self, text):
+        self._respond()
+        yield from self.chunks
+
+    def invoke(self, text):
+        self._respond()
+        return self.result
+
+
+def test_header_corrected_calls_are_not_settled_again(adjustments):
+    rate_limiter.invoke(HeaderLLM([], AIMessage(content="x", usage_metadata=usage(130))),
+                        "text", 100)
+    list(rate_limiter.stream(
+        HeaderLLM([AIMessageChunk(content="x", usage_metadata=usage(130))]), "text", 100))
+    assert adjustments == []
+    assert rate_limiter.current_ticket.get() is None
+
+
+def test_stuff_summaries_settle_with_the_reply_usage(adjustments):
+    from langchain_core.documents import Document
+
+    import pipeline
+
+    reply = AIMessage(content="summary", usage_metadata=usage(300))
+    docs = [Document(page_content="short text", metadata={"source": "https://a.example"})]
+    assert pipeline.summarize(FakeLLM([], reply), docs) == "summary"
+    assert len(adjustments) == 1
+
+
+def test_try_acquire_admits_only_without_waiting():
+    scheduler = rate_limiter.RateLimitScheduler(rpm=1000, tpm=1000)
+    ticket = scheduler.try_acquire(600)
+    assert ticket is not None and ticket.tokens == 600
+    assert scheduler.try_acquire(600) is None  # bucket short: no queueing
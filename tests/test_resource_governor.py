@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+from langchain_core.documents import Document
+
+import resource_governor
+import summarize_engine
+from resource_governor import ResourceGovernor, SpilledDocuments
+
+
+def doc(text, **metadata):
+    return Document(page_content=text, metadata=metadata)
+
+
+# ---------------- ADMISSION ----------------
+def test_heavy_loads_are_capped():
+    governor = ResourceGovernor(max_heavy=2, max_wait=5)
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def load():
+        nonlocal running, peak
+        with governor.heavy_load("pdf"):
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+    threads = [threading.Thread(target=load) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert peak == 2
+    stats = governor.stats()
+    assert stats["heavy_loads"] == 6 and stats["heavy_loads_active"] == 0
+
+
+def test_light_sources_do_not_take_a_slot():
+    governor = ResourceGovernor(max_heavy=1, max_wait=0)
+    with governor.heavy_load("pdf"):
+        with governor.heavy_load("youtube"):
+            pass
+        assert not governor.has_capacity("pdf")
+        assert governor.has_capacity("youtube")
+    assert governor.has_capacity("pdf")
+
+
+def test_overloaded_after_max_wait():
+    governor = ResourceGovernor(max_heavy=1, max_wait=0.1)
+    with governor.heavy_load("pdf"):
+        with pytest.raises(resource_governor.Overloaded):
+            with governor.heavy_load("web"):
+                pass
+    assert governor.stats()["rejected_overload"] == 1
+    assert governor.stats()["waiting"] == 0
+
+
+def test_busy_without_waiting():
+    governor = ResourceGovernor(max_heavy=1, max_wait=5)
+    with governor.heavy_load("pdf"):
+        start = time.monotonic()
+        with pytest.raises(resource_governor.Busy):
+            with governor.heavy_load("web", wait=False):
+                pass
+        assert time.monotonic() - start < 1
+        with governor.heavy_load("youtube", wait=False):
+            pass
+    with governor.heavy_load("web", wait=False):
+        pass
+    stats = governor.stats()
+    assert stats["rejected_busy"] == 1 and stats["queued"] == 0
+
+
+def test_memory_watermark_rejects(monkeypatch):
+    monkeypatch.setattr(resource_governor, "rss_bytes", lambda: 200 * 1024 * 1024)
+    governor = ResourceGovernor(max_wait=0.05, rss_high_mb=100, rss_low_mb=50)
+    assert not governor.has_capacity("youtube")
+    with pytest.raises(resource_governor.Overloaded, match="watermark"):
+        with governor.heavy_load("youtube"):
+            pass
+
+    # Hysteresis: below high but above low stays closed.
+    monkeypatch.setattr(resource_governor, "rss_bytes", lambda: 80 * 1024 * 1024)
+    assert not governor.has_capacity("youtube")
+    monkeypatch.setattr(resource_governor, "rss_bytes", lambda: 40 * 1024 * 1024)
+    assert governor.has_capacity("youtube")
+
+
+def test_check_tokens_stops_at_the_cap():
+    pulled = []
+
+    def pages():
+        for i in range(10):
+            pulled.append(i)
+            yield doc("x" * 400)
+
+    with pytest.raises(resource_governor.DocumentTooLarge):
+        list(resource_governor.check_tokens(pages(), "pdf", max_tokens=250))
+    assert len(pulled) == 3  # extraction stopped at the first page over
+
+
+# ---------------- SPILL ----------------
+def test_small_inputs_stay_a_list():
+    docs = resource_governor.spill(iter([doc("a"), doc("b")]), threshold=100)
+    assert isinstance(docs, list) and [d.page_content for d in docs] == ["a", "b"]
+
+
+def test_spill_moves_to_mmap_past_the_threshold():
+    source = [doc(f"page {i} " + "é" * 50, page=i) for i in range(20)]
+    docs = resource_governor.spill(iter(source), threshold=200)
+
+    assert isinstance(docs, SpilledDocuments)
+    assert len(docs) == 20
+    assert docs[7].page_content == source[7].page_content
+    assert docs[-1].metadata == {"page": 19}
+    assert [d.page_content for d in docs[2:4]] == [source[2].page_content, source[3].page_content]
+    assert docs.chars == sum(len(d.page_content) for d in source)
+    with pytest.raises(IndexError):
+        docs[20]
+
+
+def test_spilled_documents_can_grow_after_reads():
+    docs = SpilledDocuments([doc("first")])
+    assert docs[0].page_content == "first"
+    docs.append(doc("second"))
+    assert docs[1].page_content == "second"
+
+
+def test_docs_chars_matches_the_joined_text():
+    source = [doc("one"), doc(""), doc("three")]
+    spilled = SpilledDocuments(source)
+    joined = summarize_engine.docs_text(source)
+    assert summarize_engine.docs_chars(source) == len(joined)
+    assert summarize_engine.docs_chars(spilled) == len(joined)
+    assert summarize_engine.docs_tokens(spilled) == summarize_engine.estimate_tokens(joined)
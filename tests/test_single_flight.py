@@ -0,0 +1,129 @@
+import gc
+import threading
+
+import pytest
+
+import single_flight
+
+
+class Failed(Exception):
+    pass
+
+
+def start_leader(group, key, release, result="done", error=None):
+    """Starts a leader that blocks until `release` is set; returns its thread."""
+    started = threading.Event()
+    out = {}
+
+    def work():
+        started.set()
+        release.wait()
+        if error is not None:
+            raise error
+        return result
+
+    def run():
+        try:
+            out["result"] = group.do(key, work)
+        except Exception as exc:
+            out["error"] = exc
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    started.wait()
+    return thread, out
+
+
+def test_follower_shares_result():
+    group = single_flight.Group("test")
+    release = threading.Event()
+    leader, _ = start_leader(group, "k", release)
+    follower_out = {}
+    follower = threading.Thread(
+        target=lambda: follower_out.setdefault("result", group.do("k", lambda: "again")))
+    follower.start()
+    release.set()
+    leader.join()
+    follower.join()
+    assert follower_out["result"] == "done"
+
+
+def test_follower_raises_own_copy_of_error():
+    group = single_flight.Group("test")
+    release = threading.Event()
+    leader, leader_out = start_leader(group, "k", release, error=Failed("boom"))
+    follower_out = {}
+
+    def follow():
+        try:
+            group.do("k", lambda: "again")
+        except Failed as exc:
+            follower_out["error"] = exc
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    release.set()
+    leader.join()
+    follower.join()
+    error = follower_out["error"]
+    assert error is not leader_out["error"]
+    assert error.args == ("boom",)
+    assert error.__cause__ is leader_out["error"]
+
+
+def test_follower_stops_waiting_on_cancel():
+    group = single_flight.Group("test")
+    release = threading.Event()
+    leader, _ = start_leader(group, "k", release)
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(single_flight.FlightCancelled):
+        group.do("k", lambda: "again", cancel=cancel)
+    release.set()
+    leader.join()
+    assert group.stats()["cancelled"] == 1
+
+
+def test_follower_wait_is_bounded():
+    group = single_flight.Group("test")
+    release = threading.Event()
+    leader, _ = start_leader(group, "k", release)
+    with pytest.raises(single_flight.FlightTimeout):
+        group.do("k", lambda: "again", timeout=0.01)
+    release.set()
+    leader.join()
+    assert group.stats()["timeouts"] == 1
+
+
+def test_unstarted_subscription_leaves_on_gc():
+    group = single_flight.Group("test")
+    release = threading.Event()
+
+    def tokens():
+        release.wait()
+        yield "a"
+
+    stream = group.stream("k", tokens)
+    flight = stream._flight
+    assert flight.subscribers == 1
+    del stream
+    gc.collect()
+    assert flight.subscribers == 0
+    assert flight.cancel.is_set()
+    release.set()
+
+
+def test_closed_subscription_leaves_once():
+    group = single_flight.Group("test")
+    release = threading.Event()
+
+    def tokens():
+        release.wait()
+        yield "a"
+
+    stream = group.stream("k", tokens)
+    flight = stream._flight
+    stream.close()
+    stream.close()
+    assert flight.subscribers == 0
+    release.set()
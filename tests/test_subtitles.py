@@ -0,0 +1,104 @@
+import io
+import json
+
+import pytest
+
+import subtitles
+from subtitles import Transcript
+
+
+def json3(events, **extra) -> bytes:
+    return json.dumps({"wireMagic": "pb3", **extra, "events": events}).encode()
+
+
+EVENTS = [
+    {"tStartMs": 0, "dDurationMs": 2000, "segs": [{"utf8": "hello"}, {"utf8": " world"}]},
+    {"tStartMs": 1900, "segs": [{"utf8": "\n"}]},
+    {"tStartMs": 2000, "dDurationMs": 2000},  # window event, no text
+    {"tStartMs": 2500, "dDurationMs": 1500, "segs": [{"utf8": "second  line"}]},
+    {"tStartMs": 65000, "dDurationMs": 3000, "segs": [{"utf8": "after the break"}]},
+]
+
+
+def test_timestamp():
+    assert subtitles.timestamp(123) == "2:03"
+    assert subtitles.timestamp(3723.9) == "1:02:03"
+
+
+def test_parse_json3_joins_caption_text():
+    transcript = subtitles.parse_json3(io.BytesIO(json3(EVENTS)))
+    assert transcript.text == "hello world second line after the break"
+    assert list(transcript.starts_ms) == [0, 2500, 65000]
+    assert transcript.duration_s == 68.0
+
+
+def test_events_decode_across_chunk_boundaries():
+    body = json3(EVENTS, pens=[{"b": 1}], wsWinStyles=[{}])
+    chunks = [body[i:i + 7] for i in range(0, len(body), 7)]  # splits numbers and strings
+    events = list(subtitles.iter_json3_events(chunks))
+    assert events == EVENTS
+
+
+def test_multibyte_text_split_across_chunks():
+    body = json3([{"tStartMs": 0, "segs": [{"utf8": "café ✓ naïve"}]}])
+    chunks = [body[i:i + 1] for i in range(len(body))]
+    assert subtitles.parse_json3(chunks).text == "café ✓ naïve"
+
+
+@pytest.mark.parametrize("body", [b"[]", b'{"events": [{"tStartMs": 0', b"not json"])
+def test_malformed_streams_raise(body):
+    with pytest.raises(subtitles.SubtitleFormatError):
+        subtitles.parse_json3(io.BytesIO(body))
+
+
+def test_time_and_slice():
+    transcript = subtitles.parse_json3(io.BytesIO(json3(EVENTS)))
+    assert transcript.time_at(transcript.text.index("second")) == 2.5
+    assert transcript.index_at(60) == 2
+
+    part = transcript.slice(1, 70)
+    assert part.text == "second line after the break"
+    assert list(part.offsets) == [0, len("second line ")]
+    assert transcript.slice(100).text == ""
+
+
+def test_sections_follow_chapters():
+    transcript = subtitles.parse_json3(
+        io.BytesIO(json3(EVENTS)),
+        chapters=[{"start_time": 0, "title": "Intro"}, {"start_time": 60, "title": "Main"}],
+    )
+    sections = transcript.sections()
+    assert [(s.chapter, s.start_s, s.end_s, s.text) for s in sections] == [
+        ("Intro", 0.0, 65.0, "hello world second line"),
+        ("Main", 65.0, 68.0, "after the break"),
+    ]
+
+
+def test_long_runs_are_cut_at_the_longest_pause():
+    # 40 events of 10 characters, 1 s apart, except a 5 s pause before
+    # event 18: two runs of about 20 events, split near the pause.
+    segments, start = [], 0
+    for i in range(40):
+        start += 5000 if i == 18 else 1000
+        segments.append((start, f"event {i:03d}."))
+    transcript = Transcript.from_segments(segments)
+    sections = transcript.sections(max_tokens=400 // subtitles.CHARS_PER_TOKEN)
+    assert len(sections) == 2
+    assert sections[1].text.startswith("event 018.")
+    assert " ".join(s.text for s in sections) == transcript.text
+
+
+def test_documents_and_chapter_groups():
+    transcript = subtitles.parse_json3(
+        io.BytesIO(json3(EVENTS)),
+        chapters=[{"start_time": 0, "title": "Intro"}, {"start_time": 60, "title": "Main"}],
+    )
+    docs = transcript.documents("https://youtu.be/x")
+    assert subtitles.is_timed(docs)
+    assert docs[0].metadata == {"source": "https://youtu.be/x", "start_s": 0.0, "end_s": 65.0,
+                                "chapter": "Intro", "chapter_start_s": 0.0}
+    groups = subtitles.chapter_groups(docs)
+    assert [(title, start, end, len(group)) for title, start, end, group in groups] == [
+        ("Intro", 0.0, 65.0, 1), ("Main", 60.0, 68.0, 1),
+    ]
+    assert not subtitles.is_timed([])
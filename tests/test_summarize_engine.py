@@ -0,0 +1,50 @@
+import random
+
+from langchain_core.documents import Document
+
+import summarize_engine
+
+
+def pages(count=40, seed=3):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(300)]
+    return [Document(page_content="\n".join(
+                " ".join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+                for _ in range(rng.randint(3, 30))))
+            for _ in range(count)]
+
+
+def test_docs_sizes_match_the_joined_text():
+    docs = pages()
+    text = summarize_engine.docs_text(docs)
+    assert summarize_engine.docs_chars(docs) == len(text)
+    assert summarize_engine.docs_tokens(docs) == summarize_engine.estimate_tokens(text)
+    assert summarize_engine.docs_chars([]) == 0
+
+
+def test_iter_chunks_covers_the_text_within_the_chunk_size():
+    docs = pages()
+    chunks = list(summarize_engine.iter_chunks(iter(docs), chunk_tokens=200, overlap_tokens=20))
+    limit = 200 * summarize_engine.CHARS_PER_TOKEN
+    assert len(chunks) > 5 and all(len(chunk) <= limit for chunk in chunks)
+
+    text = summarize_engine.docs_text(docs)
+    position = 0
+    for chunk in chunks:  # in order, each found at or after the previous one's start
+        found = text.find(chunk, max(0, position - limit))
+        assert found >= 0
+        position = found + len(chunk)
+    assert position >= len(text.rstrip()) - limit
+
+
+def test_iter_chunks_is_lazy():
+    pulled = []
+
+    def docs():
+        for doc in pages(count=40):
+            pulled.append(doc)
+            yield doc
+
+    chunks = summarize_engine.iter_chunks(docs(), chunk_tokens=100, overlap_tokens=0)
+    next(chunks)
+    assert len(pulled) < 40
@@ -0,0 +1,55 @@
+from langchain_core.documents import Document
+
+import summary_cache
+import summarize_engine
+
+
+def test_docs_key_matches_text_key():
+    docs = [Document(page_content="first"), Document(page_content="second")]
+    text = summarize_engine.docs_text(docs)
+    assert summary_cache.docs_hash(docs) == summary_cache.text_hash(text)
+    assert (summary_cache.make_docs_key("https://a.example/x", "p", "m", 0.2, docs, "long")
+            == summary_cache.make_key("https://a.example/x", "p", "m", 0.2, text, "long"))
+
+
+def test_variant_changes_the_key():
+    base = summary_cache.make_key("https://a.example/x", "p", "m", 0.2, "text")
+    assert summary_cache.make_key("https://a.example/x", "p", "m", 0.2, "text", "long") != base
+
+
+# ---------------- URL KEYS ----------------
+def test_normalize_url_folds_variants_of_one_page():
+    canonical = summary_cache.normalize_url("https://example.com/post")
+    for url in ("http://www.example.com/post/", "https://m.example.com/post#comments",
+                "https://example.com/post?utm_source=x&ref=feed",
+                "https://amp.example.com/post/amp",
+                "https://www.google.com/amp/s/example.com/post"):
+        assert summary_cache.normalize_url(url) == canonical
+    assert (summary_cache.normalize_url("https://example.com/p?b=2&a=1")
+            == summary_cache.normalize_url("https://example.com/p?a=1&b=2"))
+
+
+def test_normalize_url_folds_youtube_forms():
+    watch = "https://youtube.com/watch?v=abc123"
+    for url in ("https://youtu.be/abc123?si=x", "https://www.youtube.com/shorts/abc123",
+                "https://www.youtube.com/embed/abc123", "https://m.youtube.com/watch?v=abc123&t=42",
+                "https://www.youtube.com/live/abc123"):
+        assert summary_cache.normalize_url(url) == watch
+
+
+def test_fetch_key_keeps_what_can_change_the_response():
+    key = summary_cache.fetch_key
+    assert key(" HTTPS://Example.com/Post#top ") == "https://example.com/Post"
+    assert key("http://example.com/post") != key("https://example.com/post")
+    assert key("https://www.example.com/post") != key("https://example.com/post")
+    assert key("https://example.com/post?ref=a") != key("https://example.com/post")
+    assert key("https://example.com/post?amp=1") != key("https://example.com/post")
+
+
+def test_youtube_video_id_forms():
+    for url in ("https://www.youtube.com/watch?feature=share&v=abc123",
+                "https://youtu.be/abc123", "https://youtube.com/shorts/abc123?si=x",
+                "https://www.youtube.com/embed/abc123", "https://www.youtube.com/live/abc123",
+                "https://www.youtube.com/v/abc123"):
+        assert summary_cache.youtube_video_id(url) == "abc123"
+    assert summary_cache.youtube_video_id("https://www.youtube.com/playlist?list=x") is None
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+import downloads
+import youtube_transcripts
+from subtitles import Transcript
+
+
+def transcript(text):
+    return Transcript.from_segments([(0, text, 1000)])
+
+
+@pytest.fixture
+def memory(tmp_path, monkeypatch):
+    memory = youtube_transcripts.StrategyMemory(str(tmp_path / "strategy.json"), "host-a")
+    monkeypatch.setattr(youtube_transcripts, "get_memory", lambda: memory)
+    return memory
+
+
+def strategies(monkeypatch, **fns):
+    for name, fn in fns.items():
+        monkeypatch.setitem(youtube_transcripts.STRATEGIES, name, fn)
+
+
+def test_pick_json3_track_prefers_uploaded_subtitles():
+    info = {
+        "subtitles": {"en": [{"ext": "vtt", "url": "u.vtt"}, {"ext": "json3", "url": "u.json3"}]},
+        "automatic_captions": {"en": [{"ext": "json3", "url": "auto.json3"}]},
+    }
+    assert youtube_transcripts.pick_json3_track(info) == "u.json3"
+    auto_only = {"automatic_captions": info["automatic_captions"]}
+    assert youtube_transcripts.pick_json3_track(auto_only) == "auto.json3"
+    assert youtube_transcripts.pick_json3_track({"subtitles": {"de": []}}) is None
+
+
+def test_strategy_memory_persists_the_winner(memory):
+    assert memory.order() == ["transcript_api", "yt_dlp"]
+    memory.record("yt_dlp", ok=True)
+    memory.record("transcript_api", ok=False)
+    reloaded = youtube_transcripts.StrategyMemory(memory.path, "host-a")
+    assert reloaded.order() == ["yt_dlp", "transcript_api"]
+    # Other deployments keep their own preference.
+    assert youtube_transcripts.StrategyMemory(memory.path, "host-b").order()[0] == "transcript_api"
+
+
+def test_failed_strategy_falls_back_at_once(memory, monkeypatch):
+    def blocked(video_id, url, cancelled):
+        raise RuntimeError("IP blocked")
+
+    strategies(monkeypatch, transcript_api=blocked,
+               yt_dlp=lambda video_id, url, cancelled: transcript("from yt-dlp"))
+    result = youtube_transcripts.fetch_transcript("vid", "https://youtu.be/vid", hedge_delay=60)
+    assert result.text == "from yt-dlp"
+    assert memory.order()[0] == "yt_dlp"
+
+
+def test_slow_strategy_is_hedged_and_told_to_stop(memory, monkeypatch):
+    stopped = threading.Event()
+
+    def slow(video_id, url, cancelled):
+        if cancelled.wait(10):
+            stopped.set()
+        return transcript("too late")
+
+    strategies(monkeypatch, transcript_api=slow,
+               yt_dlp=lambda video_id, url, cancelled: transcript("hedge"))
+    result = youtube_transcripts.fetch_transcript("vid", "https://youtu.be/vid", hedge_delay=0)
+    assert result.text == "hedge"
+    assert stopped.wait(5)
+
+
+def test_empty_transcripts_do_not_win(memory, monkeypatch):
+    strategies(monkeypatch,
+               transcript_api=lambda video_id, url, cancelled: transcript(""),
+               yt_dlp=lambda video_id, url, cancelled: transcript(""))
+    with pytest.raises(youtube_transcripts.TranscriptUnavailable) as info:
+        youtube_transcripts.fetch_transcript("vid", "https://youtu.be/vid", hedge_delay=60)
+    assert "transcript_api" in str(info.value) and "yt_dlp" in str(info.value)
+
+
+def test_cancelled_load_stops_waiting(memory, monkeypatch):
+    release = threading.Event()
+
+    def stuck(video_id, url, cancelled):
+        release.wait(10)
+        return transcript("never used")
+
+    strategies(monkeypatch, transcript_api=stuck, yt_dlp=stuck)
+    cancel = threading.Event()
+    cancel.set()
+    token = downloads.cancel_event.set(cancel)
+    try:
+        with pytest.raises(downloads.LoadCancelled):
+            youtube_transcripts.fetch_transcript("vid", "https://youtu.be/vid", hedge_delay=60)
+    finally:
+        downloads.cancel_event.reset(token)
+        release.set()
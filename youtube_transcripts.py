@@ -0,0 +1,243 @@
+# ================================
+# YouTube transcripts: hedged youtube_transcript_api vs in-process yt-dlp
+# ================================
+
+import os
+import json
+import time
+import socket
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import downloads
+import http_client
+import metrics
+import subtitles
+from summary_cache import CACHE_DIR
+
+# ---------------- CONFIG ----------------
+# Seconds to give the preferred strategy before starting the other one.
+# 0 races both immediately.
+HEDGE_DELAY = float(os.getenv("YT_HEDGE_DELAY", "1.5"))
+# How often a waiting fetch checks whether its load was cancelled.
+CANCEL_POLL = 0.25
+LANGS = ["en"]
+DEPLOYMENT_ID = os.getenv("DEPLOYMENT_ID") or socket.gethostname()
+STRATEGY_FILE = os.path.join(CACHE_DIR, "youtube_strategy.json")
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="yt")
+
+
+class TranscriptUnavailable(RuntimeError):
+    pass
+
+
+# ---------------- STRATEGY 1: youtube_transcript_api ----------------
+def fetch_with_transcript_api(video_id: str, url: str, cancelled) -> subtitles.Transcript:
+    """
+    Fast on residential IPs, usually blocked on cloud IPs.
+    """
+    from youtube_transcript_api import YouTubeTranscriptApi
+
+    # Own cookies/headers, shared connection pool.
+    session = http_client.get_client().new_session()
+    transcript_data = YouTubeTranscriptApi(http_client=session).list(video_id)
+
+    try:
+        transcript = transcript_data.find_manually_created_transcript(LANGS)
+    except Exception:
+        transcript = transcript_data.find_generated_transcript(LANGS)
+
+    return subtitles.Transcript.from_segments(
+        (chunk.start * 1000, chunk.text, chunk.duration * 1000)
+        for chunk in transcript.fetch()
+    )
+
+
+# ---------------- STRATEGY 2: yt-dlp (in-process) ----------------
+def pick_json3_track(info: dict) -> str | None:
+    """
+    Same preference as `--write-subs --write-auto-subs --sub-langs en`:
+    uploaded subtitles first, automatic captions otherwise.
+    """
+    for field in ("subtitles", "automatic_captions"):
+        for lang in LANGS:
+            for track in (info.get(field) or {}).get(lang) or []:
+                if track.get("ext") == "json3":
+                    return track["url"]
+    return None
+
+
+def fetch_with_yt_dlp(video_id: str, url: str, cancelled) -> subtitles.Transcript:
+    """
+    Cloud safe. Runs yt-dlp as a library: subtitles are parsed straight
+    from the response stream (with the video's chapters), no subprocess
+    and no temp files.
+    """
+    import yt_dlp
+
+    opts = {
+        "skip_download": True,
+        "quiet": True,
+        "no_warnings": True,
+        "nocheckcertificate": True,
+    }
+
+    with yt_dlp.YoutubeDL(opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+        if cancelled.is_set():
+            raise TranscriptUnavailable("Cancelled: another strategy won.")
+
+        track_url = pick_json3_track(info)
+        if not track_url:
+            raise TranscriptUnavailable("No subtitles available for this video.")
+
+        with ydl.urlopen(track_url) as resp:
+            return subtitles.parse_json3(resp, chapters=info.get("chapters"))
+
+
+STRATEGIES = {
+    "transcript_api": fetch_with_transcript_api,
+    "yt_dlp": fetch_with_yt_dlp,
+}
+
+
+# ---------------- STRATEGY MEMORY ----------------
+class StrategyMemory:
+    """
+    Remembers, per deployment (hostname or DEPLOYMENT_ID), which strategy
+    last produced a transcript so later requests start with it.
+    """
+
+    def __init__(self, path: str = STRATEGY_FILE, deployment: str = DEPLOYMENT_ID):
+        self.path = path
+        self.deployment = deployment
+        self._lock = threading.Lock()
+        self._state = self._read()
+
+    def _read(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.path)
+
+    def order(self) -> list[str]:
+        with self._lock:
+            preferred = self._state.get(self.deployment, {}).get("preferred")
+        names = list(STRATEGIES)
+        if preferred in names:
+            names.remove(preferred)
+            names.insert(0, preferred)
+        return names
+
+    def record(self, name: str, ok: bool):
+        with self._lock:
+            entry = self._state.setdefault(
+                self.deployment, {"preferred": None, "wins": {}, "failures": {}}
+            )
+            bucket = entry["wins"] if ok else entry["failures"]
+            bucket[name] = bucket.get(name, 0) + 1
+            if ok:
+                entry["preferred"] = name
+            entry["updated_at"] = time.time()
+            try:
+                self._write()
+            except OSError:
+                pass  # read-only filesystem: keep the in-memory preference
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_memory() -> StrategyMemory:
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = StrategyMemory()
+        return _memory
+
+
+# ---------------- HEDGED FETCH ----------------
+def fetch_transcript(video_id: str, url: str,
+                     hedge_delay: float = HEDGE_DELAY) -> subtitles.Transcript:
+    """
+    Starts the preferred strategy; if it has not succeeded after
+    `hedge_delay` seconds (or fails earlier) the next one is started too.
+    The first non-empty transcript wins. Losers that have not started are
+    cancelled; running ones are told to stop and their result is dropped.
+    A cancelled load (downloads.cancel_event) stops waiting within
+    CANCEL_POLL seconds.
+    """
+    memory = get_memory()
+    pending_names = memory.order()
+    cancelled = threading.Event()
+    running = {}
+    errors = {}
+
+    def attempt(name):
+        with metrics.span(f"youtube.{name}"):
+            return STRATEGIES[name](video_id, url, cancelled)
+
+    def launch():
+        name = pending_names.pop(0)
+        # Copied context: strategy spans land in the caller's trace.
+        context = contextvars.copy_context()
+        future = _executor.submit(context.run, attempt, name)
+        running[future] = name
+
+    launch()
+    hedge_at = time.monotonic() + hedge_delay
+
+    try:
+        while running:
+            timeout = CANCEL_POLL
+            if pending_names:
+                timeout = min(timeout, max(0.0, hedge_at - time.monotonic()))
+            done, _ = wait(list(running), timeout=timeout,
+                           return_when=FIRST_COMPLETED)
+            downloads.check_cancelled()
+
+            if not done:
+                if pending_names and time.monotonic() >= hedge_at:
+                    launch()  # hedge: preferred strategy is slow
+                    hedge_at = time.monotonic() + hedge_delay
+                continue
+
+            for future in done:
+                name = running.pop(future)
+                try:
+                    transcript = future.result()
+                except Exception as e:
+                    errors[name] = e
+                    memory.record(name, ok=False)
+                    continue
+
+                if transcript.text.strip():
+                    memory.record(name, ok=True)
+                    metrics.annotate(strategy=name, attempts=len(errors) + len(running) + 1)
+                    return transcript
+
+                errors[name] = TranscriptUnavailable("Transcript is empty.")
+
+            if not running and pending_names:
+                launch()  # everything in flight failed: fall back at once
+                hedge_at = time.monotonic() + hedge_delay
+
+    finally:
+        cancelled.set()
+        for future in running:
+            future.cancel()
+
+    details = "\n".join(f"{name}: {err!r}" for name, err in errors.items())
+    raise TranscriptUnavailable(f"Could not fetch a transcript.\n{details}")